@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import DESIGNATION, CustomUser
+from .models import DESIGNATION, CustomUser, EMAIL_OUTBOX
 
 @admin.register(DESIGNATION)
 class DesignationAdmin(admin.ModelAdmin):
@@ -41,3 +41,14 @@ class CustomUserAdmin(admin.ModelAdmin):  # Change from UserAdmin to admin.Model
         if obj:  # Editing an existing object
             return self.readonly_fields + ('USER_ID',)
         return self.readonly_fields
+
+@admin.register(EMAIL_OUTBOX)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('EMAIL_ID', 'SUBJECT', 'STATUS', 'ATTEMPTS', 'CREATED_AT', 'SENT_AT')
+    list_filter = ('STATUS',)
+    search_fields = ('SUBJECT',)
+    readonly_fields = ('CREATED_AT', 'SENT_AT', 'LAST_ERROR', 'CLAIMED_AT')
+
+    def get_exclude(self, request, obj=None):
+        # Credentials and OTPs are not shown, even before delivery
+        return ('BODY',) if obj and obj.SENSITIVE else ()
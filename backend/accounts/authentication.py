@@ -0,0 +1,100 @@
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+
+from .designation_cache import get_designation, get_permission_version, has_permission
+from .revocation import is_token_revoked
+
+
+def add_user_claims(token, user):
+    """
+    Store what StatelessJWTAuthentication needs to rebuild the user without a
+    database lookup. Tokens without these claims always fall back to the DB.
+    """
+    designation = user.DESIGNATION
+    token['user_id'] = user.USER_ID
+    token['username'] = user.USERNAME
+    token['is_superuser'] = user.IS_SUPERUSER
+    token['designation'] = designation.CODE if designation else None
+    token['perm_ver'] = designation.PERMISSION_VERSION if designation else 0
+    token['acct_ver'] = user.ACCOUNT_VERSION
+    return token
+
+
+class ClaimsUser(TokenUser):
+    """
+    Read-only user built from signed JWT claims. Exposes the CustomUser
+    attributes the views rely on (USER_ID, USERNAME, IS_SUPERUSER).
+    """
+
+    def __str__(self):
+        return self.USERNAME
+
+    @cached_property
+    def USER_ID(self):
+        return self.id
+
+    @cached_property
+    def USERNAME(self):
+        return self.token.get('username', '')
+
+    @cached_property
+    def IS_SUPERUSER(self):
+        return self.token.get('is_superuser', False)
+
+    @cached_property
+    def DESIGNATION_CODE(self):
+        return self.token.get('designation')
+
+    @cached_property
+    def PERMISSION_VERSION(self):
+        return self.token.get('perm_ver')
+
+    def has_module_permission(self, module_name):
+        return self.has_action_permission(module_name, 'access')
+
+    def has_action_permission(self, module_name, action):
+        if self.IS_SUPERUSER:
+            return True
+        return has_permission(get_designation(code=self.DESIGNATION_CODE), module_name, action)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that skips the "ADMIN"."USERS" lookup while the
+    designation permissions in the token are current. The permission
+    version is compared against the process-local designation cache; a stale
+    or missing version falls back to loading the user from the database.
+    Revoked tokens (LogoutView) are rejected, and so are tokens whose acct_ver
+    was revoked by deactivating, locking, demoting, changing the designation
+    or changing the password of the account (see accounts.revocation).
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        # In-memory Bloom filter check, see accounts.revocation
+        if is_token_revoked(validated_token):
+            raise InvalidToken('Token has been revoked')
+        return validated_token
+
+    def get_user(self, validated_token):
+        if self.claims_are_current(validated_token):
+            return ClaimsUser(validated_token)
+        user = super().get_user(validated_token)  # Rejects inactive users
+        if user.is_account_locked()[0]:
+            raise AuthenticationFailed('User is locked', code='user_locked')
+        version = validated_token.get('acct_ver')
+        if version is not None and version != user.ACCOUNT_VERSION:
+            raise InvalidToken('Token has been revoked')
+        return user
+
+    @staticmethod
+    def claims_are_current(validated_token):
+        if 'perm_ver' not in validated_token or 'acct_ver' not in validated_token:
+            return False  # Token issued before the claims were added
+
+        code = validated_token.get('designation')
+        if code is None:
+            return validated_token['perm_ver'] == 0
+        return get_permission_version(code) == validated_token['perm_ver']
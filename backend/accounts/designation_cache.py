@@ -0,0 +1,105 @@
+"""
+Process-local cache of designations with their permissions compiled into
+bitmasks.
+
+DESIGNATION.PERMISSIONS ({"module": {"action": bool}}) is compiled into
+{module: mask}, one bit per action, so a permission check is two dict
+lookups and a bit test. The whole DESIGNATIONS table is small, so it is
+loaded with one query and kept for DESIGNATION_CACHE_TTL seconds. Saving or
+deleting a designation bumps its PERMISSION_VERSION and clears the cache in
+the current process right away (see accounts.signals); other workers see the
+change once their TTL expires.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+CompiledDesignation = namedtuple(
+    'CompiledDesignation', ['DESIGNATION_ID', 'CODE', 'VERSION', 'IS_ACTIVE', 'MASKS']
+)
+
+# Action name -> bit. Common actions have fixed bits, others are added as
+# they show up in PERMISSIONS.
+ACTION_BITS = {'access': 1, 'create': 2, 'read': 4, 'update': 8, 'delete': 16}
+
+_lock = threading.Lock()
+_by_code = {}
+_by_id = {}
+_loaded_at = None
+
+
+def _action_bit(action):
+    bit = ACTION_BITS.get(action)
+    if bit is None:
+        bit = ACTION_BITS.setdefault(action, 1 << len(ACTION_BITS))
+    return bit
+
+
+def compile_permissions(permissions):
+    """Compile a PERMISSIONS dict into {module: action bitmask}."""
+    masks = {}
+    for module, actions in (permissions or {}).items():
+        if not isinstance(actions, dict):
+            continue
+        mask = 0
+        for action, allowed in actions.items():
+            if allowed:
+                mask |= _action_bit(action)
+        masks[module] = mask
+    return masks
+
+
+def _load_designations():
+    from .models import DESIGNATION
+
+    rows = DESIGNATION.objects.values_list(
+        'DESIGNATION_ID', 'CODE', 'PERMISSION_VERSION', 'IS_ACTIVE', 'PERMISSIONS'
+    )
+    compiled = [
+        CompiledDesignation(designation_id, code, version, is_active, compile_permissions(permissions))
+        for designation_id, code, version, is_active, permissions in rows
+    ]
+    return {d.CODE: d for d in compiled}, {d.DESIGNATION_ID: d for d in compiled}
+
+
+def _ensure_loaded():
+    global _by_code, _by_id, _loaded_at
+
+    ttl = getattr(settings, 'DESIGNATION_CACHE_TTL', 30)
+    if _loaded_at is None or time.monotonic() - _loaded_at >= ttl:
+        with _lock:
+            if _loaded_at is None or time.monotonic() - _loaded_at >= ttl:
+                # ACTION_BITS is only extended here, under the lock
+                _by_code, _by_id = _load_designations()
+                _loaded_at = time.monotonic()
+
+
+def get_designation(code=None, designation_id=None):
+    """Compiled designation by CODE or DESIGNATION_ID, or None."""
+    _ensure_loaded()
+    if designation_id is not None:
+        return _by_id.get(designation_id)
+    return _by_code.get(code)
+
+
+def get_permission_version(code):
+    """Current PERMISSION_VERSION of an active designation, or None."""
+    designation = get_designation(code=code)
+    if designation is None or not designation.IS_ACTIVE:
+        return None
+    return designation.VERSION
+
+
+def has_permission(designation, module_name, action):
+    """Bit test against a compiled designation; no queries."""
+    if designation is None:
+        return False
+    bit = ACTION_BITS.get(action)
+    return bool(bit and designation.MASKS.get(module_name, 0) & bit)
+
+
+def invalidate_designation_cache():
+    global _loaded_at
+    _loaded_at = None
@@ -0,0 +1,202 @@
+"""
+The active academic hierarchy as one tree (/api/master/hierarchy/).
+
+university -> institutes -> programs -> branches -> years -> semesters, built
+with one query per level (six in total, whatever the size of the tree) and
+joined in Python. Every node is encoded once, bottom-up, with its children
+spliced in as already-encoded JSON. The bytes of the whole tree and of every
+subtree are cached under keys of their own, so a request reads only the
+entry it sends. The keys carry the shared generation 'master_hierarchy' of
+core.cache: a post_save/post_delete on any level advances it after commit
+(see accounts.signals), and every worker switches to a rebuilt tree within
+MODEL_CACHE_SYNC_INTERVAL seconds. queryset.update() needs an explicit
+invalidate_hierarchy(). Cached entries also expire after
+MASTER_HIERARCHY_TTL seconds.
+
+The same levels are also kept per process as a registry of small __slots__
+records (hierarchy_node('branch', 5).parent.code), so serializers and ID
+generation resolve codes and names of parent levels without a query per row.
+The registry holds every row, active or not, and is reloaded when the
+core.cache generation of any level changes.
+"""
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core import monitoring
+from core.cache import bump_generation, get_generation, get_shared_generation
+from .models import UNIVERSITY, INSTITUTE, PROGRAM, BRANCH, YEAR, SEMESTER
+
+CACHE_KEY = 'master_hierarchy'
+
+# (query parameter, model, parent FK, fields sent, key of the children list)
+LEVELS = [
+    ('university_id', UNIVERSITY, None, ('UNIVERSITY_ID', 'CODE', 'NAME'), 'institutes'),
+    ('institute_id', INSTITUTE, 'UNIVERSITY_id', ('INSTITUTE_ID', 'CODE', 'NAME'), 'programs'),
+    ('program_id', PROGRAM, 'INSTITUTE_id', ('PROGRAM_ID', 'CODE', 'NAME', 'LEVEL', 'TYPE', 'DURATION_YEARS'), 'branches'),
+    ('branch_id', BRANCH, 'PROGRAM_id', ('BRANCH_ID', 'CODE', 'NAME'), 'years'),
+    ('year_id', YEAR, 'BRANCH_id', ('YEAR_ID', 'YEAR'), 'semesters'),
+    ('semester_id', SEMESTER, 'YEAR_id', ('SEMESTER_ID', 'SEMESTER'), None),
+]
+
+HIERARCHY_MODELS = [model for _, model, _, _, _ in LEVELS]
+
+
+def _rows(model, parent, fields):
+    queryset = model.objects.filter(IS_DELETED=False)
+    if any(field.name == 'IS_ACTIVE' for field in model._meta.concrete_fields):
+        queryset = queryset.filter(IS_ACTIVE=True)
+    columns = list(fields) + ([parent] if parent else [])
+    return queryset.order_by(model._meta.pk.name).values(*columns)
+
+
+def _encode(values):
+    return json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+def build_hierarchy():
+    """{'tree': bytes, 'nodes': {(param, id): bytes}} for the active hierarchy."""
+    rows = [list(_rows(model, parent, fields)) for _, model, parent, fields, _ in LEVELS]
+
+    nodes = {}
+    children = {}  # encoded nodes of the level below, by parent id
+    for (param, model, parent, fields, children_key), level_rows in zip(reversed(LEVELS), reversed(rows)):
+        pk_name = model._meta.pk.name
+        encoded_by_parent = defaultdict(list)
+        for row in level_rows:
+            encoded = _encode({field: row[field] for field in fields})
+            if children_key:
+                kids = b','.join(children.get(row[pk_name], ()))
+                encoded = encoded[:-1] + b',"' + children_key.encode() + b'":[' + kids + b']}'
+            nodes[(param, row[pk_name])] = encoded
+            encoded_by_parent[row[parent] if parent else None].append(encoded)
+        children = encoded_by_parent
+
+    return {'tree': b'[' + b','.join(children.get(None, ())) + b']', 'nodes': nodes}
+
+
+def _store_hierarchy(prefix):
+    monitoring.increment('master_hierarchy.builds')
+    hierarchy = build_hierarchy()
+    entries = {f'{prefix}:{param}:{node_id}': data for (param, node_id), data in hierarchy['nodes'].items()}
+    timeout = getattr(settings, 'MASTER_HIERARCHY_TTL', 3600)
+    cache.set_many(entries, timeout)
+    # Last: once the tree is there, a missing node is not in the tree
+    cache.set(f'{prefix}:tree', hierarchy['tree'], timeout)
+    return hierarchy
+
+
+def get_hierarchy_body(param=None, node_id=None):
+    """Response body for the whole tree, or for one node's subtree (None if not in the tree)."""
+    prefix = f'{CACHE_KEY}:{get_shared_generation(CACHE_KEY)}'
+    if param is None:
+        data = cache.get(f'{prefix}:tree')
+        if data is None:
+            data = _store_hierarchy(prefix)['tree']
+    else:
+        data = cache.get(f'{prefix}:{param}:{node_id}')
+        if data is None and f'{prefix}:tree' not in cache:
+            data = _store_hierarchy(prefix)['nodes'].get((param, node_id))
+        if data is None:
+            return None
+    return b'{"status":"success","data":' + data + b'}'
+
+
+def invalidate_hierarchy(using=None):
+    """Have every worker rebuild the tree once the current transaction commits."""
+    bump_generation(CACHE_KEY, using)
+
+
+# Code and name columns of each level in the registry
+REGISTRY_FIELDS = {
+    UNIVERSITY: ('CODE', 'NAME'),
+    INSTITUTE: ('CODE', 'NAME'),
+    PROGRAM: ('CODE', 'NAME'),
+    BRANCH: ('CODE', 'NAME'),
+    YEAR: (None, 'YEAR'),
+    SEMESTER: (None, 'SEMESTER'),
+}
+
+
+class HierarchyNode:
+    __slots__ = ('level', 'id', 'code', 'name', 'parent')
+
+    def __init__(self, level, id, code, name, parent):
+        self.level = level
+        self.id = id
+        self.code = code
+        self.name = name
+        self.parent = parent
+
+    def __repr__(self):
+        return f"<HierarchyNode {self.level} {self.id}: {self.code or self.name}>"
+
+
+class HierarchyRegistry:
+    __slots__ = ('nodes', 'generations')
+
+    def __init__(self, nodes, generations):
+        self.nodes = nodes  # {level: {id: HierarchyNode}}
+        self.generations = generations
+
+    def get(self, level, pk):
+        return self.nodes[level].get(pk)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def _generations():
+    return tuple(get_generation(model) for model in HIERARCHY_MODELS)
+
+
+def load_registry():
+    # Read before the queries, so a change committed during the load
+    # triggers another one
+    generations = _generations()
+    nodes = {}
+    parents = None
+    for param, model, parent, _, _ in LEVELS:
+        level = param[:-len('_id')]
+        pk_name = model._meta.pk.name
+        code_field, name_field = REGISTRY_FIELDS[model]
+        columns = [pk_name, name_field] + [field for field in (code_field, parent) if field]
+        level_nodes = {}
+        for row in model.objects.values(*columns).iterator():
+            level_nodes[row[pk_name]] = HierarchyNode(
+                level, row[pk_name], row.get(code_field), row[name_field],
+                parents.get(row[parent]) if parent else None,
+            )
+        nodes[level] = level_nodes
+        parents = level_nodes
+    monitoring.increment('hierarchy_registry.loads')
+    return HierarchyRegistry(nodes, generations)
+
+
+def get_registry(reload=False):
+    global _registry
+    registry = _registry
+    if reload or registry is None or registry.generations != _generations():
+        with _registry_lock:
+            if _registry is registry:  # Not reloaded by another thread meanwhile
+                _registry = load_registry()
+            registry = _registry
+    return registry
+
+
+def hierarchy_node(level, pk):
+    """
+    The registry node of `level` ('university' ... 'semester') with id `pk`,
+    or None. `pk` should come from a foreign key: an unknown id reloads the
+    registry, as the row may have been added on another worker since the last
+    generation check, or earlier in the current transaction.
+    """
+    node = get_registry().get(level, pk)
+    if node is None:
+        node = get_registry(reload=True).get(level, pk)
+    return node
@@ -0,0 +1,111 @@
+"""
+Append-only login history in LOGIN_EVENTS.
+
+Events are not inserted by the request that produces them: record_login_event()
+hands the row to a BufferedWriter, which inserts batches of
+LOGIN_EVENT_BATCH_SIZE rows or flushes every LOGIN_EVENT_FLUSH_INTERVAL_MS.
+A crash can therefore lose the last unflushed events.
+
+LOGIN_EVENTS is range-partitioned by month (migration 0029). Partitions are
+created ahead of time by `create_login_event_partitions`; rows outside every
+monthly partition land in LOGIN_EVENTS_DEFAULT and are moved into the month's
+partition when it is created.
+"""
+from datetime import date
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from core.buffered_writer import BufferedWriter
+from .models import LOGIN_EVENT
+
+login_event_writer = BufferedWriter(LOGIN_EVENT, name='login_events')
+
+
+def get_login_event_writer():
+    # Settings are read on use so tests can override them
+    login_event_writer.batch_size = getattr(settings, 'LOGIN_EVENT_BATCH_SIZE', 100)
+    login_event_writer.flush_interval_ms = getattr(settings, 'LOGIN_EVENT_FLUSH_INTERVAL_MS', 500)
+    return login_event_writer
+
+
+def record_login_event(user_id, outcome, ip_address=None, user=None):
+    """Queue a LOGIN_EVENTS row; lock tier and attempts are taken from `user`."""
+    get_login_event_writer().add(LOGIN_EVENT(
+        USER_ID=user_id,
+        OUTCOME=outcome,
+        IP_ADDRESS=ip_address or None,
+        LOCK_TIER=user.get_lock_tier() if user else 0,
+        FAILED_ATTEMPTS=(user.FAILED_LOGIN_ATTEMPTS or 0) if user else 0,
+    ))
+
+
+def flush_login_events():
+    return get_login_event_writer().flush()
+
+
+def _next_month(day):
+    return date(day.year + 1, 1, 1) if day.month == 12 else date(day.year, day.month + 1, 1)
+
+
+def _create_partition(cursor, table, name, month, end):
+    """
+    CREATE TABLE ... PARTITION OF fails while the default partition holds rows
+    of the new range, so those are moved: the default partition is detached,
+    the month created, its rows copied over and the default reattached.
+    """
+    default = f'{table}_DEFAULT'
+    bounds = [month.isoformat(), end.isoformat()]
+    cursor.execute("SELECT to_regclass(%s)", [f'"{default}"'])
+    has_default = cursor.fetchone()[0] is not None
+    if has_default:
+        cursor.execute(
+            f'SELECT EXISTS (SELECT 1 FROM "{default}" WHERE "EVENT_TIME" >= %s AND "EVENT_TIME" < %s)', bounds
+        )
+        has_default = cursor.fetchone()[0]
+
+    create = (
+        f'CREATE TABLE "{name}" PARTITION OF "{table}" '
+        f"FOR VALUES FROM ('{bounds[0]}') TO ('{bounds[1]}')"
+    )
+    if not has_default:
+        cursor.execute(create)
+        return
+    cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{default}"')
+    cursor.execute(create)
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM "{default}" WHERE "EVENT_TIME" >= %s AND "EVENT_TIME" < %s RETURNING *) '
+        f'INSERT INTO "{name}" SELECT * FROM moved',
+        bounds,
+    )
+    cursor.execute(f'ALTER TABLE "{table}" ATTACH PARTITION "{default}" DEFAULT')
+
+
+def ensure_login_event_partitions(months_ahead=3, start=None):
+    """
+    Create the monthly partitions from `start` (default: this month) through
+    `months_ahead` months later, moving rows of those months out of the
+    default partition. Returns the names of the partitions created; does
+    nothing when LOGIN_EVENTS is not a partitioned table.
+    """
+    table = LOGIN_EVENT._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relkind FROM pg_class c WHERE c.oid = to_regclass(%s)",
+            [f'"{table}"'],
+        )
+        row = cursor.fetchone()
+        if not row or row[0] != 'p':
+            return []
+
+        month = (start or date.today()).replace(day=1)
+        created = []
+        for _ in range(months_ahead + 1):
+            end = _next_month(month)
+            name = f'{table}_{month:%Y_%m}'
+            cursor.execute("SELECT to_regclass(%s)", [f'"{name}"'])
+            if cursor.fetchone()[0] is None:
+                _create_partition(cursor, table, name, month, end)
+                created.append(name)
+            month = end
+    return created
@@ -0,0 +1,71 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import PASSWORD_HISTORY, CustomUser
+
+BENCHMARK_USER_ID = 'BENCHMARK_PWD'
+
+
+def legacy_set_password(user, raw_password):
+    """The previous reset path: sequential history check and per-row prune."""
+    for history in user.password_history.all()[:5]:
+        if check_password(raw_password, history.PASSWORD):
+            raise ValueError("Cannot reuse any of your last 5 passwords")
+
+    user.PASSWORD = make_password(raw_password)
+    user.PASSWORD_CHANGED_AT = timezone.now()
+    user.save()
+    PASSWORD_HISTORY.objects.create(USER=user, PASSWORD=user.PASSWORD)
+    for old_password in user.password_history.all()[5:]:
+        old_password.delete()
+
+
+class Command(BaseCommand):
+    help = 'Compare password reset latency of the sequential and parallel history checks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        limit = getattr(settings, 'PASSWORD_HISTORY_LIMIT', 5)
+
+        # Everything runs inside one transaction that is rolled back at the end
+        with transaction.atomic():
+            user = CustomUser.objects.create_user(
+                BENCHMARK_USER_ID, BENCHMARK_USER_ID.lower(), 'benchmark@example.com', password='Initial@123'
+            )
+            PASSWORD_HISTORY.objects.bulk_create([
+                PASSWORD_HISTORY(USER=user, PASSWORD=make_password(f'History@{i}'))
+                for i in range(limit)
+            ])
+
+            runs = [
+                ('sequential check + row-by-row prune', lambda pwd: legacy_set_password(user, pwd)),
+                ('parallel check + bulk prune', user.set_password),
+            ]
+            for label, reset in runs:
+                timings = []
+                query_count = 0
+                for i in range(iterations):
+                    password = f'{label[:3]}@{i}-{time.monotonic_ns()}'
+                    with CaptureQueriesContext(connection) as ctx:
+                        start = time.perf_counter()
+                        reset(password)
+                        timings.append((time.perf_counter() - start) * 1000)
+                    query_count = len(ctx.captured_queries)
+
+                self.stdout.write(
+                    f"{label}: mean {statistics.mean(timings):.1f} ms, "
+                    f"median {statistics.median(timings):.1f} ms, "
+                    f"{query_count} queries per reset"
+                )
+
+            transaction.set_rollback(True)
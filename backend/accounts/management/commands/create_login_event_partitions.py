@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from accounts.login_events import ensure_login_event_partitions
+
+
+class Command(BaseCommand):
+    help = 'Create the monthly LOGIN_EVENTS partitions for this month and the next months (run monthly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3)
+
+    def handle(self, *args, **options):
+        created = ensure_login_event_partitions(months_ahead=options['months_ahead'])
+        if options.get('verbosity', 0) >= 1:
+            self.stdout.write(f"Created {len(created)} partitions: {', '.join(created) or '-'}")
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from utils.email_outbox import get_outbox_connection, send_pending
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued EMAIL_OUTBOX rows over a reused mail connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Send batches until no row is due, then exit')
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the outbox is empty')
+
+    def handle(self, *args, **options):
+        connection = get_outbox_connection()
+        total = 0
+        try:
+            connection.open()
+            while True:
+                try:
+                    processed = send_pending(batch_size=options['batch_size'], connection=connection)
+                except Exception as e:
+                    self.stderr.write(f"Error processing outbox: {str(e)}")
+                    connection.close()
+                    processed = 0
+                total += processed
+
+                if options['once'] and not processed:
+                    break
+                if not processed:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
+
+        if options.get('verbosity', 0) >= 1:
+            self.stdout.write(f"Processed {total} outbox emails.")
@@ -0,0 +1,44 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import DESIGNATION
+from accounts.provisioning import credentials_email, provision_accounts
+
+
+class Command(BaseCommand):
+    help = 'Create login accounts in bulk from a CSV (USER_ID,USERNAME,EMAIL[,PASSWORD,FIRST_NAME,DESIGNATION_CODE])'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=None, help='Hashing processes (default: CPU count)')
+        parser.add_argument('--no-email', action='store_true', help='Do not queue credential mails')
+
+    def handle(self, *args, **options):
+        designations = {d.CODE: d for d in DESIGNATION.objects.all()}
+        accounts = []
+        with open(options['csv_file'], newline='') as f:
+            for line, row in enumerate(csv.DictReader(f), start=2):
+                code = (row.get('DESIGNATION_CODE') or '').strip()
+                if code and code not in designations:
+                    raise CommandError(f"Line {line}: unknown designation {code}")
+                accounts.append({
+                    'USER_ID': row['USER_ID'].strip().upper(),
+                    'USERNAME': row['USERNAME'].strip(),
+                    'EMAIL': row['EMAIL'].strip(),
+                    'password': (row.get('PASSWORD') or '').strip() or None,
+                    'FIRST_NAME': (row.get('FIRST_NAME') or '').strip(),
+                    'DESIGNATION': designations.get(code),
+                })
+
+        result = provision_accounts(
+            accounts,
+            credentials_email=None if options['no_email'] else credentials_email('user'),
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+        )
+        self.stdout.write(
+            f"Created {len(result.users)} accounts in {result.seconds:.2f}s "
+            f"({result.accounts_per_sec:.1f} accounts/sec)"
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from accounts.otp_store import get_otp_store
+
+
+class Command(BaseCommand):
+    help = 'Delete expired OTPs from the configured OTP store'
+
+    def handle(self, *args, **options):
+        deleted = get_otp_store().purge_expired()
+        if options.get('verbosity', 0) >= 1:
+            self.stdout.write(f"Purged {deleted} expired OTPs.")
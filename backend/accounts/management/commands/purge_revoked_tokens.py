@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.models import REVOKED_TOKEN
+
+
+class Command(BaseCommand):
+    help = 'Delete revocation records of tokens that have expired anyway'
+
+    def handle(self, *args, **options):
+        deleted, _ = REVOKED_TOKEN.objects.filter(EXPIRES_AT__lte=timezone.now()).delete()
+        if options.get('verbosity', 0) >= 1:
+            self.stdout.write(f"Purged {deleted} expired revocations.")
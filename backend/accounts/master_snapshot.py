@@ -0,0 +1,87 @@
+"""
+All active master tables in one versioned payload (/api/master/snapshot/).
+
+Each table is sent as {"columns": [...], "rows": [[...], ...]} to avoid
+repeating the keys per row. The snapshot is built once, encoded, and kept in
+the default cache together with its version (a SHA-1 of the encoded body),
+which doubles as the ETag. The cache key carries the shared generation
+'master_snapshot' of core.cache: a post_save/post_delete on any of the models
+advances it after commit (see accounts.signals), so every worker builds a
+fresh copy within MODEL_CACHE_SYNC_INTERVAL seconds, whichever cache backend
+is configured. queryset.update() bypasses the signals and needs an explicit
+invalidate_master_snapshot(). Cached copies also expire after
+MASTER_SNAPSHOT_TTL seconds.
+"""
+import hashlib
+import json
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core import monitoring
+from core.cache import bump_generation, get_shared_generation
+from .models import (
+    COUNTRY, STATE, CITY, CURRENCY, LANGUAGE, DESIGNATION, DEPARTMENT, CATEGORY,
+    CASTE_MASTER, QUOTA_MASTER, ADMISSION_QUOTA_MASTER,
+)
+
+CACHE_KEY = 'master_snapshot'
+
+# Bookkeeping columns left out of the snapshot
+EXCLUDED_FIELDS = {'CREATED_AT', 'CREATED_BY', 'UPDATED_AT', 'UPDATED_BY', 'DELETED_AT', 'DELETED_BY', 'IS_DELETED'}
+
+SNAPSHOT_TABLES = {
+    'countries': (COUNTRY, ()),
+    'states': (STATE, ()),
+    'cities': (CITY, ()),
+    'currencies': (CURRENCY, ()),
+    'languages': (LANGUAGE, ()),
+    'designations': (DESIGNATION, ('PERMISSIONS', 'PERMISSION_VERSION')),
+    'departments': (DEPARTMENT, ()),
+    'categories': (CATEGORY, ()),
+    'castes': (CASTE_MASTER, ()),
+    'quotas': (QUOTA_MASTER, ()),
+    'admission_quotas': (ADMISSION_QUOTA_MASTER, ()),
+}
+
+Snapshot = namedtuple('Snapshot', ['version', 'body'])
+
+
+def _table(model, exclude):
+    field_names = {field.name for field in model._meta.concrete_fields}
+    columns = [
+        field.name for field in model._meta.concrete_fields
+        if field.name not in EXCLUDED_FIELDS and field.name not in exclude
+    ]
+    queryset = model.objects.all()
+    if 'IS_DELETED' in field_names:
+        queryset = queryset.filter(IS_DELETED=False)
+    if 'IS_ACTIVE' in field_names:
+        queryset = queryset.filter(IS_ACTIVE=True)
+    rows = queryset.order_by(model._meta.pk.name).values_list(*columns)
+    return {'columns': columns, 'rows': [list(row) for row in rows]}
+
+
+def build_master_snapshot():
+    tables = {name: _table(model, exclude) for name, (model, exclude) in SNAPSHOT_TABLES.items()}
+    payload = json.dumps(tables, cls=DjangoJSONEncoder, separators=(',', ':'), sort_keys=True)
+    version = hashlib.sha1(payload.encode()).hexdigest()
+    body = f'{{"status":"success","version":"{version}","tables":{payload}}}'.encode()
+    return Snapshot(version, body)
+
+
+def get_master_snapshot():
+    key = f'{CACHE_KEY}:{get_shared_generation(CACHE_KEY)}'
+    snapshot = cache.get(key)
+    if snapshot is None:
+        monitoring.increment('master_snapshot.builds')
+        snapshot = build_master_snapshot()
+        cache.set(key, tuple(snapshot), getattr(settings, 'MASTER_SNAPSHOT_TTL', 3600))
+    return Snapshot(*snapshot)
+
+
+def invalidate_master_snapshot(using=None):
+    """Have every worker rebuild the snapshot once the current transaction commits."""
+    bump_generation(CACHE_KEY, using)
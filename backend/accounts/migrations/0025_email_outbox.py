@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0024_delete_check_list_documents'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EMAIL_OUTBOX',
+            fields=[
+                ('EMAIL_ID', models.AutoField(db_column='EMAIL_ID', primary_key=True, serialize=False)),
+                ('SUBJECT', models.CharField(db_column='SUBJECT', max_length=255)),
+                ('BODY', models.TextField(db_column='BODY')),
+                ('FROM_EMAIL', models.CharField(blank=True, db_column='FROM_EMAIL', max_length=254, null=True)),
+                ('RECIPIENTS', models.JSONField(db_column='RECIPIENTS', default=list)),
+                ('STATUS', models.CharField(choices=[('PENDING', 'Pending'), ('SENT', 'Sent'), ('FAILED', 'Failed')], db_column='STATUS', default='PENDING', max_length=10)),
+                ('ATTEMPTS', models.IntegerField(db_column='ATTEMPTS', default=0)),
+                ('LAST_ERROR', models.TextField(blank=True, db_column='LAST_ERROR', null=True)),
+                ('NEXT_ATTEMPT_AT', models.DateTimeField(db_column='NEXT_ATTEMPT_AT', default=django.utils.timezone.now)),
+                ('CREATED_AT', models.DateTimeField(auto_now_add=True, db_column='CREATED_AT')),
+                ('SENT_AT', models.DateTimeField(blank=True, db_column='SENT_AT', null=True)),
+            ],
+            options={
+                'verbose_name': 'Email Outbox',
+                'verbose_name_plural': 'Email Outbox',
+                'db_table': 'EMAIL_OUTBOX',
+                'indexes': [models.Index(fields=['STATUS', 'NEXT_ATTEMPT_AT'], name='EMAIL_OUTBOX_PENDING_IDX')],
+            },
+        ),
+    ]
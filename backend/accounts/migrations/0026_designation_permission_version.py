@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0025_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='designation',
+            name='PERMISSION_VERSION',
+            field=models.PositiveIntegerField(db_column='PERMISSION_VERSION', default=1, help_text='Bumped on every change; JWTs carrying an older version are re-checked against the database'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:23
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0026_designation_permission_version'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='customuser',
+            name='MAX_OTP_TRY',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='OTP_ATTEMPTS',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='OTP_BLOCKED_UNTIL',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='OTP_CREATED_AT',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='OTP_EXPIRY',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='OTP_SECRET',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='OTP_VERIFIED',
+        ),
+        migrations.CreateModel(
+            name='OTP_TOKEN',
+            fields=[
+                ('USER_ID', models.CharField(db_column='USER_ID', max_length=50, primary_key=True, serialize=False)),
+                ('OTP_SECRET', models.CharField(db_column='OTP_SECRET', max_length=16)),
+                ('ATTEMPTS', models.IntegerField(db_column='ATTEMPTS', default=0)),
+                ('VERIFIED', models.BooleanField(db_column='VERIFIED', default=False)),
+                ('BLOCKED_UNTIL', models.DateTimeField(blank=True, db_column='BLOCKED_UNTIL', null=True)),
+                ('EXPIRES_AT', models.DateTimeField(db_column='EXPIRES_AT')),
+                ('CREATED_AT', models.DateTimeField(db_column='CREATED_AT', default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'OTP Token',
+                'verbose_name_plural': 'OTP Tokens',
+                'db_table': 'OTP_TOKENS',
+                'indexes': [models.Index(fields=['EXPIRES_AT'], name='OTP_TOKENS_EXPIRES_IDX')],
+            },
+        ),
+        # OTPs are short-lived; skip WAL for the table
+        migrations.RunSQL(
+            'ALTER TABLE "OTP_TOKENS" SET UNLOGGED',
+            reverse_sql='ALTER TABLE "OTP_TOKENS" SET LOGGED',
+        ),
+    ]
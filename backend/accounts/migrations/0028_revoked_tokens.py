@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:29
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0027_otp_store'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='REVOKED_TOKEN',
+            fields=[
+                ('REVOCATION_ID', models.BigAutoField(db_column='REVOCATION_ID', primary_key=True, serialize=False)),
+                ('JTI', models.CharField(db_column='JTI', max_length=255, unique=True)),
+                ('TOKEN_TYPE', models.CharField(db_column='TOKEN_TYPE', max_length=20)),
+                ('USER_ID', models.CharField(blank=True, db_column='USER_ID', max_length=50, null=True)),
+                ('EXPIRES_AT', models.DateTimeField(db_column='EXPIRES_AT')),
+                ('REVOKED_AT', models.DateTimeField(db_column='REVOKED_AT', default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Revoked Token',
+                'verbose_name_plural': 'Revoked Tokens',
+                'db_table': 'REVOKED_TOKENS',
+                'indexes': [models.Index(fields=['EXPIRES_AT'], name='REVOKED_TOKENS_EXPIRES_IDX')],
+            },
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:34
+
+from datetime import date
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def create_initial_partitions(apps, schema_editor):
+    # Current month plus the next three; later months are added by the
+    # `create_login_event_partitions` command
+    today = date.today()
+    year, month = today.year, today.month
+    for _ in range(4):
+        start = date(year, month, 1)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        end = date(year, month, 1)
+        schema_editor.execute(
+            f'CREATE TABLE IF NOT EXISTS "LOGIN_EVENTS_{start:%Y_%m}" PARTITION OF "LOGIN_EVENTS" '
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0028_revoked_tokens'),
+    ]
+
+    operations = [
+        # The table is created by hand: Django cannot declare a partitioned
+        # table, and its primary key must include the partition column
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='LOGIN_EVENT',
+                    fields=[
+                        ('EVENT_ID', models.BigAutoField(db_column='EVENT_ID', primary_key=True, serialize=False)),
+                        ('USER_ID', models.CharField(db_column='USER_ID', max_length=50)),
+                        ('EVENT_TIME', models.DateTimeField(db_column='EVENT_TIME', default=django.utils.timezone.now)),
+                        ('IP_ADDRESS', models.GenericIPAddressField(blank=True, db_column='IP_ADDRESS', null=True)),
+                        ('OUTCOME', models.CharField(choices=[('SUCCESS', 'Success'), ('FAILED_PASSWORD', 'Failed password'), ('FAILED_OTP', 'Failed OTP'), ('LOCKED', 'Account locked'), ('INACTIVE', 'Account inactive'), ('UNKNOWN_USER', 'Unknown user')], db_column='OUTCOME', max_length=20)),
+                        ('LOCK_TIER', models.PositiveSmallIntegerField(db_column='LOCK_TIER', default=0)),
+                        ('FAILED_ATTEMPTS', models.PositiveSmallIntegerField(db_column='FAILED_ATTEMPTS', default=0)),
+                    ],
+                    options={
+                        'verbose_name': 'Login Event',
+                        'verbose_name_plural': 'Login Events',
+                        'db_table': 'LOGIN_EVENTS',
+                        'indexes': [models.Index(fields=['USER_ID', '-EVENT_TIME'], name='LOGIN_EVENTS_USER_TIME_IDX')],
+                    },
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    sql=[
+                        '''
+                        CREATE TABLE "LOGIN_EVENTS" (
+                            "EVENT_ID" bigint GENERATED BY DEFAULT AS IDENTITY,
+                            "USER_ID" varchar(50) NOT NULL,
+                            "EVENT_TIME" timestamp with time zone NOT NULL,
+                            "IP_ADDRESS" inet NULL,
+                            "OUTCOME" varchar(20) NOT NULL,
+                            "LOCK_TIER" smallint NOT NULL CHECK ("LOCK_TIER" >= 0),
+                            "FAILED_ATTEMPTS" smallint NOT NULL CHECK ("FAILED_ATTEMPTS" >= 0),
+                            PRIMARY KEY ("EVENT_ID", "EVENT_TIME")
+                        ) PARTITION BY RANGE ("EVENT_TIME")
+                        ''',
+                        'CREATE TABLE "LOGIN_EVENTS_DEFAULT" PARTITION OF "LOGIN_EVENTS" DEFAULT',
+                        'CREATE INDEX "LOGIN_EVENTS_USER_TIME_IDX" ON "LOGIN_EVENTS" ("USER_ID", "EVENT_TIME" DESC)',
+                    ],
+                    reverse_sql='DROP TABLE "LOGIN_EVENTS"',
+                ),
+                migrations.RunPython(create_initial_partitions, migrations.RunPython.noop),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0029_login_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='ACCOUNT_VERSION',
+            field=models.IntegerField(db_column='ACCOUNT_VERSION', default=0),
+        ),
+    ]
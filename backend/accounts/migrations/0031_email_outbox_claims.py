@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0030_account_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='email_outbox',
+            name='CLAIMED_AT',
+            field=models.DateTimeField(blank=True, db_column='CLAIMED_AT', null=True),
+        ),
+        migrations.AddField(
+            model_name='email_outbox',
+            name='SENSITIVE',
+            field=models.BooleanField(db_column='SENSITIVE', default=False),
+        ),
+        migrations.AlterField(
+            model_name='email_outbox',
+            name='STATUS',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('SENDING', 'Sending'), ('SENT', 'Sent'), ('FAILED', 'Failed')], db_column='STATUS', default='PENDING', max_length=10),
+        ),
+    ]
@@ -1,13 +1,39 @@
-from django.db import models
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from django.conf import settings
+from django.db import models, transaction
+from django.apps import apps
+from django.db.models import Case, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from django.contrib.auth.hashers import make_password, check_password
 from django.utils import timezone
 import random
 import string
-from core.models import AuditModel
+from core.models import AuditModel, DirtyFieldsMixin, update_returning
+from .designation_cache import get_designation, has_permission
+from .otp_store import get_otp_store
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 import secrets
 from datetime import datetime, timedelta
 
+_history_executor = None
+_history_executor_lock = threading.Lock()
+
+def get_password_history_executor():
+    """
+    Shared thread pool for password history checks. PBKDF2 runs in hashlib,
+    which releases the GIL, so the hashes are verified in parallel.
+    """
+    global _history_executor
+    if _history_executor is None:
+        with _history_executor_lock:
+            if _history_executor is None:
+                _history_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'PASSWORD_HISTORY_WORKERS', 5),
+                    thread_name_prefix='password-history',
+                )
+    return _history_executor
+
 class CustomUserManager(BaseUserManager):
     def get_by_natural_key(self, username):
         """
@@ -61,6 +87,37 @@ class CustomUserManager(BaseUserManager):
         user.save(using=self._db)
         return user
 
+    def with_login_profile(self):
+        """
+        Users with their designation and login profile in one query.
+        Employee name/department/institute come from EMPLOYEE_MASTER, with
+        STUDENT_MASTER as the fallback for student accounts. Adds PROFILE_NAME,
+        PROFILE_DEPARTMENT_ID, PROFILE_INSTITUTE_CODE and PROFILE_INSTITUTE_ID.
+        """
+        employees = apps.get_model('establishments', 'EMPLOYEE_MASTER').objects.filter(
+            EMPLOYEE_ID=OuterRef('USER_ID')
+        )
+        students = apps.get_model('student', 'STUDENT_MASTER').objects.filter(
+            STUDENT_ID=OuterRef('USER_ID')
+        )
+        return self.select_related('DESIGNATION').annotate(
+            PROFILE_NAME=Coalesce(
+                Subquery(employees.values('EMP_NAME')[:1]),
+                Subquery(students.values('NAME')[:1]),
+                output_field=models.CharField(),
+            ),
+            PROFILE_DEPARTMENT_ID=Subquery(employees.values('DEPARTMENT_id')[:1]),
+            PROFILE_INSTITUTE_CODE=Coalesce(
+                Subquery(employees.values('INSTITUTE_id')[:1]),
+                Subquery(students.values('INSTITUTE')[:1]),
+                output_field=models.CharField(),
+            ),
+        ).annotate(
+            PROFILE_INSTITUTE_ID=Subquery(
+                INSTITUTE.objects.filter(CODE=OuterRef('PROFILE_INSTITUTE_CODE')).values('INSTITUTE_ID')[:1]
+            ),
+        )
+
     def make_random_password(self, length=10, 
                            allowed_chars='abcdefghjkmnpqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ23456789'):
         """
@@ -79,6 +136,11 @@ class DESIGNATION(AuditModel):
         help_text='Define permissions like {"module_name": {"action": bool}}'
     )
     IS_ACTIVE = models.BooleanField(default=True, db_column='IS_ACTIVE')
+    PERMISSION_VERSION = models.PositiveIntegerField(
+        default=1,
+        db_column='PERMISSION_VERSION',
+        help_text='Bumped on every change; JWTs carrying an older version are re-checked against the database'
+    )
     CREATED_AT = models.DateTimeField(auto_now_add=True, db_column='CREATED_AT')
     UPDATED_AT = models.DateTimeField(auto_now=True, db_column='UPDATED_AT')
     CREATED_BY = models.CharField(max_length=50, db_column='CREATED_BY', default='system')
@@ -92,6 +154,13 @@ class DESIGNATION(AuditModel):
     def __str__(self):
         return f"{self.DESIGNATION_ID} - {self.NAME}"
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.PERMISSION_VERSION = (self.PERMISSION_VERSION or 0) + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'PERMISSION_VERSION'}
+        super().save(*args, **kwargs)
+
 class PASSWORD_HISTORY(models.Model):
     PASSWORD_HISTORY_ID = models.AutoField(primary_key=True, db_column='PASSWORD_HISTORY_ID')
     USER = models.ForeignKey(
@@ -107,7 +176,154 @@ class PASSWORD_HISTORY(models.Model):
         db_table = 'PASSWORD_HISTORY'
         ordering = ['-CREATED_AT']
 
-class CustomUser(AbstractUser):
+class EMAIL_OUTBOX(models.Model):
+    """
+    Durable queue of outgoing mails. Rows are written inside the request and
+    delivered later by the `process_email_outbox` worker. Bodies of SENSITIVE
+    rows (credentials, OTPs) are blanked once delivered, failed or expired.
+    """
+    STATUS_PENDING = 'PENDING'
+    STATUS_SENDING = 'SENDING'
+    STATUS_SENT = 'SENT'
+    STATUS_FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    EMAIL_ID = models.AutoField(primary_key=True, db_column='EMAIL_ID')
+    SUBJECT = models.CharField(max_length=255, db_column='SUBJECT')
+    BODY = models.TextField(db_column='BODY')
+    FROM_EMAIL = models.CharField(max_length=254, null=True, blank=True, db_column='FROM_EMAIL')
+    RECIPIENTS = models.JSONField(default=list, db_column='RECIPIENTS')
+    STATUS = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, db_column='STATUS')
+    ATTEMPTS = models.IntegerField(default=0, db_column='ATTEMPTS')
+    LAST_ERROR = models.TextField(null=True, blank=True, db_column='LAST_ERROR')
+    NEXT_ATTEMPT_AT = models.DateTimeField(default=timezone.now, db_column='NEXT_ATTEMPT_AT')
+    SENSITIVE = models.BooleanField(default=False, db_column='SENSITIVE')
+    CLAIMED_AT = models.DateTimeField(null=True, blank=True, db_column='CLAIMED_AT')
+    CREATED_AT = models.DateTimeField(auto_now_add=True, db_column='CREATED_AT')
+    SENT_AT = models.DateTimeField(null=True, blank=True, db_column='SENT_AT')
+
+    class Meta:
+        db_table = 'EMAIL_OUTBOX'
+        verbose_name = 'Email Outbox'
+        verbose_name_plural = 'Email Outbox'
+        indexes = [
+            models.Index(fields=['STATUS', 'NEXT_ATTEMPT_AT'], name='EMAIL_OUTBOX_PENDING_IDX'),
+        ]
+
+    def __str__(self):
+        return f"{self.EMAIL_ID} - {self.SUBJECT} ({self.STATUS})"
+
+class OTP_TOKEN(models.Model):
+    """
+    Pending OTP per user, kept out of "ADMIN"."USERS". The table is UNLOGGED
+    (see migration 0027): OTPs are short-lived and may be lost on a crash.
+    Expired rows are removed by `purge_expired_otps`.
+    """
+    USER_ID = models.CharField(max_length=50, primary_key=True, db_column='USER_ID')
+    OTP_SECRET = models.CharField(max_length=16, db_column='OTP_SECRET')
+    ATTEMPTS = models.IntegerField(default=0, db_column='ATTEMPTS')
+    VERIFIED = models.BooleanField(default=False, db_column='VERIFIED')
+    BLOCKED_UNTIL = models.DateTimeField(null=True, blank=True, db_column='BLOCKED_UNTIL')
+    EXPIRES_AT = models.DateTimeField(db_column='EXPIRES_AT')
+    CREATED_AT = models.DateTimeField(default=timezone.now, db_column='CREATED_AT')
+
+    class Meta:
+        db_table = 'OTP_TOKENS'
+        verbose_name = 'OTP Token'
+        verbose_name_plural = 'OTP Tokens'
+        indexes = [
+            models.Index(fields=['EXPIRES_AT'], name='OTP_TOKENS_EXPIRES_IDX'),
+        ]
+
+    def __str__(self):
+        return f"{self.USER_ID} (expires {self.EXPIRES_AT})"
+
+class REVOKED_TOKEN(models.Model):
+    """
+    Revoked JWTs by JTI. Workers mirror this table in memory (see
+    accounts.revocation) and sync new rows by REVOCATION_ID, re-reading a
+    trailing window of IDs for rows that committed out of order.
+    """
+    REVOCATION_ID = models.BigAutoField(primary_key=True, db_column='REVOCATION_ID')
+    JTI = models.CharField(max_length=255, unique=True, db_column='JTI')
+    TOKEN_TYPE = models.CharField(max_length=20, db_column='TOKEN_TYPE')
+    USER_ID = models.CharField(max_length=50, null=True, blank=True, db_column='USER_ID')
+    EXPIRES_AT = models.DateTimeField(db_column='EXPIRES_AT')
+    REVOKED_AT = models.DateTimeField(default=timezone.now, db_column='REVOKED_AT')
+
+    class Meta:
+        db_table = 'REVOKED_TOKENS'
+        verbose_name = 'Revoked Token'
+        verbose_name_plural = 'Revoked Tokens'
+        indexes = [
+            models.Index(fields=['EXPIRES_AT'], name='REVOKED_TOKENS_EXPIRES_IDX'),
+        ]
+
+    def __str__(self):
+        return f"{self.JTI} ({self.TOKEN_TYPE})"
+
+class LoginEventQuerySet(models.QuerySet):
+    def for_user(self, user_id, since=None, until=None):
+        """
+        Login history of one user, newest first. The EVENT_TIME range is always
+        bounded (LOGIN_EVENT_HISTORY_DAYS by default) so PostgreSQL only scans
+        the monthly partitions that overlap it.
+        """
+        until = until or timezone.now()
+        if since is None:
+            since = until - timedelta(days=getattr(settings, 'LOGIN_EVENT_HISTORY_DAYS', 90))
+        return self.filter(
+            USER_ID=user_id, EVENT_TIME__gte=since, EVENT_TIME__lt=until
+        ).order_by('-EVENT_TIME')
+
+class LOGIN_EVENT(models.Model):
+    """
+    Append-only login history. In PostgreSQL the table is range-partitioned
+    by month on EVENT_TIME (see migration 0029 and accounts.login_events);
+    rows are inserted in batches by accounts.login_events.login_event_writer.
+    """
+    SUCCESS = 'SUCCESS'
+    FAILED_PASSWORD = 'FAILED_PASSWORD'
+    FAILED_OTP = 'FAILED_OTP'
+    LOCKED = 'LOCKED'
+    INACTIVE = 'INACTIVE'
+    UNKNOWN_USER = 'UNKNOWN_USER'
+    OUTCOME_CHOICES = [
+        (SUCCESS, 'Success'),
+        (FAILED_PASSWORD, 'Failed password'),
+        (FAILED_OTP, 'Failed OTP'),
+        (LOCKED, 'Account locked'),
+        (INACTIVE, 'Account inactive'),
+        (UNKNOWN_USER, 'Unknown user'),
+    ]
+
+    EVENT_ID = models.BigAutoField(primary_key=True, db_column='EVENT_ID')
+    USER_ID = models.CharField(max_length=50, db_column='USER_ID')
+    EVENT_TIME = models.DateTimeField(default=timezone.now, db_column='EVENT_TIME')
+    IP_ADDRESS = models.GenericIPAddressField(null=True, blank=True, db_column='IP_ADDRESS')
+    OUTCOME = models.CharField(max_length=20, choices=OUTCOME_CHOICES, db_column='OUTCOME')
+    LOCK_TIER = models.PositiveSmallIntegerField(default=0, db_column='LOCK_TIER')
+    FAILED_ATTEMPTS = models.PositiveSmallIntegerField(default=0, db_column='FAILED_ATTEMPTS')
+
+    objects = LoginEventQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'LOGIN_EVENTS'
+        verbose_name = 'Login Event'
+        verbose_name_plural = 'Login Events'
+        indexes = [
+            models.Index(fields=['USER_ID', '-EVENT_TIME'], name='LOGIN_EVENTS_USER_TIME_IDX'),
+        ]
+
+    def __str__(self):
+        return f"{self.USER_ID} {self.OUTCOME} at {self.EVENT_TIME}"
+
+class CustomUser(DirtyFieldsMixin, AbstractUser):
     # Disable default fields completely
     last_login = None  
     date_joined = None
@@ -188,15 +404,9 @@ class CustomUser(AbstractUser):
     PASSWORD_CHANGED_AT = models.DateTimeField(null=True, blank=True, db_column='PASSWORD_CHANGED_AT')
     PERMANENT_LOCK = models.BooleanField(default=False, db_column='PERMANENT_LOCK')
     LOCK_REASON = models.CharField(max_length=255, null=True, blank=True, db_column='LOCK_REASON')
+    # Bumped by revoke_tokens(); tokens carry it as acct_ver
+    ACCOUNT_VERSION = models.IntegerField(default=0, db_column='ACCOUNT_VERSION')
     
-    # OTP related fields
-    OTP_SECRET = models.CharField(max_length=16, null=True, blank=True, db_column='OTP_SECRET')
-    OTP_CREATED_AT = models.DateTimeField(null=True, blank=True, db_column='OTP_CREATED_AT')
-    OTP_ATTEMPTS = models.IntegerField(default=0, db_column='OTP_ATTEMPTS')
-    OTP_VERIFIED = models.BooleanField(default=False, db_column='OTP_VERIFIED')
-    MAX_OTP_TRY = models.IntegerField(default=3, db_column='MAX_OTP_TRY')
-    OTP_BLOCKED_UNTIL = models.DateTimeField(null=True, blank=True, db_column='OTP_BLOCKED_UNTIL')
-    OTP_EXPIRY = models.DateTimeField(null=True, blank=True)  # Add this field
 
     objects = CustomUserManager()
 
@@ -261,38 +471,55 @@ class CustomUser(AbstractUser):
     def get_username(self):
         return self.USERNAME
 
-    def check_password_history(self, raw_password):
+    def check_password_history(self, raw_password, workers=None):
         """Check if password exists in user's password history"""
-        for history in self.password_history.all()[:5]:
-            if check_password(raw_password, history.PASSWORD):
-                return False
-        return True
+        limit = getattr(settings, 'PASSWORD_HISTORY_LIMIT', 5)
+        if workers is None:
+            workers = getattr(settings, 'PASSWORD_HISTORY_WORKERS', 5)
+        hashes = list(
+            self.password_history.order_by('-CREATED_AT', '-PASSWORD_HISTORY_ID')
+            .values_list('PASSWORD', flat=True)[:limit]
+        )
+
+        if workers <= 1 or len(hashes) <= 1:
+            return not any(check_password(raw_password, encoded) for encoded in hashes)
+
+        matches = get_password_history_executor().map(
+            lambda encoded: check_password(raw_password, encoded), hashes
+        )
+        return not any(matches)
 
     def set_password(self, raw_password):
         """Override set_password to include password history"""
         if not raw_password:
             return
 
+        limit = getattr(settings, 'PASSWORD_HISTORY_LIMIT', 5)
+
         # Only check password history if user already exists
         if self.pk and not self.check_password_history(raw_password):
-            raise ValueError("Cannot reuse any of your last 5 passwords")
+            raise ValueError(f"Cannot reuse any of your last {limit} passwords")
 
         self.PASSWORD = make_password(raw_password)
         self.PASSWORD_CHANGED_AT = timezone.now()
         
         # Don't save or create password history during initial user creation
         if not self._state.adding:  # Only if this is an update, not a new user
-            self.save()
-            
-            PASSWORD_HISTORY.objects.create(
-                USER=self,
-                PASSWORD=self.PASSWORD
-            )
-            
-            # Keep only last 5 passwords
-            old_passwords = self.password_history.all()[5:]
-            for old_password in old_passwords:
-                old_password.delete()
+            with transaction.atomic():
+                self.save()
+
+                PASSWORD_HISTORY.objects.create(
+                    USER=self,
+                    PASSWORD=self.PASSWORD
+                )
+
+                # Keep only the last `limit` passwords with a single DELETE
+                keep = self.password_history.order_by(
+                    '-CREATED_AT', '-PASSWORD_HISTORY_ID'
+                ).values('PASSWORD_HISTORY_ID')[:limit]
+                PASSWORD_HISTORY.objects.filter(USER=self).exclude(
+                    PASSWORD_HISTORY_ID__in=keep
+                ).delete()
 
     def check_password(self, raw_password):
         return check_password(raw_password, self.PASSWORD)
@@ -309,31 +536,111 @@ class CustomUser(AbstractUser):
     def has_module_perms(self, app_label):
         return self.IS_SUPERUSER
 
+    # Failed-login lock tiers: (attempts, lock duration); None means permanent
+    LOCK_TIERS = [
+        (8, None),
+        (5, timedelta(hours=6)),
+        (3, timedelta(hours=1)),
+    ]
+    PERMANENT_LOCK_REASON = "Too many failed login attempts (8+). Administrative unlock required."
+
     def increment_failed_attempts(self):
-        self.FAILED_LOGIN_ATTEMPTS = (self.FAILED_LOGIN_ATTEMPTS or 0) + 1
-        self.LAST_FAILED_LOGIN = timezone.now()
-        
-        # Update lock status based on attempts
-        if self.FAILED_LOGIN_ATTEMPTS >= 8:
-            self.PERMANENT_LOCK = True
-            self.LOCK_REASON = "Too many failed login attempts (8+). Administrative unlock required."
-        elif self.FAILED_LOGIN_ATTEMPTS >= 5:
-            self.LOCKED_UNTIL = timezone.now() + timezone.timedelta(hours=6)
-        elif self.FAILED_LOGIN_ATTEMPTS >= 3:
-            self.LOCKED_UNTIL = timezone.now() + timezone.timedelta(hours=1)
-            
-        self.save(update_fields=[
-            'FAILED_LOGIN_ATTEMPTS', 
-            'LAST_FAILED_LOGIN',
-            'PERMANENT_LOCK',
-            'LOCK_REASON',
-            'LOCKED_UNTIL'
-        ])
+        """
+        Record a failed login with one conditional UPDATE ... RETURNING.
+        The counter, lock tier and lock check are evaluated by the database, so
+        parallel attempts are never lost. Returns False when the account was
+        already locked (possibly by a concurrent request) and nothing was counted.
+        """
+        current_time = timezone.now()
+        locked_until = [
+            When(FAILED_LOGIN_ATTEMPTS__gte=attempts - 1, then=Value(current_time + duration))
+            for attempts, duration in self.LOCK_TIERS if duration
+        ]
+        permanent_at = min(attempts for attempts, duration in self.LOCK_TIERS if duration is None)
+
+        rows = update_returning(
+            CustomUser.objects.filter(
+                Q(LOCKED_UNTIL__isnull=True) | Q(LOCKED_UNTIL__lte=current_time),
+                pk=self.pk,
+                PERMANENT_LOCK=False,
+            ),
+            ['FAILED_LOGIN_ATTEMPTS', 'LAST_FAILED_LOGIN', 'LOCKED_UNTIL', 'PERMANENT_LOCK', 'LOCK_REASON'],
+            FAILED_LOGIN_ATTEMPTS=F('FAILED_LOGIN_ATTEMPTS') + 1,
+            LAST_FAILED_LOGIN=Value(current_time),
+            LOCKED_UNTIL=Case(*locked_until, default=F('LOCKED_UNTIL')),
+            PERMANENT_LOCK=Case(
+                When(FAILED_LOGIN_ATTEMPTS__gte=permanent_at - 1, then=Value(True)),
+                default=Value(False),
+            ),
+            LOCK_REASON=Case(
+                When(FAILED_LOGIN_ATTEMPTS__gte=permanent_at - 1, then=Value(self.PERMANENT_LOCK_REASON)),
+                default=F('LOCK_REASON'),
+            ),
+        )
+        if not rows:
+            return False
+
+        was_locked = self.is_account_locked()[0]
+        for field, value in rows[0].items():
+            setattr(self, field, value)
+        self._snapshot_loaded_values(rows[0].keys())
+        if not was_locked and self.is_account_locked()[0]:
+            self.revoke_tokens()
+        return True
+
+    def revoke_tokens(self):
+        """
+        Bump ACCOUNT_VERSION and revoke every token issued with the previous
+        one (see accounts.revocation). Called when the account is deactivated,
+        locked, demoted, moved to another designation or gets a new password.
+        """
+        from .revocation import revoke_account
+
+        rows = update_returning(
+            CustomUser.objects.filter(pk=self.pk), ['ACCOUNT_VERSION'],
+            ACCOUNT_VERSION=F('ACCOUNT_VERSION') + 1,
+        )
+        if rows:
+            self.ACCOUNT_VERSION = rows[0]['ACCOUNT_VERSION']
+            self._snapshot_loaded_values(['ACCOUNT_VERSION'])
+            revoke_account(self.USER_ID, self.ACCOUNT_VERSION - 1)
+
+    def _disables_tokens(self, update_fields=None):
+        """Whether saving these changes must revoke the tokens of the account."""
+        loaded = getattr(self, '_loaded_values', None)
+        if self._state.adding or not loaded:
+            return False
+
+        def changed(name):
+            attname = self._meta.get_field(name).attname
+            if update_fields is not None and name not in update_fields and attname not in update_fields:
+                return False
+            return attname in loaded and loaded[attname] != getattr(self, attname)
+
+        # Tokens carry is_superuser and the designation as claims, trusted
+        # until they expire (see accounts.authentication); any demotion counts
+        return (
+            changed('PASSWORD')
+            or (changed('IS_ACTIVE') and not self.IS_ACTIVE)
+            or (changed('IS_LOCKED') and self.IS_LOCKED)
+            or (changed('PERMANENT_LOCK') and self.PERMANENT_LOCK)
+            or (changed('IS_SUPERUSER') and not self.IS_SUPERUSER)
+            or (changed('IS_STAFF') and not self.IS_STAFF)
+            or changed('DESIGNATION')
+        )
+
+    def get_lock_tier(self):
+        """Lock tiers reached by the current failure count: 0 (none) to 3 (permanent)."""
+        attempts = self.FAILED_LOGIN_ATTEMPTS or 0
+        return sum(1 for threshold, duration in self.LOCK_TIERS if attempts >= threshold)
 
     def reset_failed_attempts(self):
         if self.PERMANENT_LOCK:
             return False  # Can't reset if permanently locked
-            
+
+        if not self.FAILED_LOGIN_ATTEMPTS and not self.LAST_FAILED_LOGIN and not self.LOCKED_UNTIL:
+            return True  # Nothing to reset, skip the write
+
         self.FAILED_LOGIN_ATTEMPTS = 0
         self.LAST_FAILED_LOGIN = None
         self.LOCKED_UNTIL = None
@@ -350,88 +657,54 @@ class CustomUser(AbstractUser):
         - 3 failed attempts: 1 hour lock
         - 5 failed attempts: 6 hours lock
         - 8 or more attempts: permanent lock (admin unlock required)
+        Tiers are applied by increment_failed_attempts; this check only reads
+        the loaded row. The counter is kept after a lock expires so repeated
+        failures escalate, and is reset on a successful login.
         """
         if self.PERMANENT_LOCK:
             return True, "Account is permanently locked. Please contact administrator."
 
-        if not self.FAILED_LOGIN_ATTEMPTS or not self.LAST_FAILED_LOGIN:
-            return False, "Account is not locked."
-
         current_time = timezone.now()
-
-        # Check for permanent lock (8+ attempts)
-        if self.FAILED_LOGIN_ATTEMPTS >= 8:
-            self.PERMANENT_LOCK = True
-            self.LOCK_REASON = "Too many failed login attempts (8+). Administrative unlock required."
-            self.save(update_fields=['PERMANENT_LOCK', 'LOCK_REASON'])
-            return True, "Account has been permanently locked due to too many failed attempts. Please contact administrator."
-
-        # Check for 6-hour lock (5-7 attempts)
-        if self.FAILED_LOGIN_ATTEMPTS >= 5:
-            lock_duration = timezone.timedelta(hours=6)
-            lock_end_time = self.LAST_FAILED_LOGIN + lock_duration
-            if current_time < lock_end_time:
-                remaining_time = lock_end_time - current_time
-                hours = int(remaining_time.total_seconds() // 3600)
-                minutes = int((remaining_time.total_seconds() % 3600) // 60)
+        if self.LOCKED_UNTIL and current_time < self.LOCKED_UNTIL:
+            remaining_time = self.LOCKED_UNTIL - current_time
+            hours = int(remaining_time.total_seconds() // 3600)
+            minutes = int((remaining_time.total_seconds() % 3600) // 60)
+            if hours:
                 return True, f"Account is locked for {hours}h {minutes}m due to multiple failed attempts."
+            return True, f"Account is locked for {minutes} minutes due to failed attempts."
 
-        # Check for 1-hour lock (3-4 attempts)
-        if self.FAILED_LOGIN_ATTEMPTS >= 3:
-            lock_duration = timezone.timedelta(hours=1)
-            lock_end_time = self.LAST_FAILED_LOGIN + lock_duration
-            if current_time < lock_end_time:
-                remaining_time = lock_end_time - current_time
-                minutes = int(remaining_time.total_seconds() // 60)
-                return True, f"Account is locked for {minutes} minutes due to failed attempts."
-
-        # Reset failed attempts if lock period has expired
-        self.reset_failed_attempts()
         return False, "Account is not locked."
 
     def update_login_info(self, ip_address):
-        """Update login audit information"""
+        """
+        Record a successful login. The full history goes to LOGIN_EVENTS via
+        the buffered writer; the USERS row keeps only the latest login and
+        writes just the columns that changed.
+        """
+        from .login_events import record_login_event
+
         current_time = timezone.now()
-        update_fields = [
-            'LAST_LOGIN_IP',
-            'LAST_LOGIN',
-            'LAST_LOGIN_ATTEMPT',
-            'FAILED_LOGIN_ATTEMPTS',
-            'IS_LOCKED',
-            'LOCKED_UNTIL'
-        ]
-        
         self.LAST_LOGIN_IP = ip_address
         self.LAST_LOGIN = current_time
         self.LAST_LOGIN_ATTEMPT = current_time
         self.FAILED_LOGIN_ATTEMPTS = 0
         self.IS_LOCKED = False
         self.LOCKED_UNTIL = None
-        
-        self.save(update_fields=update_fields)
+
+        record_login_event(self.USER_ID, LOGIN_EVENT.SUCCESS, ip_address, user=self)
+        dirty_fields = self.get_dirty_fields()
+        if dirty_fields is None:
+            dirty_fields = [
+                'LAST_LOGIN_IP', 'LAST_LOGIN', 'LAST_LOGIN_ATTEMPT',
+                'FAILED_LOGIN_ATTEMPTS', 'IS_LOCKED', 'LOCKED_UNTIL',
+            ]
+        self.save(update_fields=dirty_fields)
 
     def generate_otp(self):
+        """Issue a new 6-digit OTP in the configured OTP store (see accounts.otp_store)"""
         try:
             otp = ''.join(secrets.choice(string.digits) for _ in range(6))
-            current_time = timezone.now()
-            expiry = current_time + timezone.timedelta(minutes=3)
-            
-            update_fields = {
-                'OTP_SECRET': otp,
-                'OTP_EXPIRY': expiry,
-                'OTP_CREATED_AT': current_time,
-                'OTP_ATTEMPTS': 0,
-                'OTP_VERIFIED': False,
-                'OTP_BLOCKED_UNTIL': None  # Reset blocking when new OTP generated
-            }
-            
-            # Update all fields atomically
-            CustomUser.objects.filter(pk=self.pk).update(**update_fields)
-            
-            # Update instance attributes
-            for field, value in update_fields.items():
-                setattr(self, field, value)
-            
+            get_otp_store().issue(self.USER_ID, otp)
             return otp
         except Exception as e:
             print(f"OTP Generation error: {str(e)}")
@@ -439,99 +712,64 @@ class CustomUser(AbstractUser):
 
     def verify_otp(self, otp, clear_on_success=False):
         try:
-            current_time = timezone.now()
-
-            # Check if OTP is blocked
-            if self.OTP_BLOCKED_UNTIL and current_time < self.OTP_BLOCKED_UNTIL:
-                block_remaining = self.OTP_BLOCKED_UNTIL - current_time
-                minutes = int(block_remaining.total_seconds() // 60)
-                return False, f"OTP verification blocked for {minutes} minutes"
-
-            if not self.OTP_SECRET or not self.OTP_EXPIRY:
-                return False, "No valid OTP found"
-
-            if current_time > self.OTP_EXPIRY:
-                self.OTP_SECRET = None
-                self.OTP_EXPIRY = None
-                self.save(update_fields=['OTP_SECRET', 'OTP_EXPIRY'])
-                return False, "OTP has expired"
-
-            if self.OTP_ATTEMPTS >= self.MAX_OTP_TRY:
-                # Block OTP verification for 15 minutes
-                self.OTP_BLOCKED_UNTIL = current_time + timezone.timedelta(minutes=15)
-                self.save(update_fields=['OTP_BLOCKED_UNTIL'])
-                return False, "Too many attempts. Try again after 15 minutes"
-
-            if otp != self.OTP_SECRET:
-                self.OTP_ATTEMPTS += 1
-                self.save(update_fields=['OTP_ATTEMPTS'])
-                remaining = self.MAX_OTP_TRY - self.OTP_ATTEMPTS
-                return False, f"Invalid OTP. {remaining} attempts remaining"
-
-            # Success case
-            update_fields = {
-                'OTP_VERIFIED': True,
-                'OTP_ATTEMPTS': 0
-            }
-            
-            if clear_on_success:
-                update_fields.update({
-                    'OTP_SECRET': None,
-                    'OTP_EXPIRY': None
-                })
-
-            # Update all fields
-            for field, value in update_fields.items():
-                setattr(self, field, value)
-            self.save(update_fields=list(update_fields.keys()))
-            
-            return True, "OTP verified successfully"
-            
+            return get_otp_store().verify(self.USER_ID, otp, clear_on_success=clear_on_success)
         except Exception as e:
             print(f"OTP verification error: {str(e)}")
             return False, "Error during OTP verification"
 
+    def clear_otp(self):
+        get_otp_store().clear(self.USER_ID)
+
     def has_module_permission(self, module_name):
         """Check if user has permission for a module based on designation"""
-        if self.IS_SUPERUSER:
-            return True
-        return self.DESIGNATION.PERMISSIONS.get(module_name, {}).get('access', False)
+        return self.has_action_permission(module_name, 'access')
 
     def has_action_permission(self, module_name, action):
         """Check if user has permission for specific action in a module"""
         if self.IS_SUPERUSER:
             return True
-        return self.DESIGNATION.PERMISSIONS.get(module_name, {}).get(action, False)
+        # Compiled permissions from the designation cache, no DESIGNATION query
+        designation = get_designation(designation_id=self.DESIGNATION_id)
+        return has_permission(designation, module_name, action)
 
     @classmethod
     def get_email_field_name(cls):
         return cls.EMAIL_FIELD
 
-    def save(self, *args, **kwargs):
-        if self.pk:  # If this is an update
-            try:
-                old_instance = self.__class__.objects.filter(pk=self.pk).first()
-                if old_instance:
-                    # Store all audit fields
-                    audit_fields = [
-                        'LAST_LOGIN_ATTEMPT',
-                        'LAST_FAILED_LOGIN',
-                        'LAST_LOGIN_IP',
-                        'FAILED_LOGIN_ATTEMPTS',
-                        'IS_LOCKED',
-                        'LOCKED_UNTIL',
-                        'PERMANENT_LOCK',
-                        'LOCK_REASON',
-                        'OTP_BLOCKED_UNTIL'
-                    ]
-                    # Preserve existing audit field values
-                    for field in audit_fields:
-                        current_value = getattr(self, field, None)
-                        if current_value is None:
-                            setattr(self, field, getattr(old_instance, field, None))
-            except self.__class__.DoesNotExist:
-                pass
-        super().save(*args, **kwargs)
+    # Login/lock audit fields are never cleared by a plain save(); clearing
+    # one requires naming it in update_fields (see reset_failed_attempts).
+    AUDIT_FIELDS = [
+        'LAST_LOGIN_ATTEMPT',
+        'LAST_FAILED_LOGIN',
+        'LAST_LOGIN_IP',
+        'FAILED_LOGIN_ATTEMPTS',
+        'IS_LOCKED',
+        'LOCKED_UNTIL',
+        'PERMANENT_LOCK',
+        'LOCK_REASON',
+    ]
+
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        if not self._state.adding and update_fields is None and not force_insert:
+            dirty_fields = self.get_dirty_fields()
+            if dirty_fields is not None:  # Loaded from the DB: write only changed columns
+                dirty_fields = [
+                    field for field in dirty_fields
+                    if field not in self.AUDIT_FIELDS or getattr(self, field) is not None
+                ]
+                # Even with nothing changed, a save stamps UPDATED_AT and sends the signals
+                update_fields = dirty_fields + ['UPDATED_AT']
+        kwargs = {
+            'force_insert': force_insert, 'force_update': force_update, 'using': using, 'update_fields': update_fields,
+        }
+        if self._disables_tokens(update_fields):
+            with transaction.atomic(using=using):
+                super().save(**kwargs)
+                self._snapshot_loaded_values(update_fields)
+                self.revoke_tokens()
+            return
+        super().save(**kwargs)
+        self._snapshot_loaded_values(update_fields)
 
     def delete(self, *args, **kwargs):
         super().delete(*args, **kwargs)
@@ -0,0 +1,204 @@
+"""
+Pluggable storage for login/password-reset OTPs.
+
+OTP state used to live in "ADMIN"."USERS", so every OTP request and every
+wrong guess rewrote the hottest row in the database. The stores below keep it
+elsewhere; settings.OTP_STORE selects one:
+
+- DatabaseOTPStore: the UNLOGGED OTP_TOKENS table, one row per user with an
+  index on EXPIRES_AT. Issuing is a single upsert and attempts are counted with
+  a single conditional UPDATE ... RETURNING.
+- CacheOTPStore: a Django cache (settings.OTP_CACHE_ALIAS). Entries expire with
+  the cache timeout and attempts are counted with cache.incr. Use a shared
+  backend such as Redis or Memcached when running several workers.
+"""
+import hmac
+from abc import ABC, abstractmethod
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.models import update_returning
+
+_stores = {}
+
+
+def get_otp_store():
+    path = getattr(settings, 'OTP_STORE', 'accounts.otp_store.DatabaseOTPStore')
+    if path not in _stores:
+        _stores[path] = import_string(path)()
+    return _stores[path]
+
+
+class BaseOTPStore(ABC):
+    SUCCESS_MESSAGE = "OTP verified successfully"
+
+    @property
+    def expiry(self):
+        return timedelta(minutes=getattr(settings, 'OTP_EXPIRY_MINUTES', 3))
+
+    @property
+    def max_attempts(self):
+        return getattr(settings, 'OTP_MAX_ATTEMPTS', 3)
+
+    @property
+    def block_time(self):
+        return timedelta(minutes=getattr(settings, 'OTP_BLOCK_MINUTES', 15))
+
+    def blocked_message(self, blocked_until):
+        minutes = int((blocked_until - timezone.now()).total_seconds() // 60)
+        return f"OTP verification blocked for {minutes} minutes"
+
+    def attempts_message(self, attempts):
+        remaining = self.max_attempts - attempts
+        if remaining <= 0:
+            return f"Too many attempts. Try again after {int(self.block_time.total_seconds() // 60)} minutes"
+        return f"Invalid OTP. {remaining} attempts remaining"
+
+    @abstractmethod
+    def issue(self, user_id, otp):
+        """Store a new OTP for the user, replacing any previous one and lifting a block."""
+
+    @abstractmethod
+    def verify(self, user_id, otp, clear_on_success=False):
+        """Check an OTP and count the attempt. Returns (is_valid, message)."""
+
+    @abstractmethod
+    def clear(self, user_id):
+        """Remove the user's OTP."""
+
+    def purge_expired(self):
+        """Remove expired entries; returns the number removed."""
+        return 0
+
+
+class DatabaseOTPStore(BaseOTPStore):
+    def issue(self, user_id, otp):
+        from .models import OTP_TOKEN
+
+        now = timezone.now()
+        OTP_TOKEN.objects.bulk_create(
+            [OTP_TOKEN(
+                USER_ID=user_id,
+                OTP_SECRET=otp,
+                ATTEMPTS=0,
+                VERIFIED=False,
+                BLOCKED_UNTIL=None,
+                EXPIRES_AT=now + self.expiry,
+                CREATED_AT=now,
+            )],
+            update_conflicts=True,
+            unique_fields=['USER_ID'],
+            update_fields=['OTP_SECRET', 'ATTEMPTS', 'VERIFIED', 'BLOCKED_UNTIL', 'EXPIRES_AT', 'CREATED_AT'],
+        )
+
+    def verify(self, user_id, otp, clear_on_success=False):
+        from .models import OTP_TOKEN
+
+        now = timezone.now()
+        active = OTP_TOKEN.objects.filter(
+            Q(BLOCKED_UNTIL__isnull=True) | Q(BLOCKED_UNTIL__lte=now),
+            USER_ID=user_id,
+            EXPIRES_AT__gt=now,
+        )
+
+        # Correct OTP: one statement
+        matching = active.filter(OTP_SECRET=otp)
+        if clear_on_success:
+            if matching.delete()[0]:
+                return True, self.SUCCESS_MESSAGE
+        elif update_returning(matching, ['USER_ID'], ATTEMPTS=Value(0), VERIFIED=Value(True)):
+            return True, self.SUCCESS_MESSAGE
+
+        # Wrong OTP: count the attempt and block at the limit in the same statement
+        rows = update_returning(
+            active,
+            ['ATTEMPTS'],
+            ATTEMPTS=F('ATTEMPTS') + 1,
+            BLOCKED_UNTIL=Case(
+                When(ATTEMPTS__gte=self.max_attempts - 1, then=Value(now + self.block_time)),
+                default=Value(None),
+            ),
+        )
+        if rows:
+            return False, self.attempts_message(rows[0]['ATTEMPTS'])
+
+        # No usable OTP: report why
+        token = OTP_TOKEN.objects.filter(USER_ID=user_id).first()
+        if token is None:
+            return False, "No valid OTP found"
+        if token.BLOCKED_UNTIL and now < token.BLOCKED_UNTIL:
+            return False, self.blocked_message(token.BLOCKED_UNTIL)
+        token.delete()
+        return False, "OTP has expired"
+
+    def clear(self, user_id):
+        from .models import OTP_TOKEN
+
+        OTP_TOKEN.objects.filter(USER_ID=user_id).delete()
+
+    def purge_expired(self):
+        from .models import OTP_TOKEN
+
+        now = timezone.now()
+        deleted, _ = OTP_TOKEN.objects.filter(
+            Q(BLOCKED_UNTIL__isnull=True) | Q(BLOCKED_UNTIL__lte=now),
+            EXPIRES_AT__lte=now,
+        ).delete()
+        return deleted
+
+
+class CacheOTPStore(BaseOTPStore):
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'OTP_CACHE_ALIAS', 'default')]
+
+    def keys(self, user_id):
+        prefix = f'otp:{user_id}'
+        return prefix, f'{prefix}:attempts', f'{prefix}:blocked'
+
+    def issue(self, user_id, otp):
+        otp_key, attempts_key, blocked_key = self.keys(user_id)
+        expires_at = timezone.now() + self.expiry
+        timeout = self.expiry.total_seconds()
+        self.cache.set_many({
+            otp_key: {'otp': otp, 'verified': False, 'expires_at': expires_at},
+            attempts_key: 0,
+        }, timeout)
+        self.cache.delete(blocked_key)
+
+    def verify(self, user_id, otp, clear_on_success=False):
+        otp_key, attempts_key, blocked_key = self.keys(user_id)
+        cache = self.cache
+
+        blocked_until = cache.get(blocked_key)
+        if blocked_until and timezone.now() < blocked_until:
+            return False, self.blocked_message(blocked_until)
+
+        entry = cache.get(otp_key)
+        if entry is None:
+            return False, "No valid OTP found"
+
+        if hmac.compare_digest(str(otp), entry['otp']):
+            if clear_on_success:
+                cache.delete_many([otp_key, attempts_key])
+            else:
+                timeout = max((entry['expires_at'] - timezone.now()).total_seconds(), 1)
+                cache.set_many({otp_key: {**entry, 'verified': True}, attempts_key: 0}, timeout)
+            return True, self.SUCCESS_MESSAGE
+
+        try:
+            attempts = cache.incr(attempts_key)
+        except ValueError:  # Counter evicted or expired
+            attempts = 1
+            cache.set(attempts_key, attempts, self.expiry.total_seconds())
+        if attempts >= self.max_attempts:
+            cache.set(blocked_key, timezone.now() + self.block_time, self.block_time.total_seconds())
+        return False, self.attempts_message(attempts)
+
+    def clear(self, user_id):
+        self.cache.delete_many(self.keys(user_id))
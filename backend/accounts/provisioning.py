@@ -0,0 +1,164 @@
+"""
+Bulk creation of login accounts.
+
+Creating accounts one by one costs a PBKDF2 hash, an INSERT and a second
+UPDATE (set_password + save) each. provision_accounts() hashes all passwords
+up front -- across a process pool for larger batches, since PBKDF2 is
+CPU-bound -- inserts the users with bulk_create and queues the credential
+mails in the outbox with a single INSERT.
+"""
+import logging
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from core import monitoring
+from utils.email_outbox import queue_emails
+from .models import PASSWORD_HISTORY, CustomUser
+
+logger = logging.getLogger(__name__)
+
+ProvisioningResult = namedtuple('ProvisioningResult', ['users', 'passwords', 'seconds', 'accounts_per_sec'])
+
+
+def _init_worker():
+    # Spawned workers (non-fork start methods) need Django configured to hash
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def hash_passwords(passwords, workers=None):
+    """make_password for every password, in a process pool for large batches."""
+    passwords = list(passwords)
+    if workers is None:
+        workers = getattr(settings, 'PROVISIONING_WORKERS', None) or os.cpu_count() or 1
+    threshold = getattr(settings, 'PROVISIONING_PARALLEL_THRESHOLD', 16)
+    if workers <= 1 or len(passwords) < threshold:
+        return [make_password(password) for password in passwords]
+
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        return list(executor.map(make_password, passwords, chunksize=chunksize))
+
+
+def find_account_conflicts(accounts):
+    """
+    {index: {field: [message]}} for accounts whose USER_ID, USERNAME or EMAIL
+    is taken, or repeats an earlier account of the list; one query per field.
+    """
+    conflicts = {}
+    for field in ('USER_ID', 'USERNAME', 'EMAIL'):
+        values = [account[field] for account in accounts]
+        taken = set(CustomUser.objects.filter(**{f'{field}__in': values}).values_list(field, flat=True))
+        seen = set()
+        for index, value in enumerate(values):
+            if value in taken:
+                conflicts.setdefault(index, {})[field] = [f"{value} is already taken."]
+            elif value in seen:
+                conflicts.setdefault(index, {})[field] = [f"{value} repeats an earlier row."]
+            seen.add(value)
+    return conflicts
+
+
+def account_conflict_errors(accounts, lines, columns):
+    """
+    find_account_conflicts() keyed for an import: {line: {column: [message]}},
+    `lines` being the file line of each account and `columns` the file column
+    each of USER_ID, USERNAME and EMAIL comes from.
+    """
+    errors = {}
+    for index, conflicts in find_account_conflicts(accounts).items():
+        for field, messages in conflicts.items():
+            errors.setdefault(lines[index], {}).setdefault(columns[field], []).extend(messages)
+    return errors
+
+
+def credentials_email(kind):
+    """
+    The `credentials_email` callback of provision_accounts() for 'student',
+    'employee' or other ('user') accounts.
+    """
+    subject, account_name, id_label = {
+        'student': ("Your Student Account Credentials", "student account", "Student ID"),
+        'employee': ("Your College ERP Account Credentials", "College ERP account", "Employee ID"),
+        'user': ("Your College ERP Account Credentials", "College ERP account", "User ID"),
+    }[kind]
+
+    def render(account, password):
+        return subject, f"""
+    Dear {account.get('FIRST_NAME') or account['USERNAME']},
+
+    Your {account_name} has been created. Here are your login credentials:
+
+    {id_label}: {account['USER_ID']}
+    Username: {account['USERNAME']}
+    Password: {password}
+
+    Please change your password after first login.
+
+    Best regards,
+    College ERP Team
+    """
+
+    return render
+
+
+def provision_accounts(accounts, credentials_email=None, batch_size=500, workers=None, from_email=None, hashes=None):
+    """
+    Create CustomUser rows in bulk.
+
+    `accounts` is a list of dicts with USER_ID, USERNAME, EMAIL and optionally
+    `password` (generated when missing) plus any other CustomUser fields.
+    `hashes` may hold the hash_passwords() of those passwords, computed
+    earlier, e.g. before a transaction that holds locks.
+    `credentials_email(account, password)` returns (subject, message) for the
+    credentials mail, or None to skip it. Returns a ProvisioningResult.
+    """
+    started = time.perf_counter()
+    accounts = [dict(account) for account in accounts]
+    passwords = [
+        account.pop('password', None) or CustomUser.objects.make_random_password()
+        for account in accounts
+    ]
+    if hashes is None:
+        hashes = hash_passwords(passwords, workers=workers)
+
+    now = timezone.now()
+    users = [
+        CustomUser(
+            **{**account, 'EMAIL': CustomUser.objects.normalize_email(account['EMAIL'])},
+            PASSWORD=encoded,
+            PASSWORD_CHANGED_AT=now,
+        )
+        for account, encoded in zip(accounts, hashes)
+    ]
+
+    with transaction.atomic():
+        CustomUser.objects.bulk_create(users, batch_size=batch_size)
+        # Seed the history so the initial password counts against reuse
+        PASSWORD_HISTORY.objects.bulk_create(
+            [PASSWORD_HISTORY(USER=user, PASSWORD=user.PASSWORD) for user in users],
+            batch_size=batch_size,
+        )
+        if credentials_email:
+            messages = []
+            for account, user, password in zip(accounts, users, passwords):
+                content = credentials_email(account, password)
+                if content:
+                    messages.append((content[0], content[1], [user.EMAIL]))
+            queue_emails(messages, from_email=from_email, sensitive=True)
+
+    seconds = time.perf_counter() - started
+    rate = len(users) / seconds if seconds else float(len(users))
+    monitoring.increment('provisioning.accounts', len(users))
+    logger.info(f"Provisioned {len(users)} accounts in {seconds:.2f}s ({rate:.1f} accounts/sec)")
+    return ProvisioningResult(users, passwords, seconds, rate)
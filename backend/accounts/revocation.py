@@ -0,0 +1,214 @@
+"""
+JWT revocation without a per-request database lookup.
+
+Revoked JTIs are stored in REVOKED_TOKENS. Each worker mirrors the unexpired
+rows in a Bloom filter and a bounded exact set:
+
+- Bloom filter miss: the token is not revoked (the common case, no I/O).
+- Bloom hit and exact-set hit: revoked.
+- Bloom hit only: false positive or an entry trimmed from the exact set, so
+  the database is asked.
+
+New rows are pulled incrementally by REVOCATION_ID every
+REVOCATION_SYNC_INTERVAL seconds; a revocation made on another worker is
+therefore honoured here within that interval. IDs are handed out at insert
+but become visible at commit, so each sync re-reads the last
+REVOCATION_SYNC_OVERLAP IDs too, picking up rows that committed out of order. The structures are rebuilt from
+scratch every REVOCATION_REBUILD_INTERVAL seconds to drop expired tokens.
+
+Deactivating, locking, demoting (IS_SUPERUSER/IS_STAFF removed), moving to
+another designation or changing the password of an account bumps
+CustomUser.ACCOUNT_VERSION and revokes the previous version as a whole: the
+row's JTI is "account:<USER_ID>:<version>", matched against the acct_ver
+claim of every token (see accounts.authentication).
+"""
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from core import monitoring
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(capacity, 1)
+        self.size = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hash_count = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.bloom = None
+            self.exact = OrderedDict()
+            self.last_id = 0
+            self.synced_at = None
+            self.built_at = None
+
+    # Settings are read on use so tests can override them
+    @property
+    def capacity(self):
+        return getattr(settings, 'REVOCATION_BLOOM_CAPACITY', 100000)
+
+    @property
+    def exact_size(self):
+        return getattr(settings, 'REVOCATION_EXACT_SET_SIZE', 10000)
+
+    def _remember(self, jti):
+        if self.bloom.count >= self.bloom.capacity:
+            # Past capacity the false-positive rate climbs; rebuild larger next time
+            self.built_at = None
+        self.bloom.add(jti)
+        self.exact[jti] = True
+        self.exact.move_to_end(jti)
+        while len(self.exact) > self.exact_size:
+            self.exact.popitem(last=False)
+
+    def _rebuild(self):
+        from .models import REVOKED_TOKEN
+
+        rows = list(
+            REVOKED_TOKEN.objects.filter(EXPIRES_AT__gt=timezone.now())
+            .order_by('REVOCATION_ID').values_list('REVOCATION_ID', 'JTI')
+        )
+        self.bloom = BloomFilter(max(self.capacity, len(rows) * 2))
+        self.exact = OrderedDict()
+        self.last_id = 0
+        for revocation_id, jti in rows:
+            self._remember(jti)
+            self.last_id = revocation_id
+        self.built_at = self.synced_at = time.monotonic()
+        monitoring.increment('revocation.rebuilds')
+
+    def _sync(self):
+        from .models import REVOKED_TOKEN
+
+        overlap = getattr(settings, 'REVOCATION_SYNC_OVERLAP', 1000)
+        rows = REVOKED_TOKEN.objects.filter(REVOCATION_ID__gt=self.last_id - overlap).order_by(
+            'REVOCATION_ID'
+        ).values_list('REVOCATION_ID', 'JTI')
+        for revocation_id, jti in rows:
+            # Seen in an earlier sync; a false positive here is still checked
+            # against the database by is_revoked()
+            if jti not in self.bloom:
+                self._remember(jti)
+            self.last_id = max(self.last_id, revocation_id)
+        self.synced_at = time.monotonic()
+
+    def refresh(self):
+        now = time.monotonic()
+        rebuild_interval = getattr(settings, 'REVOCATION_REBUILD_INTERVAL', 3600)
+        sync_interval = getattr(settings, 'REVOCATION_SYNC_INTERVAL', 5)
+        if self.built_at is not None and now - self.synced_at < sync_interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            if self.built_at is None or now - self.built_at >= rebuild_interval:
+                self._rebuild()
+            elif now - self.synced_at >= sync_interval:
+                self._sync()
+
+    def is_revoked(self, jti):
+        self.refresh()
+        if jti not in self.bloom:
+            return False
+        if jti in self.exact:
+            return True
+
+        from .models import REVOKED_TOKEN
+
+        monitoring.increment('revocation.db_checks')
+        revoked = REVOKED_TOKEN.objects.filter(JTI=jti).exists()
+        if revoked:
+            with self.lock:
+                self._remember(jti)
+        return revoked
+
+    def revoke(self, token, user_id=None):
+        from .models import REVOKED_TOKEN
+
+        jti = token[api_settings.JTI_CLAIM]
+        REVOKED_TOKEN.objects.bulk_create(
+            [REVOKED_TOKEN(
+                JTI=jti,
+                TOKEN_TYPE=token.get('token_type', ''),
+                USER_ID=user_id,
+                EXPIRES_AT=datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc),
+            )],
+            ignore_conflicts=True,
+        )
+        self.refresh()
+        with self.lock:
+            self._remember(jti)
+
+    def revoke_key(self, key, token_type, expires_at, user_id=None):
+        """Revoke an arbitrary key; remembered locally once the transaction commits."""
+        from .models import REVOKED_TOKEN
+
+        REVOKED_TOKEN.objects.bulk_create(
+            [REVOKED_TOKEN(JTI=key, TOKEN_TYPE=token_type, USER_ID=user_id, EXPIRES_AT=expires_at)],
+            ignore_conflicts=True,
+        )
+
+        def remember():
+            self.refresh()
+            with self.lock:
+                self._remember(key)
+
+        transaction.on_commit(remember)
+
+
+revocation_list = RevocationList()
+
+
+def account_key(user_id, version):
+    return f'account:{user_id}:{version}'
+
+
+def revoke_token(token, user_id=None):
+    revocation_list.revoke(token, user_id=user_id)
+
+
+def revoke_account(user_id, version):
+    """Revoke every token issued to `user_id` while its ACCOUNT_VERSION was `version`."""
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    revocation_list.revoke_key(
+        account_key(user_id, version), 'account', timezone.now() + lifetime, user_id=user_id
+    )
+
+
+def is_token_revoked(token):
+    jti = token.get(api_settings.JTI_CLAIM)
+    if jti and revocation_list.is_revoked(jti):
+        return True
+    version = token.get('acct_ver')
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    return version is not None and revocation_list.is_revoked(account_key(user_id, version))
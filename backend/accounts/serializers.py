@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .hierarchy import hierarchy_node
 from .models import COUNTRY, STATE, CITY, CURRENCY, LANGUAGE, DESIGNATION, CATEGORY, UNIVERSITY, INSTITUTE, DEPARTMENT, PROGRAM, BRANCH, YEAR, SEMESTER, ACADEMIC_YEAR, SEMESTER_DURATION, DASHBOARD_MASTER, CASTE_MASTER, QUOTA_MASTER, ADMISSION_QUOTA_MASTER 
 
 class CountrySerializer(serializers.ModelSerializer):
@@ -108,9 +109,26 @@ class ProgramSerializer(serializers.ModelSerializer):
             'IS_ACTIVE', 'CREATED_BY', 'UPDATED_BY'
         ]
 
+class HierarchyAttributeField(serializers.ReadOnlyField):
+    """
+    An attribute of the accounts.hierarchy registry node whose id is the
+    field's source, e.g. HierarchyAttributeField('program', 'parent.code',
+    source='PROGRAM_id') for the institute code of a branch.
+    """
+    def __init__(self, level, path, **kwargs):
+        self.level = level
+        self.path = path.split('.')
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        node = hierarchy_node(self.level, value)
+        for attr in self.path:
+            node = getattr(node, attr, None)
+        return node
+
 class BranchSerializer(serializers.ModelSerializer):
-    PROGRAM_CODE = serializers.CharField(source='PROGRAM.CODE', read_only=True)
-    INSTITUTE_CODE = serializers.CharField(source='PROGRAM.INSTITUTE.CODE', read_only=True)
+    PROGRAM_CODE = HierarchyAttributeField('program', 'code', source='PROGRAM_id')
+    INSTITUTE_CODE = HierarchyAttributeField('program', 'parent.code', source='PROGRAM_id')
 
     class Meta:
         model = BRANCH
@@ -127,8 +145,8 @@ class DashboardMasterSerializer(serializers.ModelSerializer):
         read_only_fields = ['DBM_ID']
 
 class YearSerializer(serializers.ModelSerializer):
-    BRANCH_CODE = serializers.CharField(source='BRANCH.CODE', read_only=True)
-    BRANCH_NAME = serializers.CharField(source='BRANCH.NAME', read_only=True)
+    BRANCH_CODE = HierarchyAttributeField('branch', 'code', source='BRANCH_id')
+    BRANCH_NAME = HierarchyAttributeField('branch', 'name', source='BRANCH_id')
 
     class Meta:
         model = YEAR
@@ -140,8 +158,8 @@ class YearSerializer(serializers.ModelSerializer):
         return value
 
 class SemesterSerializer(serializers.ModelSerializer):
-    BRANCH_NAME = serializers.CharField(source='YEAR.BRANCH.NAME', read_only=True)
-    YEAR_YEAR = serializers.CharField(source='YEAR.YEAR', read_only=True)
+    BRANCH_NAME = HierarchyAttributeField('year', 'parent.name', source='YEAR_id')
+    YEAR_YEAR = HierarchyAttributeField('year', 'name', source='YEAR_id')
 
     class Meta:
         model = SEMESTER
@@ -0,0 +1,35 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .designation_cache import invalidate_designation_cache
+from core.bulk_import import rows_imported
+from .hierarchy import HIERARCHY_MODELS, invalidate_hierarchy
+from .master_snapshot import SNAPSHOT_TABLES, invalidate_master_snapshot
+from .models import DESIGNATION
+
+
+@receiver(post_save, sender=DESIGNATION)
+@receiver(post_delete, sender=DESIGNATION)
+def designation_changed(sender, **kwargs):
+    # Other workers pick the change up when their cache TTL runs out
+    invalidate_designation_cache()
+
+
+def master_row_changed(sender, **kwargs):
+    invalidate_master_snapshot(using=kwargs.get('using'))
+
+
+for model, exclude in SNAPSHOT_TABLES.values():
+    post_save.connect(master_row_changed, sender=model, dispatch_uid=f'master_snapshot_{model.__name__}_save')
+    post_delete.connect(master_row_changed, sender=model, dispatch_uid=f'master_snapshot_{model.__name__}_delete')
+    rows_imported.connect(master_row_changed, sender=model, dispatch_uid=f'master_snapshot_{model.__name__}_import')
+
+
+def hierarchy_row_changed(sender, **kwargs):
+    invalidate_hierarchy(using=kwargs.get('using'))
+
+
+for model in HIERARCHY_MODELS:
+    post_save.connect(hierarchy_row_changed, sender=model, dispatch_uid=f'master_hierarchy_{model.__name__}_save')
+    post_delete.connect(hierarchy_row_changed, sender=model, dispatch_uid=f'master_hierarchy_{model.__name__}_delete')
+    rows_imported.connect(hierarchy_row_changed, sender=model, dispatch_uid=f'master_hierarchy_{model.__name__}_import')
@@ -1,6 +1,1198 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Value
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from core import monitoring
+from core.audit import get_audit_writer
+from core.buffered_writer import BufferedWriter
+from core.cache import cached_get, clear_model_cache
+from core.models import AUDIT_LOG, CACHE_GENERATION, ID_COUNTER, update_returning
+from core.session_backend import DB_SAVED_AT_KEY, SessionStore
+from core.testing import CleanupTransactionTestCase, inline_buffered_writes
+from core.throttling import reset_rate_limits
+from utils.email_outbox import claim_pending, queue_email, send_pending
+from utils.id_generators import allocate_ids, generate_employee_id, generate_employee_ids
+from .authentication import ClaimsUser
+from .designation_cache import invalidate_designation_cache
+from .login_events import ensure_login_event_partitions, flush_login_events, login_event_writer
+from .hierarchy import get_registry, hierarchy_node
+from .provisioning import provision_accounts
+from .revocation import BloomFilter, is_token_revoked, revocation_list
+from .models import (
+    BRANCH, COUNTRY, CustomUser, DESIGNATION, EMAIL_OUTBOX, INSTITUTE, LOGIN_EVENT, OTP_TOKEN, PROGRAM,
+    REVOKED_TOKEN, SEMESTER, STATE, UNIVERSITY, YEAR,
+)
 
 class BasicTest(TestCase):
     def test_basic(self):
         """Basic test to ensure test setup works"""
         self.assertEqual(1 + 1, 2)
+
+@override_settings(EMAIL_OUTBOX_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class EmailOutboxTest(TestCase):
+    def test_queue_does_not_send(self):
+        email = queue_email('Subject', 'Body', ['a@example.com'])
+        self.assertEqual(email.STATUS, EMAIL_OUTBOX.STATUS_PENDING)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_send_pending_marks_sent(self):
+        queue_email('One', 'Body', ['a@example.com'])
+        queue_email('Two', 'Body', ['b@example.com'])
+        self.assertEqual(send_pending(), 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(EMAIL_OUTBOX.objects.filter(STATUS=EMAIL_OUTBOX.STATUS_SENT).count(), 2)
+        self.assertEqual(send_pending(), 0)
+
+    @override_settings(EMAIL_OUTBOX_EAGER=True)
+    def test_eager_mode_sends_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            email = queue_email('Eager', 'Body', ['a@example.com'])
+        email.refresh_from_db()
+        self.assertEqual(email.STATUS, EMAIL_OUTBOX.STATUS_SENT)
+        self.assertEqual(len(mail.outbox), 1)
+
+    @override_settings(EMAIL_OUTBOX_BACKEND='accounts.tests.BrokenBackend', EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_are_retried_then_marked_failed(self):
+        email = queue_email('Broken', 'Body', ['a@example.com'])
+        send_pending()
+        email.refresh_from_db()
+        self.assertEqual(email.STATUS, EMAIL_OUTBOX.STATUS_PENDING)
+        self.assertEqual(email.ATTEMPTS, 1)
+
+        EMAIL_OUTBOX.objects.filter(pk=email.pk).update(NEXT_ATTEMPT_AT=email.CREATED_AT)
+        send_pending()
+        email.refresh_from_db()
+        self.assertEqual(email.STATUS, EMAIL_OUTBOX.STATUS_FAILED)
+        self.assertEqual(email.LAST_ERROR, 'SMTP unavailable')
+
+    @override_settings(EMAIL_OUTBOX_BACKEND='accounts.tests.FlakyBackend')
+    def test_connection_is_reopened_once_after_a_failure(self):
+        FlakyBackend.opened = 0
+        for subject in ('Broken', 'Two', 'Three'):
+            queue_email(subject, 'Body', ['a@example.com'])
+        self.assertEqual(send_pending(), 3)
+        self.assertEqual(FlakyBackend.opened, 2)
+        self.assertEqual(EMAIL_OUTBOX.objects.filter(STATUS=EMAIL_OUTBOX.STATUS_SENT).count(), 2)
+
+    def test_sensitive_bodies_are_blanked_once_sent(self):
+        email = queue_email('Credentials', 'Password: Initial@1', ['a@example.com'], sensitive=True)
+        send_pending()
+        email.refresh_from_db()
+        self.assertEqual(email.STATUS, EMAIL_OUTBOX.STATUS_SENT)
+        self.assertEqual(email.BODY, '')
+        self.assertEqual(mail.outbox[0].body, 'Password: Initial@1')
+
+    def test_interrupted_and_stale_rows_are_not_resent(self):
+        interrupted = queue_email('Interrupted', 'Body', ['a@example.com'])
+        claim_pending(ids=[interrupted.pk])  # Sender died before recording the result
+        stale = queue_email('Stale OTP', 'OTP: 123456', ['b@example.com'], sensitive=True)
+        long_ago = timezone.now() - timedelta(days=2)
+        EMAIL_OUTBOX.objects.filter(pk=interrupted.pk).update(CLAIMED_AT=long_ago)
+        EMAIL_OUTBOX.objects.filter(pk=stale.pk).update(CREATED_AT=long_ago)
+
+        self.assertEqual(send_pending(), 0)
+        self.assertEqual(len(mail.outbox), 0)
+        interrupted.refresh_from_db()
+        stale.refresh_from_db()
+        self.assertEqual((interrupted.STATUS, interrupted.ATTEMPTS), (EMAIL_OUTBOX.STATUS_FAILED, 1))
+        self.assertEqual((stale.STATUS, stale.BODY), (EMAIL_OUTBOX.STATUS_FAILED, ''))
+
+    def test_file_sink_backend(self):
+        with tempfile.TemporaryDirectory() as path:
+            with self.settings(
+                EMAIL_OUTBOX_BACKEND='django.core.mail.backends.filebased.EmailBackend',
+                EMAIL_FILE_PATH=path,
+            ):
+                queue_email('File sink', 'Body', ['a@example.com'])
+                call_command('process_email_outbox', once=True, verbosity=0)
+            self.assertEqual(len(os.listdir(path)), 1)
+
+    def test_login_queues_otp_mail(self):
+        CustomUser.objects.create_user('EMP001', 'emp001', 'emp001@example.com', password='Secret@123')
+        response = APIClient().post('/api/auth/login/', {'user_id': 'EMP001', 'password': 'Secret@123'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(EMAIL_OUTBOX.objects.get().RECIPIENTS, ['emp001@example.com'])
+
+class BrokenBackend:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        raise ConnectionError('SMTP unavailable')
+
+class FlakyBackend:
+    """
+    Fails messages titled 'Broken'. Like the SMTP backend, a send without an
+    open connection opens (and closes) one of its own.
+    """
+    opened = 0
+
+    def __init__(self, *args, **kwargs):
+        self.is_open = False
+
+    def open(self):
+        if self.is_open:
+            return False
+        FlakyBackend.opened += 1
+        self.is_open = True
+        return True
+
+    def close(self):
+        self.is_open = False
+
+    def send_messages(self, messages):
+        new_connection = self.open()
+        try:
+            if messages[0].subject == 'Broken':
+                raise ConnectionError('SMTP unavailable')
+            return len(messages)
+        finally:
+            if new_connection:
+                self.close()
+
+class UpdateReturningTest(TestCase):
+    def test_filters_across_relations(self):
+        country = COUNTRY.objects.create(NAME='Joinland', CODE='ZZM', PHONE_CODE='+87')
+        state = STATE.objects.create(COUNTRY=country, NAME='North', CODE='N')
+        rows = update_returning(STATE.objects.filter(COUNTRY__CODE='ZZM'), ['STATE_ID', 'NAME'], NAME=Value('South'))
+        self.assertEqual(rows, [{'STATE_ID': state.pk, 'NAME': 'South'}])
+        self.assertEqual(update_returning(STATE.objects.filter(COUNTRY__CODE='ZZN'), ['STATE_ID'], NAME=Value('East')), [])
+
+
+@inline_buffered_writes
+class DirtyFieldTrackingTest(TestCase):
+    def setUp(self):
+        designation = DESIGNATION.objects.create(NAME='Teacher', CODE='TCH', PERMISSIONS={'student': {'access': True}})
+        CustomUser.objects.create_user(
+            'EMP002', 'emp002', 'emp002@example.com', password='Secret@123', DESIGNATION=designation
+        )
+
+    def test_save_writes_only_changed_columns(self):
+        user = CustomUser.objects.get(pk='EMP002')
+        user.PHONE_NUMBER = '9999999999'
+        with CaptureQueriesContext(connection) as ctx:
+            user.save()
+        self.assertEqual(len(ctx.captured_queries), 1)
+        sql = ctx.captured_queries[0]['sql']
+        self.assertTrue(sql.startswith('UPDATE'))
+        self.assertIn('"PHONE_NUMBER"', sql)
+        self.assertNotIn('"EMAIL"', sql)
+
+    def test_unchanged_save_only_stamps_updated_at(self):
+        user = CustomUser.objects.get(pk='EMP002')
+        saved = []
+
+        def record(sender, update_fields, **kwargs):
+            saved.append(update_fields)
+
+        post_save.connect(record, sender=CustomUser)
+        self.addCleanup(post_save.disconnect, record, sender=CustomUser)
+        with CaptureQueriesContext(connection) as ctx:
+            user.save()
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertTrue(ctx.captured_queries[0]['sql'].startswith('UPDATE "ADMIN"."USERS" SET "UPDATED_AT" = '))
+        self.assertEqual(saved, [frozenset({'UPDATED_AT'})])
+
+    def test_snapshot_copies_only_mutable_values(self):
+        user = CustomUser.objects.get(pk='EMP002')
+        self.assertIs(user._loaded_values['EMAIL'], user.EMAIL)
+        designation = DESIGNATION.objects.get(CODE='TCH')
+        self.assertIsNot(designation._loaded_values['PERMISSIONS'], designation.PERMISSIONS)
+        designation.PERMISSIONS['student']['access'] = False
+        self.assertEqual(designation.get_dirty_fields(), ['PERMISSIONS'])
+
+    def test_plain_save_preserves_audit_fields(self):
+        CustomUser.objects.filter(pk='EMP002').update(LAST_LOGIN_IP='10.0.0.1')
+        user = CustomUser.objects.get(pk='EMP002')
+        user.LAST_LOGIN_IP = None
+        user.FIRST_NAME = 'Changed'
+        user.save()
+        user.refresh_from_db()
+        self.assertEqual(user.LAST_LOGIN_IP, '10.0.0.1')
+        self.assertEqual(user.FIRST_NAME, 'Changed')
+
+    def test_successful_otp_login_query_count(self):
+        otp = CustomUser.objects.get(pk='EMP002').generate_otp()
+        client = APIClient()
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.post('/api/auth/verify-otp/', {'user_id': 'EMP002', 'otp': otp})
+        self.assertEqual(response.status_code, 200)
+        user_queries = [q['sql'] for q in ctx.captured_queries if '"ADMIN"."USERS"' in q['sql']]
+        # One read of the user and the login-info update; OTP state lives in OTP_TOKENS
+        self.assertEqual([sql.split()[0] for sql in user_queries], ['SELECT', 'UPDATE'])
+        # The profile (designation, employee/student, institute) comes with the user read
+        self.assertIn('"DESIGNATIONS"', user_queries[0])
+        self.assertIn('EMPLOYEE_MASTER', user_queries[0])
+        self.assertEqual(len(ctx.captured_queries), 7)
+
+    def test_login_without_designation_or_profile(self):
+        CustomUser.objects.create_user('STU001', 'stu001', 'stu001@example.com', password='Secret@123', FIRST_NAME='Asha')
+        otp = CustomUser.objects.get(pk='STU001').generate_otp()
+        response = APIClient().post('/api/auth/verify-otp/', {'user_id': 'STU001', 'otp': otp})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user']['name'], 'Asha')
+        self.assertIsNone(response.data['user']['designation'])
+        self.assertIsNone(response.data['user']['institute_code'])
+
+class LockoutAccountingTest(TestCase):
+    def setUp(self):
+        CustomUser.objects.create_user('EMP003', 'emp003', 'emp003@example.com', password='Secret@123')
+
+    def fail(self, times=1):
+        for _ in range(times):
+            CustomUser.objects.get(pk='EMP003').increment_failed_attempts()
+        return CustomUser.objects.get(pk='EMP003')
+
+    def expire_lock(self):
+        CustomUser.objects.filter(pk='EMP003').update(LOCKED_UNTIL=timezone.now() - timedelta(seconds=1))
+
+    def test_failed_attempt_is_one_statement(self):
+        user = CustomUser.objects.get(pk='EMP003')
+        with self.assertNumQueries(1):
+            self.assertTrue(user.increment_failed_attempts())
+        self.assertEqual(user.FAILED_LOGIN_ATTEMPTS, 1)
+        self.assertIsNotNone(user.LAST_FAILED_LOGIN)
+
+    def test_lock_tiers(self):
+        user = self.fail(3)
+        self.assertTrue(user.is_account_locked()[0])
+        self.assertAlmostEqual(user.LOCKED_UNTIL - user.LAST_FAILED_LOGIN, timedelta(hours=1), delta=timedelta(seconds=1))
+
+        # Attempts against a locked account are rejected and not counted
+        self.assertFalse(user.increment_failed_attempts())
+        self.assertEqual(CustomUser.objects.get(pk='EMP003').FAILED_LOGIN_ATTEMPTS, 3)
+
+        # Once past a tier, every further failure locks again
+        self.expire_lock()
+        user = self.fail()
+        self.assertEqual(user.FAILED_LOGIN_ATTEMPTS, 4)
+        self.assertAlmostEqual(user.LOCKED_UNTIL - user.LAST_FAILED_LOGIN, timedelta(hours=1), delta=timedelta(seconds=1))
+
+        self.expire_lock()
+        user = self.fail()
+        self.assertEqual(user.FAILED_LOGIN_ATTEMPTS, 5)
+        self.assertAlmostEqual(user.LOCKED_UNTIL - user.LAST_FAILED_LOGIN, timedelta(hours=6), delta=timedelta(seconds=1))
+
+        for _ in range(3):
+            self.expire_lock()
+            user = self.fail()
+        self.assertEqual(user.FAILED_LOGIN_ATTEMPTS, 8)
+        self.assertTrue(user.PERMANENT_LOCK)
+        self.assertEqual(user.LOCK_REASON, CustomUser.PERMANENT_LOCK_REASON)
+        self.assertFalse(user.reset_failed_attempts())
+
+    def test_successful_login_resets_counter(self):
+        self.fail(2)
+        response = APIClient().post('/api/auth/login/', {'user_id': 'EMP003', 'password': 'Secret@123'})
+        self.assertEqual(response.status_code, 200)
+        user = CustomUser.objects.get(pk='EMP003')
+        self.assertEqual(user.FAILED_LOGIN_ATTEMPTS, 0)
+        self.assertIsNone(user.LAST_FAILED_LOGIN)
+
+class ConcurrentLockoutTest(CleanupTransactionTestCase):
+    cleanup = [(CustomUser, {'pk': 'EMP004'})]
+
+    def test_parallel_failures_are_not_lost(self):
+        CustomUser.objects.create_user('EMP004', 'emp004', 'emp004@example.com', password='Secret@123')
+        threads_count = 12
+        barrier = threading.Barrier(threads_count)
+        results = []
+
+        def attempt():
+            try:
+                user = CustomUser.objects.get(pk='EMP004')
+                barrier.wait()
+                results.append(user.increment_failed_attempts())
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=attempt) for _ in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        user = CustomUser.objects.get(pk='EMP004')
+        # Every thread read an unlocked row, but only the first three are counted
+        self.assertEqual(results.count(True), 3)
+        self.assertEqual(user.FAILED_LOGIN_ATTEMPTS, 3)
+        self.assertTrue(user.is_account_locked()[0])
+
+class PasswordHistoryTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('EMP005', 'emp005', 'emp005@example.com', password='Initial@123')
+
+    def test_reuse_is_rejected_in_parallel_and_sequential_mode(self):
+        self.user.set_password('Second@123')
+        self.user.set_password('Third@123')
+        for workers in (1, 4):
+            with self.settings(PASSWORD_HISTORY_WORKERS=workers):
+                self.assertFalse(self.user.check_password_history('Second@123'))
+                self.assertTrue(self.user.check_password_history('Fresh@123'))
+        with self.assertRaises(ValueError):
+            self.user.set_password('Second@123')
+
+    def test_history_is_pruned_with_one_delete(self):
+        for i in range(6):
+            self.user.set_password(f'Password@{i}')
+        with CaptureQueriesContext(connection) as ctx:
+            self.user.set_password('Password@6')
+        deletes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(self.user.password_history.count(), 5)
+        # The oldest passwords fell out of the window and may be reused
+        self.assertTrue(self.user.check_password_history('Password@1'))
+        self.assertFalse(self.user.check_password_history('Password@2'))
+
+@inline_buffered_writes
+class StatelessJWTAuthenticationTest(TestCase):
+    def setUp(self):
+        invalidate_designation_cache()
+        self.designation = DESIGNATION.objects.create(NAME='Clerk', CODE='CLK', PERMISSIONS={'exam': {'access': True}})
+        CustomUser.objects.create_user(
+            'EMP006', 'emp006', 'emp006@example.com', password='Secret@123', DESIGNATION=self.designation
+        )
+        otp = CustomUser.objects.get(pk='EMP006').generate_otp()
+        response = APIClient().post('/api/auth/verify-otp/', {'user_id': 'EMP006', 'otp': otp})
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['token']}")
+
+    def get_exam_types(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/exam/college-exam-type/')
+        self.assertEqual(response.status_code, 200)
+        user_queries = [q for q in ctx.captured_queries if '"ADMIN"."USERS"' in q['sql']]
+        return response, len(user_queries)
+
+    def test_current_token_needs_no_user_lookup(self):
+        self.get_exam_types()  # warm the designation cache
+        response, user_queries = self.get_exam_types()
+        self.assertEqual(user_queries, 0)
+        self.assertIsInstance(response.wsgi_request.user, ClaimsUser)
+        self.assertEqual(response.wsgi_request.user.USERNAME, 'emp006')
+        self.assertEqual(str(response.wsgi_request.user), 'emp006')
+
+    def test_stale_permission_version_falls_back_to_database(self):
+        self.designation.PERMISSIONS = {'exam': {'access': False}}
+        self.designation.save()
+        self.assertEqual(self.designation.PERMISSION_VERSION, 2)
+
+        response, user_queries = self.get_exam_types()
+        self.assertEqual(user_queries, 1)
+        self.assertIsInstance(response.wsgi_request.user, CustomUser)
+
+@inline_buffered_writes
+class DesignationPermissionCacheTest(TestCase):
+    def setUp(self):
+        invalidate_designation_cache()
+        self.designation = DESIGNATION.objects.create(
+            NAME='Accountant', CODE='ACC',
+            PERMISSIONS={'fees': {'access': True, 'create': True, 'approve': True}, 'exam': {'access': False}},
+        )
+        self.user = CustomUser.objects.create_user(
+            'EMP007', 'emp007', 'emp007@example.com', password='Secret@123', DESIGNATION=self.designation
+        )
+
+    def test_checks_are_query_free_once_compiled(self):
+        user = CustomUser.objects.get(pk='EMP007')
+        self.assertTrue(user.has_module_permission('fees'))
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_action_permission('fees', 'create'))
+            self.assertTrue(user.has_action_permission('fees', 'approve'))
+            self.assertFalse(user.has_action_permission('fees', 'delete'))
+            self.assertFalse(user.has_module_permission('exam'))
+            self.assertFalse(user.has_module_permission('library'))
+
+    def test_designation_save_invalidates(self):
+        self.assertFalse(self.user.has_module_permission('exam'))
+        self.designation.PERMISSIONS['exam']['access'] = True
+        self.designation.save()
+        self.assertTrue(self.user.has_module_permission('exam'))
+
+    def test_permissions_are_not_stored_in_session(self):
+        otp = self.user.generate_otp()
+        client = APIClient()
+        response = client.post('/api/auth/verify-otp/', {'user_id': 'EMP007', 'otp': otp})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('fees', response.data['user']['permissions'])
+        self.assertNotIn('permissions', client.session.keys())
+
+class OTPStoreTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('EMP008', 'emp008', 'emp008@example.com', password='Secret@123')
+
+    def test_wrong_attempts_do_not_touch_users(self):
+        self.user.generate_otp()
+        with CaptureQueriesContext(connection) as ctx:
+            is_valid, message = self.user.verify_otp('xxxxxx')
+        self.assertFalse(is_valid)
+        self.assertEqual(message, 'Invalid OTP. 2 attempts remaining')
+        self.assertFalse(any('"ADMIN"."USERS"' in q['sql'] for q in ctx.captured_queries))
+
+    def test_expired_otp_is_purged(self):
+        self.user.generate_otp()
+        OTP_TOKEN.objects.filter(USER_ID='EMP008').update(EXPIRES_AT=timezone.now() - timedelta(seconds=1))
+        call_command('purge_expired_otps', verbosity=0)
+        self.assertFalse(OTP_TOKEN.objects.exists())
+        self.assertEqual(self.user.verify_otp('123456'), (False, 'No valid OTP found'))
+
+    def assert_store_behaviour(self):
+        otp = self.user.generate_otp()
+        self.assertEqual(self.user.verify_otp(otp), (True, 'OTP verified successfully'))
+        # Still valid until cleared, as the password reset flow verifies twice
+        self.assertTrue(self.user.verify_otp(otp)[0])
+        self.assertTrue(self.user.verify_otp(otp, clear_on_success=True)[0])
+        self.assertEqual(self.user.verify_otp(otp), (False, 'No valid OTP found'))
+
+        otp = self.user.generate_otp()
+        for _ in range(3):
+            self.assertFalse(self.user.verify_otp('xxxxxx')[0])
+        is_valid, message = self.user.verify_otp(otp)
+        self.assertFalse(is_valid)
+        self.assertIn('blocked', message)
+
+        # A new OTP lifts the block
+        otp = self.user.generate_otp()
+        self.assertTrue(self.user.verify_otp(otp)[0])
+
+    def test_database_store(self):
+        self.assert_store_behaviour()
+
+    @override_settings(OTP_STORE='accounts.otp_store.CacheOTPStore')
+    def test_cache_store(self):
+        self.assert_store_behaviour()
+        self.assertFalse(OTP_TOKEN.objects.exists())
+
+    def test_expired_otp_message(self):
+        otp = self.user.generate_otp()
+        OTP_TOKEN.objects.filter(USER_ID='EMP008').update(EXPIRES_AT=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.user.verify_otp(otp), (False, 'OTP has expired'))
+        self.assertFalse(OTP_TOKEN.objects.exists())
+
+@override_settings(RATE_LIMITS={'login': {'ip': '5/min', 'user': '2/min'}, 'send_otp': {'ip': '3/min'}})
+@inline_buffered_writes
+class RateLimitTest(TestCase):
+    def setUp(self):
+        reset_rate_limits()
+        monitoring.reset_counters()
+
+    def tearDown(self):
+        reset_rate_limits()
+
+    def test_user_bucket_rejects_before_any_query(self):
+        client = APIClient()
+        for _ in range(2):
+            response = client.post('/api/auth/login/', {'user_id': 'nobody', 'password': 'x'})
+            self.assertEqual(response.status_code, 404)
+        with self.assertNumQueries(0):
+            response = client.post('/api/auth/login/', {'user_id': 'NOBODY', 'password': 'x'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+        # Another user from the same IP still has tokens until the IP bucket runs out
+        self.assertEqual(client.post('/api/auth/login/', {'user_id': 'other', 'password': 'x'}).status_code, 404)
+        self.assertEqual(monitoring.get_counters('throttle.login'), {
+            'throttle.login.allowed': 3,
+            'throttle.login.rejected.user': 1,
+        })
+
+    def test_refused_requests_do_not_drain_other_buckets(self):
+        client = APIClient()
+        for _ in range(6):
+            client.post('/api/auth/login/', {'user_id': 'nobody', 'password': 'x'})
+        # Only the 2 allowed requests took IP tokens
+        for i in range(3):
+            response = client.post('/api/auth/login/', {'user_id': f'other{i}', 'password': 'x'})
+            self.assertEqual(response.status_code, 404)
+        self.assertEqual(client.post('/api/auth/login/', {'user_id': 'other9', 'password': 'x'}).status_code, 429)
+
+    def test_ip_bucket(self):
+        client = APIClient()
+        for i in range(3):
+            client.post('/api/auth/send-otp/', {'user_id': f'U{i}'})
+        response = client.post('/api/auth/send-otp/', {'user_id': 'U9'})
+        self.assertEqual(response.status_code, 429)
+        # Separate client address, separate bucket
+        response = client.post('/api/auth/send-otp/', {'user_id': 'U9'}, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 404)
+
+    def test_forwarded_for_is_ignored_without_proxies(self):
+        client = APIClient()
+        for i in range(3):
+            client.post('/api/auth/send-otp/', {'user_id': f'U{i}'}, HTTP_X_FORWARDED_FOR=f'10.1.0.{i}')
+        response = client.post('/api/auth/send-otp/', {'user_id': 'U9'}, HTTP_X_FORWARDED_FOR='10.1.0.9')
+        self.assertEqual(response.status_code, 429)
+
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            response = client.post('/api/auth/send-otp/', {'user_id': 'U9'}, HTTP_X_FORWARDED_FOR='10.1.0.9')
+        self.assertEqual(response.status_code, 404)
+
+    def test_counters_endpoint_requires_superuser(self):
+        self.assertEqual(APIClient().get('/api/monitoring/counters/').status_code, 401)
+        admin = CustomUser.objects.create_superuser('ADM001', 'adm001', 'adm001@example.com', password='Secret@123')
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.get('/api/monitoring/counters/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('counters', response.data)
+
+class CoalescingSessionStoreTest(TestCase):
+    def setUp(self):
+        store = SessionStore()
+        store['user_id'] = 'EMP009'
+        store['last_activity'] = timezone.now().isoformat()
+        store.create()
+        self.session_key = store.session_key
+
+    def test_activity_only_saves_skip_the_database(self):
+        store = SessionStore(self.session_key)
+        store['last_activity'] = timezone.now().isoformat()
+        with self.assertNumQueries(0):
+            store.save()
+        # The cache copy is current
+        self.assertEqual(SessionStore(self.session_key)['last_activity'], store['last_activity'])
+
+    def test_data_changes_are_written(self):
+        store = SessionStore(self.session_key)
+        store['institute_code'] = 'INST1'
+        with CaptureQueriesContext(connection) as ctx:
+            store.save()
+        self.assertTrue(any(q['sql'].startswith('UPDATE "django_session"') for q in ctx.captured_queries))
+
+    def test_activity_is_persisted_after_granularity(self):
+        store = SessionStore(self.session_key)
+        store[DB_SAVED_AT_KEY] -= 61
+        store['last_activity'] = timezone.now().isoformat()
+        with CaptureQueriesContext(connection) as ctx:
+            store.save()
+        self.assertTrue(any(q['sql'].startswith('UPDATE "django_session"') for q in ctx.captured_queries))
+
+@inline_buffered_writes
+class TokenRevocationTest(TestCase):
+    def setUp(self):
+        revocation_list.reset()
+        CustomUser.objects.create_user('EMP010', 'emp010', 'emp010@example.com', password='Secret@123')
+        otp = CustomUser.objects.get(pk='EMP010').generate_otp()
+        self.tokens = APIClient().post('/api/auth/verify-otp/', {'user_id': 'EMP010', 'otp': otp}).data
+
+    def tearDown(self):
+        revocation_list.reset()
+
+    def client_for(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        client = self.client_for(self.tokens['token'])
+        self.assertEqual(client.get('/api/exam/college-exam-type/').status_code, 200)
+
+        response = client.post('/api/auth/logout/', {'refresh_token': self.tokens['refresh']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(REVOKED_TOKEN.objects.count(), 2)
+        self.assertEqual(client.get('/api/exam/college-exam-type/').status_code, 401)
+
+    def test_unrevoked_tokens_are_checked_in_memory(self):
+        revocation_list.revoke(RefreshToken(self.tokens['refresh']))
+        access = AccessToken(self.tokens['token'])
+        with self.assertNumQueries(0):
+            self.assertFalse(revocation_list.is_revoked(access['jti']))
+            self.assertTrue(revocation_list.is_revoked(RefreshToken(self.tokens['refresh'])['jti']))
+
+    @override_settings(REVOCATION_SYNC_INTERVAL=0)
+    def test_revocations_from_other_workers_are_synced(self):
+        access = AccessToken(self.tokens['token'])
+        self.assertFalse(revocation_list.is_revoked(access['jti']))
+        REVOKED_TOKEN.objects.create(
+            JTI=access['jti'], TOKEN_TYPE='access', EXPIRES_AT=timezone.now() + timedelta(hours=1)
+        )
+        self.assertTrue(revocation_list.is_revoked(access['jti']))
+
+    @override_settings(REVOCATION_SYNC_INTERVAL=0)
+    def test_revocations_committed_out_of_order_are_synced(self):
+        expires_at = timezone.now() + timedelta(hours=1)
+        # Takes an ID, then commits after a later one has been synced
+        late = REVOKED_TOKEN.objects.create(JTI='late', TOKEN_TYPE='access', EXPIRES_AT=expires_at)
+        late.delete()
+        REVOKED_TOKEN.objects.create(JTI='early', TOKEN_TYPE='access', EXPIRES_AT=expires_at)
+        self.assertTrue(revocation_list.is_revoked('early'))
+        count = revocation_list.bloom.count
+
+        REVOKED_TOKEN.objects.create(
+            REVOCATION_ID=late.REVOCATION_ID, JTI='late', TOKEN_TYPE='access', EXPIRES_AT=expires_at
+        )
+        self.assertTrue(revocation_list.is_revoked('late'))
+        self.assertEqual(revocation_list.bloom.count, count + 1)
+
+    def test_deactivation_revokes_outstanding_tokens(self):
+        client = self.client_for(self.tokens['token'])
+        self.assertEqual(client.get('/api/exam/college-exam-type/').status_code, 200)
+        user = CustomUser.objects.get(pk='EMP010')
+        with self.captureOnCommitCallbacks(execute=True):
+            user.IS_ACTIVE = False
+            user.save()
+        self.assertEqual(user.ACCOUNT_VERSION, 1)
+        with self.assertNumQueries(0):
+            self.assertTrue(is_token_revoked(AccessToken(self.tokens['token'])))
+        self.assertEqual(client.get('/api/exam/college-exam-type/').status_code, 401)
+
+        user.IS_ACTIVE = True
+        user.save()
+        otp = user.generate_otp()
+        tokens = APIClient().post('/api/auth/verify-otp/', {'user_id': 'EMP010', 'otp': otp}).data
+        self.assertEqual(AccessToken(tokens['token'])['acct_ver'], 1)
+        self.assertEqual(self.client_for(tokens['token']).get('/api/exam/college-exam-type/').status_code, 200)
+
+    def test_lock_and_password_change_revoke_outstanding_tokens(self):
+        user = CustomUser.objects.get(pk='EMP010')
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):  # First lock tier
+                user.increment_failed_attempts()
+        self.assertEqual(user.ACCOUNT_VERSION, 1)
+        self.assertEqual(self.client_for(self.tokens['token']).get('/api/exam/college-exam-type/').status_code, 401)
+
+        user.set_password('Changed@123')
+        self.assertEqual(CustomUser.objects.get(pk='EMP010').ACCOUNT_VERSION, 2)
+        self.assertTrue(REVOKED_TOKEN.objects.filter(JTI='account:EMP010:1').exists())
+
+    def test_demotion_and_designation_change_revoke_outstanding_tokens(self):
+        user = CustomUser.objects.get(pk='EMP010')
+        user.IS_SUPERUSER = user.IS_STAFF = True
+        user.save()
+        self.assertEqual(user.ACCOUNT_VERSION, 0)
+
+        user.IS_SUPERUSER = False
+        user.save(update_fields=['IS_SUPERUSER'])
+        self.assertEqual(user.ACCOUNT_VERSION, 1)
+        user.IS_STAFF = False
+        user.save()
+        self.assertEqual(user.ACCOUNT_VERSION, 2)
+
+        user.DESIGNATION = DESIGNATION.objects.create(NAME='Auditor', CODE='AUD', PERMISSIONS={})
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save(update_fields=['DESIGNATION'])
+        self.assertEqual(CustomUser.objects.get(pk='EMP010').ACCOUNT_VERSION, 3)
+        self.assertEqual(self.client_for(self.tokens['token']).get('/api/exam/college-exam-type/').status_code, 401)
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(1000)
+        for i in range(1000):
+            bloom.add(f'jti-{i}')
+        self.assertTrue(all(f'jti-{i}' in bloom for i in range(1000)))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 50)
+
+class BulkProvisioningTest(TestCase):
+    def test_accounts_are_created_with_hashed_passwords_and_queued_mails(self):
+        accounts = [
+            {'USER_ID': f'STU{i:03d}', 'USERNAME': f'stu{i:03d}', 'EMAIL': f'Stu{i:03d}@Example.com',
+             'password': f'Initial@{i}', 'FIRST_NAME': f'Student {i}'}
+            for i in range(20)
+        ]
+        result = provision_accounts(
+            accounts,
+            credentials_email=lambda account, password: ('Credentials', f"{account['USER_ID']} / {password}"),
+            workers=2,
+        )
+        self.assertEqual(len(result.users), 20)
+        self.assertGreater(result.accounts_per_sec, 0)
+
+        user = CustomUser.objects.get(pk='STU007')
+        self.assertTrue(user.check_password('Initial@7'))
+        self.assertEqual(user.EMAIL, 'stu007@example.com')
+        self.assertFalse(user.check_password_history('Initial@7'))
+        self.assertEqual(EMAIL_OUTBOX.objects.count(), 20)
+        self.assertEqual(EMAIL_OUTBOX.objects.get(RECIPIENTS=['stu007@example.com']).BODY, 'STU007 / Initial@7')
+
+    def test_missing_passwords_are_generated(self):
+        result = provision_accounts([{'USER_ID': 'STU100', 'USERNAME': 'stu100', 'EMAIL': 'stu100@example.com'}])
+        self.assertTrue(CustomUser.objects.get(pk='STU100').check_password(result.passwords[0]))
+
+@override_settings(LOGIN_EVENT_BATCH_SIZE=3, LOGIN_EVENT_FLUSH_INTERVAL_MS=0)
+class LoginEventTest(TestCase):
+    def setUp(self):
+        reset_rate_limits()
+        flush_login_events()
+        CustomUser.objects.create_user('EMP011', 'emp011', 'emp011@example.com', password='Secret@123')
+
+    def test_events_are_buffered_and_written_in_batches(self):
+        client = APIClient()
+        with self.assertNumQueries(2):  # User read and the failed-attempt UPDATE, no INSERT
+            response = client.post('/api/auth/login/', {'user_id': 'EMP011', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(login_event_writer.pending(), 1)
+
+        client.post('/api/auth/login/', {'user_id': 'EMP011', 'password': 'wrong'})
+        client.post('/api/auth/login/', {'user_id': 'EMP011', 'password': 'wrong'})  # Third failure locks
+        self.assertEqual(login_event_writer.pending(), 0)
+        events = list(LOGIN_EVENT.objects.for_user('EMP011'))
+        self.assertEqual([event.FAILED_ATTEMPTS for event in events], [3, 2, 1])
+        self.assertEqual([event.LOCK_TIER for event in events], [1, 0, 0])
+        self.assertEqual(events[0].OUTCOME, LOGIN_EVENT.FAILED_PASSWORD)
+        self.assertEqual(events[0].IP_ADDRESS, '127.0.0.1')
+
+        client.post('/api/auth/login/', {'user_id': 'EMP011', 'password': 'Secret@123'})
+        self.assertEqual(flush_login_events(), 1)
+        self.assertEqual(LOGIN_EVENT.objects.for_user('EMP011').first().OUTCOME, LOGIN_EVENT.LOCKED)
+
+    def test_history_is_bounded_by_time(self):
+        now = timezone.now()
+        LOGIN_EVENT.objects.bulk_create([
+            LOGIN_EVENT(USER_ID='EMP011', OUTCOME=LOGIN_EVENT.SUCCESS, EVENT_TIME=now - timedelta(days=1)),
+            LOGIN_EVENT(USER_ID='EMP011', OUTCOME=LOGIN_EVENT.SUCCESS, EVENT_TIME=now - timedelta(days=200)),
+            LOGIN_EVENT(USER_ID='EMP012', OUTCOME=LOGIN_EVENT.SUCCESS, EVENT_TIME=now - timedelta(days=1)),
+        ])
+        self.assertEqual(LOGIN_EVENT.objects.for_user('EMP011').count(), 1)
+        self.assertEqual(LOGIN_EVENT.objects.for_user('EMP011', since=now - timedelta(days=365)).count(), 2)
+
+        client = APIClient()
+        client.force_authenticate(CustomUser.objects.get(pk='EMP011'))
+        response = client.get('/api/auth/login-history/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['events']), 1)
+        self.assertEqual(client.get('/api/auth/login-history/', {'user_id': 'EMP012'}).status_code, 403)
+        for limit in ('0', '-1', 'all'):
+            self.assertEqual(client.get('/api/auth/login-history/', {'limit': limit}).status_code, 400)
+
+    def test_history_query_scans_only_matching_partitions(self):
+        # Swap in a partitioned LOGIN_EVENTS; the DDL is rolled back with the test
+        with connection.cursor() as cursor:
+            cursor.execute('ALTER TABLE "LOGIN_EVENTS" RENAME TO "LOGIN_EVENTS_ORIGINAL"')
+            cursor.execute(
+                'CREATE TABLE "LOGIN_EVENTS" (LIKE "LOGIN_EVENTS_ORIGINAL" INCLUDING DEFAULTS INCLUDING IDENTITY) '
+                'PARTITION BY RANGE ("EVENT_TIME")'
+            )
+        created = ensure_login_event_partitions(months_ahead=2, start=date(2020, 1, 15))
+        self.assertEqual(created, ['LOGIN_EVENTS_2020_01', 'LOGIN_EVENTS_2020_02', 'LOGIN_EVENTS_2020_03'])
+        self.assertEqual(ensure_login_event_partitions(months_ahead=2, start=date(2020, 1, 1)), [])
+
+        LOGIN_EVENT.objects.bulk_create([
+            LOGIN_EVENT(USER_ID='EMP011', OUTCOME=LOGIN_EVENT.SUCCESS,
+                        EVENT_TIME=datetime(2020, month, 10, tzinfo=dt_timezone.utc))
+            for month in (1, 2, 3)
+        ])
+        history = LOGIN_EVENT.objects.for_user(
+            'EMP011',
+            since=datetime(2020, 2, 1, tzinfo=dt_timezone.utc),
+            until=datetime(2020, 3, 1, tzinfo=dt_timezone.utc),
+        )
+        self.assertEqual(history.count(), 1)
+        plan = history.explain()
+        self.assertIn('LOGIN_EVENTS_2020_02', plan)
+        self.assertNotIn('LOGIN_EVENTS_2020_01', plan)
+        self.assertNotIn('LOGIN_EVENTS_2020_03', plan)
+
+    def test_new_partition_takes_its_rows_from_the_default_partition(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ALTER TABLE "LOGIN_EVENTS" RENAME TO "LOGIN_EVENTS_ORIGINAL"')
+            cursor.execute(
+                'CREATE TABLE "LOGIN_EVENTS" (LIKE "LOGIN_EVENTS_ORIGINAL" INCLUDING DEFAULTS INCLUDING IDENTITY) '
+                'PARTITION BY RANGE ("EVENT_TIME")'
+            )
+            cursor.execute('CREATE TABLE "LOGIN_EVENTS_DEFAULT" PARTITION OF "LOGIN_EVENTS" DEFAULT')
+        LOGIN_EVENT.objects.bulk_create([
+            LOGIN_EVENT(USER_ID='EMP011', OUTCOME=LOGIN_EVENT.SUCCESS,
+                        EVENT_TIME=datetime(2021, month, 10, tzinfo=dt_timezone.utc))
+            for month in (5, 9)
+        ])
+        self.assertEqual(ensure_login_event_partitions(months_ahead=0, start=date(2021, 5, 1)), ['LOGIN_EVENTS_2021_05'])
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM "LOGIN_EVENTS_2021_05"')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('SELECT COUNT(*) FROM "LOGIN_EVENTS_DEFAULT"')
+            self.assertEqual(cursor.fetchone()[0], 1)
+        self.assertEqual(LOGIN_EVENT.objects.filter(USER_ID='EMP011').count(), 2)
+
+class BufferedWriterTest(CleanupTransactionTestCase):
+    cleanup = [(LOGIN_EVENT, {'USER_ID': 'EMP019'})]
+
+    def test_full_batches_are_written_by_the_flusher_thread(self):
+        writer = BufferedWriter(LOGIN_EVENT, batch_size=2, flush_interval_ms=60000, name='test_events')
+        with self.assertNumQueries(0):
+            for _ in range(2):
+                writer.add(LOGIN_EVENT(USER_ID='EMP019', OUTCOME=LOGIN_EVENT.SUCCESS))
+        for _ in range(50):
+            if not writer.pending():
+                break
+            time.sleep(0.1)
+        writer.flush_interval_ms = 0  # Stops the thread after its next wakeup
+        writer.wakeup.set()
+        writer.thread.join(5)
+        self.assertFalse(writer.thread.is_alive())
+        self.assertEqual(LOGIN_EVENT.objects.filter(USER_ID='EMP019').count(), 2)
+
+@override_settings(AUDIT_LOG_BATCH_SIZE=2, AUDIT_LOG_FLUSH_INTERVAL_MS=0)
+class AuditTrailTest(CleanupTransactionTestCase):
+    cleanup = [
+        (COUNTRY, {'CODE__in': ['ZZA', 'ZZB', 'ZZC']}),
+        (AUDIT_LOG, {'TABLE_NAME': 'COUNTRIES'}),
+        (CustomUser, {'pk': 'EMP012'}),
+    ]
+
+    def test_request_changes_are_written_in_one_insert(self):
+        client = APIClient()
+        client.force_authenticate(CustomUser.objects.create_user(
+            'EMP012', 'emp012', 'emp012@example.com', password='Secret@123'
+        ))
+        response = client.post('/api/master/countries/', {'NAME': 'Testland', 'CODE': 'ZZA', 'PHONE_CODE': '+99'})
+        self.assertEqual(response.status_code, 201)
+        country_id = response.data['COUNTRY_ID']
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.patch(f'/api/master/countries/{country_id}/', {'NAME': 'Renamed', 'PHONE_CODE': '+98'})
+        self.assertEqual(response.status_code, 200)
+        audit_inserts = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "AUDIT_LOG"')]
+        self.assertEqual(len(audit_inserts), 1)
+
+        client.delete(f'/api/master/countries/{country_id}/')
+        entries = list(AUDIT_LOG.objects.filter(TABLE_NAME='COUNTRIES', RECORD_ID=str(country_id)).order_by('AUDIT_ID'))
+        self.assertEqual([entry.ACTION for entry in entries], [AUDIT_LOG.CREATE, AUDIT_LOG.UPDATE, AUDIT_LOG.DELETE])
+        self.assertEqual(entries[0].CHANGES['NAME'], [None, 'Testland'])
+        self.assertEqual(entries[1].CHANGES, {'NAME': ['Testland', 'Renamed'], 'PHONE_CODE': ['+99', '+98']})
+        self.assertEqual(entries[2].CHANGES, {'IS_DELETED': [False, True]})
+        self.assertEqual({entry.CHANGED_BY for entry in entries}, {'EMP012'})
+
+    def test_changes_outside_requests_are_batched(self):
+        get_audit_writer().flush()
+        COUNTRY.objects.create(NAME='First', CODE='ZZB', PHONE_CODE='+97')
+        self.assertEqual(get_audit_writer().pending(), 1)
+        country = COUNTRY.objects.create(NAME='Second', CODE='ZZC', PHONE_CODE='+96')
+        self.assertEqual(get_audit_writer().pending(), 0)
+        self.assertEqual(AUDIT_LOG.objects.filter(TABLE_NAME='COUNTRIES').count(), 2)
+
+        # A save without changes is not logged
+        country = COUNTRY.objects.get(pk=country.pk)
+        country.save()
+        self.assertEqual(get_audit_writer().pending(), 0)
+
+@inline_buffered_writes
+class MasterSnapshotTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_model_cache()
+        # Audit entries queued by executed on-commit callbacks are written
+        # before the test transaction rolls back
+        self.addCleanup(get_audit_writer().flush)
+        monitoring.reset_counters()
+        COUNTRY.objects.create(NAME='Snapland', CODE='ZZD', PHONE_CODE='+95')
+        COUNTRY.objects.create(NAME='Oldland', CODE='ZZE', PHONE_CODE='+94', IS_ACTIVE=False)
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            'EMP013', 'emp013', 'emp013@example.com', password='Secret@123'
+        ))
+
+    def test_snapshot_contains_active_rows_of_every_table(self):
+        response = self.client.get('/api/master/snapshot/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(response['ETag'], f'"{data["version"]}"')
+        self.assertIn('admission_quotas', data['tables'])
+        countries = data['tables']['countries']
+        self.assertNotIn('CREATED_AT', countries['columns'])
+        codes = [row[countries['columns'].index('CODE')] for row in countries['rows']]
+        self.assertIn('ZZD', codes)
+        self.assertNotIn('ZZE', codes)
+        self.assertNotIn('PERMISSIONS', data['tables']['designations']['columns'])
+
+    def test_if_none_match_and_rebuild_on_change(self):
+        etag = self.client.get('/api/master/snapshot/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/master/snapshot/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(monitoring.get_counters('master_snapshot'), {'master_snapshot.builds': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            country = COUNTRY.objects.get(CODE='ZZD')
+            country.NAME = 'Renamed'
+            country.save()
+        response = self.client.get('/api/master/snapshot/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(monitoring.get_counters('master_snapshot'), {'master_snapshot.builds': 2})
+
+    @override_settings(MODEL_CACHE_SYNC_INTERVAL=0)
+    def test_rebuilt_after_a_change_on_another_worker(self):
+        etag = self.client.get('/api/master/snapshot/')['ETag']
+        # What another worker's invalidation leaves behind: this worker's
+        # cache still holds the old copy
+        COUNTRY.objects.filter(CODE='ZZD').update(NAME='Elsewhere')
+        CACHE_GENERATION.objects.update_or_create(LABEL='master_snapshot', defaults={'GENERATION': 1000})
+        response = self.client.get('/api/master/snapshot/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(monitoring.get_counters('master_snapshot'), {'master_snapshot.builds': 2})
+
+class ConditionalListTest(TestCase):
+    def setUp(self):
+        COUNTRY.objects.create(NAME='Etagland', CODE='ZZF', PHONE_CODE='+93')
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            'EMP014', 'emp014', 'emp014@example.com', password='Secret@123'
+        ))
+
+    def test_matching_etag_short_circuits_before_the_list_query(self):
+        response = self.client.get('/api/master/countries/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertNotIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):  # Only the MAX/COUNT aggregate
+            response = self.client.get('/api/master/countries/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(response.content)
+
+        # MAX(UPDATED_AT) cannot tell that nothing was deleted since
+        response = self.client.get('/api/master/countries/', HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 200)
+
+    def test_changes_produce_a_new_validator(self):
+        etag = self.client.get('/api/master/countries/')['ETag']
+        country = COUNTRY.objects.get(CODE='ZZF')
+        country.NAME = 'Changed'
+        country.save()
+        response = self.client.get('/api/master/countries/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        COUNTRY.objects.create(NAME='Another', CODE='ZZG', PHONE_CODE='+92')
+        response = self.client.get('/api/master/countries/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        # A hard delete leaves MAX(UPDATED_AT) as it was
+        etag = response['ETag']
+        COUNTRY.objects.filter(CODE='ZZG').delete()
+        self.assertEqual(self.client.get('/api/master/countries/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+# Not a TestCase: cached_get() stores nothing read inside a transaction
+@inline_buffered_writes
+class ModelCacheTest(CleanupTransactionTestCase):
+    cleanup = [
+        (DESIGNATION, {'CODE': 'LIB'}),
+        (AUDIT_LOG, {'TABLE_NAME': 'DESIGNATIONS'}),
+        (CACHE_GENERATION, {'LABEL': 'accounts.DESIGNATION'}),
+    ]
+
+    def setUp(self):
+        clear_model_cache()
+        self.addCleanup(get_audit_writer().flush)  # Before the rows are cleaned up
+        self.designation = DESIGNATION.objects.create(NAME='Librarian', CODE='LIB', PERMISSIONS={})
+        monitoring.reset_counters()
+
+    def test_reads_are_served_from_memory_until_the_row_changes(self):
+        pk = self.designation.pk
+        self.assertEqual(cached_get(DESIGNATION, DESIGNATION_ID=pk).NAME, 'Librarian')
+        with self.assertNumQueries(0):
+            designation = cached_get(DESIGNATION, DESIGNATION_ID=pk)
+        # Callers get a copy they may modify
+        designation.NAME = 'Scribbled'
+        self.assertEqual(cached_get(DESIGNATION, DESIGNATION_ID=pk).NAME, 'Librarian')
+
+        designation = DESIGNATION.objects.get(pk=pk)
+        designation.NAME = 'Head Librarian'
+        designation.save()
+        self.assertEqual(cached_get(DESIGNATION, DESIGNATION_ID=pk).NAME, 'Head Librarian')
+        self.assertEqual(monitoring.get_counters('model_cache.accounts.DESIGNATION'), {
+            'model_cache.accounts.DESIGNATION.hit': 2,
+            'model_cache.accounts.DESIGNATION.invalidations': 1,
+            'model_cache.accounts.DESIGNATION.miss': 2,
+        })
+
+    @override_settings(MODEL_CACHE_SYNC_INTERVAL=0)
+    def test_change_on_another_worker_is_picked_up_from_the_shared_counter(self):
+        cached_get(DESIGNATION, DESIGNATION_ID=self.designation.pk)
+        DESIGNATION.objects.filter(pk=self.designation.pk).update(NAME='Renamed Elsewhere')
+        # What another worker's invalidation leaves behind in CACHE_GENERATIONS
+        CACHE_GENERATION.objects.update_or_create(LABEL='accounts.DESIGNATION', defaults={'GENERATION': 1000})
+        self.assertEqual(cached_get(DESIGNATION, DESIGNATION_ID=self.designation.pk).NAME, 'Renamed Elsewhere')
+
+    def test_rows_read_inside_a_transaction_are_not_cached(self):
+        class Rollback(Exception):
+            pass
+
+        with self.assertRaises(Rollback):
+            with transaction.atomic():
+                DESIGNATION.objects.filter(pk=self.designation.pk).update(NAME='Uncommitted')
+                self.assertEqual(cached_get(DESIGNATION, DESIGNATION_ID=self.designation.pk).NAME, 'Uncommitted')
+                raise Rollback
+        self.assertEqual(cached_get(DESIGNATION, DESIGNATION_ID=self.designation.pk).NAME, 'Librarian')
+
+    def test_only_configured_models_are_cached(self):
+        with self.assertRaises(ValueError):
+            cached_get(COUNTRY, CODE='IND')
+        with self.assertRaises(DESIGNATION.DoesNotExist):
+            cached_get(DESIGNATION, DESIGNATION_ID=-1)
+
+
+class AuditStampTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            'EMP015', 'emp015', 'emp015@example.com', password='Secret@123'
+        ))
+
+    def country_writes(self, ctx):
+        return [q['sql'] for q in ctx.captured_queries
+                if q['sql'].startswith(('INSERT INTO "COUNTRIES"', 'UPDATE "COUNTRIES"'))]
+
+    def test_create_and_update_are_single_stamped_writes(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/master/countries/', {'NAME': 'Stampland', 'CODE': 'ZZH', 'PHONE_CODE': '+95'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.country_writes(ctx)), 1)
+        country = COUNTRY.objects.get(pk=response.data['COUNTRY_ID'])
+        self.assertEqual((country.CREATED_BY, country.UPDATED_BY), ('emp015', 'emp015'))
+
+        COUNTRY.objects.filter(pk=country.pk).update(UPDATED_BY='someone')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(f'/api/master/countries/{country.pk}/', {'NAME': 'Restamped'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.country_writes(ctx)), 1)
+        country.refresh_from_db()
+        self.assertEqual((country.CREATED_BY, country.UPDATED_BY), ('emp015', 'emp015'))
+
+        self.client.delete(f'/api/master/countries/{country.pk}/')
+        country.refresh_from_db()
+        self.assertTrue(country.IS_DELETED)
+        self.assertEqual(country.DELETED_BY, 'emp015')
+
+
+@inline_buffered_writes
+class MasterHierarchyTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_model_cache()
+        monitoring.reset_counters()
+        university = UNIVERSITY.objects.create(
+            NAME='Test University', CODE='TU', ADDRESS='-', CONTACT_NUMBER='0', EMAIL='tu@example.com', ESTD_YEAR=1990
+        )
+        institute = INSTITUTE.objects.create(
+            UNIVERSITY=university, NAME='Test Institute', CODE='TI', ADDRESS='-', CONTACT_NUMBER='0',
+            EMAIL='ti@example.com', ESTD_YEAR=2000
+        )
+        self.program = PROGRAM.objects.create(
+            INSTITUTE=institute, NAME='B.Tech', CODE='TBT', DURATION_YEARS=4, LEVEL='UG', TYPE='FT'
+        )
+        PROGRAM.objects.create(
+            INSTITUTE=institute, NAME='Closed', CODE='TCL', DURATION_YEARS=2, LEVEL='PG', TYPE='FT', IS_ACTIVE=False
+        )
+        self.branch = BRANCH.objects.create(PROGRAM=self.program, NAME='Computer Engineering', CODE='TCE')
+        year = YEAR.objects.create(YEAR='First Year', BRANCH=self.branch)
+        self.semester = SEMESTER.objects.create(SEMESTER='Semester 1', YEAR=year)
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            'EMP016', 'emp016', 'emp016@example.com', password='Secret@123'
+        ))
+
+    def test_tree_is_built_with_one_query_per_level(self):
+        # And the generation check
+        with self.assertNumQueries(7):
+            response = self.client.get('/api/master/hierarchy/')
+        self.assertEqual(response.status_code, 200)
+        university = next(node for node in response.json()['data'] if node['CODE'] == 'TU')
+        programs = university['institutes'][0]['programs']
+        self.assertEqual([program['CODE'] for program in programs], ['TBT'])
+        semesters = programs[0]['branches'][0]['years'][0]['semesters']
+        self.assertEqual(semesters[0]['SEMESTER'], 'Semester 1')
+
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/api/master/hierarchy/?program_id={self.program.pk}')
+        self.assertEqual(response.json()['data']['branches'][0]['CODE'], 'TCE')
+        self.assertEqual(self.client.get('/api/master/hierarchy/?program_id=0').status_code, 404)
+
+    def test_changes_rebuild_the_tree(self):
+        self.client.get('/api/master/hierarchy/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.branch.NAME = 'Computer Science'
+            self.branch.save()
+        response = self.client.get(f'/api/master/hierarchy/?branch_id={self.branch.pk}')
+        self.assertEqual(response.json()['data']['NAME'], 'Computer Science')
+        self.assertEqual(monitoring.get_counters('master_hierarchy'), {'master_hierarchy.builds': 2})
+
+    @override_settings(MODEL_CACHE_SYNC_INTERVAL=0)
+    def test_rebuilt_after_a_change_on_another_worker(self):
+        self.client.get('/api/master/hierarchy/')
+        # What another worker's invalidation leaves behind
+        BRANCH.objects.filter(pk=self.branch.pk).update(NAME='Information Technology')
+        CACHE_GENERATION.objects.update_or_create(LABEL='master_hierarchy', defaults={'GENERATION': 1000})
+        response = self.client.get(f'/api/master/hierarchy/?branch_id={self.branch.pk}')
+        self.assertEqual(response.json()['data']['NAME'], 'Information Technology')
+        self.assertEqual(monitoring.get_counters('master_hierarchy'), {'master_hierarchy.builds': 2})
+
+    def test_registry_resolves_parent_levels_without_queries(self):
+        node = hierarchy_node('semester', self.semester.pk)
+        self.assertEqual((node.name, node.parent.name), ('Semester 1', 'First Year'))
+        self.assertEqual(node.parent.parent.parent.code, 'TBT')
+        with self.assertNumQueries(0):
+            self.assertEqual(hierarchy_node('branch', self.branch.pk).parent.parent.code, 'TI')
+
+        BRANCH.objects.create(PROGRAM=self.program, NAME='Mechanical Engineering', CODE='TME')
+        get_registry(reload=True)
+        response = self.client.get(f'/api/master/branch/?program_id={self.program.pk}')
+        self.assertEqual({row['INSTITUTE_CODE'] for row in response.json() if row['CODE'] in ('TCE', 'TME')}, {'TI'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.program.CODE = 'TBX'
+            self.program.save()
+        self.assertEqual(hierarchy_node('branch', self.branch.pk).parent.code, 'TBX')
+
+
+class IdAllocatorTest(TestCase):
+    def test_counter_starts_after_existing_ids(self):
+        CustomUser.objects.create_user('EMP2030T007', 'emp2030t007', 'emp2030t007@example.com', password='Secret@123')
+        self.assertEqual(generate_employee_id('Teacher', year=2030), 'EMP2030T008')
+        self.assertEqual(generate_employee_ids('Tutor', 3, year=2030), ['EMP2030T009', 'EMP2030T010', 'EMP2030T011'])
+        with self.assertNumQueries(3):  # Savepoint, UPDATE ... RETURNING, release
+            self.assertEqual(generate_employee_id('Teacher', year=2030), 'EMP2030T012')
+
+
+class ConcurrentIdAllocatorTest(CleanupTransactionTestCase):
+    cleanup = [(ID_COUNTER, {'KIND': 'stress'})]
+
+    def test_parallel_allocations_never_overlap(self):
+        threads_count = 10
+        barrier = threading.Barrier(threads_count)
+        allocated = []
+
+        def allocate(block):
+            try:
+                barrier.wait()
+                for _ in range(20):
+                    allocated.extend(allocate_ids('stress', 'X', block))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=allocate, args=(1 + i % 3,)) for i in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        expected = sum(20 * (1 + i % 3) for i in range(threads_count))
+        self.assertEqual(len(allocated), expected)
+        self.assertEqual(sorted(allocated), list(range(1, expected + 1)))
+        self.assertEqual(ID_COUNTER.objects.get(KIND='stress', PREFIX='X').LAST_VALUE, expected)
@@ -27,6 +27,8 @@ router.register(r'master/admission', views.AdmissionListCreateView, basename='ad
 app_name = 'accounts'
 
 urlpatterns = [
+    path('master/snapshot/', views.MasterSnapshotView.as_view(), name='master-snapshot'),
+    path('master/hierarchy/', views.MasterHierarchyView.as_view(), name='master-hierarchy'),
     path('', include(router.urls)),
     path('auth/login/', views.LoginView.as_view(), name='login'),
     path('auth/send-otp/', views.SendOTPView.as_view(), name='send-otp'),
@@ -35,6 +37,7 @@ urlpatterns = [
     path('auth/verify-reset-otp/', views.VerifyResetOTPView.as_view(), name='verify-reset-otp'),
     path('auth/reset-password/', views.ResetPasswordView.as_view(), name='reset-password'),
     path('auth/logout/', LogoutView.as_view(), name='logout'),
+    path('auth/login-history/', views.LoginHistoryView.as_view(), name='login-history'),
     path('master/tables/', views.MasterTableListView.as_view(), name='master-tables'),
     path('api/master/academic-years', include(router.urls)),
     path('api/master/semester-duration', include(router.urls)),
@@ -1,15 +1,17 @@
 from django.shortcuts import render
-from django.core.mail import send_mail
 from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags
 from .models import (
     CustomUser, COUNTRY, STATE, CITY, 
     CURRENCY, LANGUAGE, DESIGNATION, CATEGORY,
     UNIVERSITY, INSTITUTE, DEPARTMENT, PROGRAM, BRANCH, DASHBOARD_MASTER,
-    YEAR, SEMESTER, SEMESTER_DURATION,CASTE_MASTER,QUOTA_MASTER,ADMISSION_QUOTA_MASTER
+    YEAR, SEMESTER, SEMESTER_DURATION,CASTE_MASTER,QUOTA_MASTER,ADMISSION_QUOTA_MASTER,
+    LOGIN_EVENT
 )
 from rest_framework.decorators import api_view
 from django.contrib.auth import authenticate
@@ -33,16 +35,28 @@ from .serializers import StateSerializer
 from .models import CITY, CURRENCY, LANGUAGE, DESIGNATION, CATEGORY, UNIVERSITY, INSTITUTE, ACADEMIC_YEAR
 from .serializers import (CitySerializer, CurrencySerializer, 
                         LanguageSerializer, DesignationSerializer, CategorySerializer, UniversitySerializer, InstituteSerializer, AcademicYearSerializer)
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.db import connection
 import logging  # Add this at the top with other imports
-from establishments.models import EMPLOYEE_MASTER  # Add this import
+from utils.email_outbox import queue_email
+from .authentication import add_user_claims
+from .revocation import revoke_token
+from .login_events import record_login_event
+from .hierarchy import LEVELS as HIERARCHY_LEVELS, get_hierarchy_body
+from .master_snapshot import get_master_snapshot
+from core.conditional import ConditionalListMixin
+from core.viewsets import AuditStampMixin
+from core.throttling import TokenBucketThrottle
 
 logger = logging.getLogger(__name__)  # Add this after imports
 
 
 class LoginView(APIView):
     permission_classes = [AllowAny]  # Allow unauthenticated access
+    # Rate limited before authentication or any query runs
+    authentication_classes = []
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'login'
     
     def post(self, request):
         print("==== Login Request ====")
@@ -69,8 +83,10 @@ class LoginView(APIView):
             print(f"Failed attempts: {user.FAILED_LOGIN_ATTEMPTS}")
             print(f"Last failed login: {user.LAST_FAILED_LOGIN}")
             print(f"Permanent lock: {user.PERMANENT_LOCK}")
+            ip_address = request.META.get('REMOTE_ADDR')
 
             if not user.IS_ACTIVE:
+                record_login_event(user.USER_ID, LOGIN_EVENT.INACTIVE, ip_address, user=user)
                 return Response({
                     'status': 'error',
                     'message': 'Account is not active'
@@ -79,6 +95,7 @@ class LoginView(APIView):
             # Check account lock status
             is_locked, lock_message = user.is_account_locked()
             if is_locked:
+                record_login_event(user.USER_ID, LOGIN_EVENT.LOCKED, ip_address, user=user)
                 return Response({
                     'status': 'error',
                     'message': lock_message
@@ -86,7 +103,14 @@ class LoginView(APIView):
 
             # Verify password
             if not user.check_password(password):
-                user.increment_failed_attempts()
+                if not user.increment_failed_attempts():
+                    # A concurrent attempt locked the account first
+                    record_login_event(user.USER_ID, LOGIN_EVENT.LOCKED, ip_address, user=user)
+                    return Response({
+                        'status': 'error',
+                        'message': 'Account is locked due to multiple failed attempts.'
+                    }, status=status.HTTP_403_FORBIDDEN)
+                record_login_event(user.USER_ID, LOGIN_EVENT.FAILED_PASSWORD, ip_address, user=user)
                 
                 remaining_attempts = 0
                 if user.FAILED_LOGIN_ATTEMPTS < 3:
@@ -114,7 +138,7 @@ class LoginView(APIView):
             otp = user.generate_otp()
             
             try:
-                send_mail(
+                queue_email(
                     subject='Login Verification OTP - College ERP',
                     message=(
                         f'Dear {user.FIRST_NAME},\n\n'
@@ -126,7 +150,7 @@ class LoginView(APIView):
                     ),
                     from_email=settings.DEFAULT_FROM_EMAIL,
                     recipient_list=[user.EMAIL],
-                    fail_silently=False,
+                    sensitive=True,
                 )
                 
                 return Response({
@@ -137,14 +161,14 @@ class LoginView(APIView):
                 }, status=status.HTTP_200_OK)
                 
             except Exception as e:
-                user.OTP_SECRET = None
-                user.save()
+                user.clear_otp()
                 return Response({
                     'status': 'error',
                     'message': 'Failed to send verification OTP. Please try again.'
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
                 
         except CustomUser.DoesNotExist:
+            record_login_event(user_id.upper(), LOGIN_EVENT.UNKNOWN_USER, request.META.get('REMOTE_ADDR'))
             return Response({
                 'status': 'error',
                 'message': 'Invalid USER_ID'
@@ -153,6 +177,10 @@ class LoginView(APIView):
 @method_decorator(ensure_csrf_cookie, name='dispatch')
 class SendOTPView(APIView):
     permission_classes = [AllowAny]  # Allow unauthenticated access
+    # Rate limited before authentication or any query runs
+    authentication_classes = []
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'send_otp'
     
     def post(self, request):
         user_id = request.data.get('user_id')
@@ -178,13 +206,13 @@ class SendOTPView(APIView):
                     'status': 'error',
                     'message': lock_message,
                     'locked': True,
-                    'lockTime': user.LOCK_EXPIRY.isoformat() if user.LOCK_EXPIRY else None
+                    'lockTime': user.LOCKED_UNTIL.isoformat() if user.LOCKED_UNTIL else None
                 }, status=status.HTTP_403_FORBIDDEN)
 
             otp = user.generate_otp()
             
             try:
-                send_mail(
+                queue_email(
                     subject='Login OTP - College ERP',
                     message=(
                         f'Dear {user.FIRST_NAME},\n\n'
@@ -196,7 +224,7 @@ class SendOTPView(APIView):
                     ),
                     from_email=settings.DEFAULT_FROM_EMAIL,
                     recipient_list=[user.EMAIL],
-                    fail_silently=False,
+                    sensitive=True,
                 )
                 
                 return Response({
@@ -207,8 +235,7 @@ class SendOTPView(APIView):
                 }, status=status.HTTP_200_OK)
                 
             except Exception as e:
-                user.OTP_SECRET = None
-                user.save()
+                user.clear_otp()
                 return Response({
                     'status': 'error',
                     'message': 'Failed to send OTP email. Please try again.'
@@ -234,41 +261,28 @@ class VerifyOTPView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            user = CustomUser.objects.get(USER_ID=user_id)
+            # User, designation and employee/student profile in one query
+            user = CustomUser.objects.with_login_profile().get(USER_ID=user_id)
             is_valid, message = user.verify_otp(otp)
             
             if is_valid:
                 # Update login info
                 user.update_login_info(request.META.get('REMOTE_ADDR'))
-                
-                # Get employee details if they exist
-                try:
-                    employee = EMPLOYEE_MASTER.objects.get(EMPLOYEE_ID=user.USER_ID)
-                    department_id = employee.DEPARTMENT.DEPARTMENT_ID if employee.DEPARTMENT else None
-                    institute_id = employee.INSTITUTE.INSTITUTE_ID if employee.INSTITUTE else None
-                    institute_code = employee.INSTITUTE.CODE if employee.INSTITUTE else None
-                    emp_name = employee.EMP_NAME  # Get EMP_NAME
-                except EMPLOYEE_MASTER.DoesNotExist:
-                    department_id = None
-                    institute_id = None
-                    institute_code = None
-                    emp_name = user.FIRST_NAME  # Set default to user's FIRST_NAME
-                    
-                # Store session data with emp_name
+
+                designation = user.DESIGNATION
                 session_data = {
                     'user_id': user.USER_ID,
-                    'name': emp_name,  # Now emp_name will always be defined
+                    'name': user.PROFILE_NAME or user.FIRST_NAME,
                     'email': user.EMAIL,
                     'is_superuser': user.IS_SUPERUSER,
                     'designation': {
-                        'code': user.DESIGNATION.CODE,
-                        'name': user.DESIGNATION.NAME,
-                    },
-                    'permissions': user.DESIGNATION.PERMISSIONS,
+                        'code': designation.CODE,
+                        'name': designation.NAME,
+                    } if designation else None,
                     'last_activity': timezone.now().isoformat(),
-                    'department_id': department_id,
-                    'institute_id': institute_id,
-                    'institute_code': institute_code
+                    'department_id': user.PROFILE_DEPARTMENT_ID,
+                    'institute_id': user.PROFILE_INSTITUTE_ID,
+                    'institute_code': user.PROFILE_INSTITUTE_CODE
                 }
                 
                 # Store all session data
@@ -278,18 +292,19 @@ class VerifyOTPView(APIView):
                 # Generate tokens
                 refresh = RefreshToken()
                 refresh[api_settings.USER_ID_CLAIM] = user.USER_ID
-                refresh['user_id'] = user.USER_ID
-                refresh['username'] = user.USERNAME
-                refresh['is_superuser'] = user.IS_SUPERUSER
+                add_user_claims(refresh, user)
                 
+                # Permissions are returned to the client but not copied into the
+                # session; server-side checks use the compiled designation cache
                 return Response({
                     'status': 'success',
                     'message': message,
                     'token': str(refresh.access_token),
                     'refresh': str(refresh),
-                    'user': session_data
+                    'user': {**session_data, 'permissions': designation.PERMISSIONS if designation else {}}
                 }, status=status.HTTP_200_OK)
             
+            record_login_event(user.USER_ID, LOGIN_EVENT.FAILED_OTP, request.META.get('REMOTE_ADDR'), user=user)
             return Response({
                 'status': 'error',
                 'message': message
@@ -308,6 +323,10 @@ class VerifyOTPView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class RequestPasswordResetView(APIView):
+    authentication_classes = []
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'password_reset'
+
     def post(self, request):
         user_id = request.data.get('user_id')
         
@@ -330,7 +349,7 @@ class RequestPasswordResetView(APIView):
             otp = user.generate_otp()
             
             try:
-                send_mail(
+                queue_email(
                     subject='Password Reset OTP - College ERP',
                     message=(
                         f'Dear {user.FIRST_NAME},\n\n'
@@ -342,7 +361,7 @@ class RequestPasswordResetView(APIView):
                     ),
                     from_email=settings.DEFAULT_FROM_EMAIL,
                     recipient_list=[user.EMAIL],
-                    fail_silently=False,
+                    sensitive=True,
                 )
                 
                 return Response({
@@ -352,8 +371,7 @@ class RequestPasswordResetView(APIView):
                 }, status=status.HTTP_200_OK)
                 
             except Exception as e:
-                user.OTP_SECRET = None
-                user.save()
+                user.clear_otp()
                 return Response({
                     'status': 'error',
                     'message': 'Failed to send OTP email'
@@ -416,8 +434,7 @@ class ResetPasswordView(APIView):
             
             # Set new password
             user.set_password(new_password)
-            user.OTP_SECRET = None  # Clear OTP after successful password reset
-            user.save()
+            user.clear_otp()  # Clear OTP after successful password reset
             
             return Response({
                 'status': 'success',
@@ -444,23 +461,57 @@ class MasterTableListView(APIView):
         ]
         return Response(master_tables)
 
-class BaseModelViewSet(viewsets.ModelViewSet):
+class MasterSnapshotView(APIView):
+    """
+    Every active master table in one response (see accounts.master_snapshot).
+    The ETag is the snapshot version; a matching If-None-Match gets a 304.
+    """
     permission_classes = [IsAuthenticated]
 
-    def perform_create(self, serializer):
-        print(f"=== Debug Create by {self.request.user.USERNAME} ===")
-        # Pass values directly to serializer save
-        instance = serializer.save()
-        instance.CREATED_BY = str(self.request.user.USERNAME)
-        instance.UPDATED_BY = str(self.request.user.USERNAME)
-        instance.save()
+    def get(self, request):
+        snapshot = get_master_snapshot()
+        etag = f'"{snapshot.version}"'
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(snapshot.body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
 
-    def perform_update(self, serializer):
-        print(f"=== Debug Update by {self.request.user.USERNAME} ===")
-        # Update existing instance
-        instance = serializer.save()
-        instance.UPDATED_BY = str(self.request.user.USERNAME)
-        instance.save()
+class MasterHierarchyView(APIView):
+    """
+    The active university -> ... -> semester tree in one response (see
+    accounts.hierarchy). One of ?university_id, ?institute_id, ?program_id,
+    ?branch_id or ?year_id narrows it to the subtree under that node.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        for param, *_ in HIERARCHY_LEVELS:
+            if param in request.query_params:
+                try:
+                    node_id = int(request.query_params[param])
+                except ValueError:
+                    return Response({
+                        'status': 'error',
+                        'message': f'Invalid {param}'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                body = get_hierarchy_body(param, node_id)
+                if body is None:
+                    return Response({
+                        'status': 'error',
+                        'message': f'No active node with {param}={node_id}'
+                    }, status=status.HTTP_404_NOT_FOUND)
+                break
+        else:
+            body = get_hierarchy_body()
+        return HttpResponse(body, content_type='application/json')
+
+class BaseModelViewSet(AuditStampMixin, ConditionalListMixin, viewsets.ModelViewSet):
+    """CREATED_BY/UPDATED_BY are stamped by AuditStampMixin within the single save"""
+    permission_classes = [IsAuthenticated]
 
 # Update all ViewSets to inherit from BaseModelViewSet
 class CountryViewSet(BaseModelViewSet):
@@ -711,22 +762,25 @@ class ProgramTableListView(View):
 
 
 class BranchListCreateView(BaseModelViewSet):
-    queryset = BRANCH.objects.all().select_related("PROGRAM") 
+    queryset = BRANCH.objects.all()  # PROGRAM_CODE/INSTITUTE_CODE come from accounts.hierarchy
     serializer_class = BranchSerializer
+    conditional_related_models = (PROGRAM, INSTITUTE)  # PROGRAM_CODE, INSTITUTE_CODE
 
     def post(self, request):
         try:
             # Clear user session
             request.session.flush()
             
-            # Blacklist the JWT token if you're using JWT
+            # Revoke the access token used for this request and the refresh token
+            user_id = getattr(request.user, 'USER_ID', None)
             try:
+                if request.auth is not None:
+                    revoke_token(request.auth, user_id=user_id)
                 refresh_token = request.data.get('refresh_token')
                 if refresh_token:
-                    token = RefreshToken(refresh_token)
-                    token.blacklist()
+                    revoke_token(RefreshToken(refresh_token), user_id=user_id)
             except Exception as e:
-                logger.warning(f"Error blacklisting token: {str(e)}")
+                logger.warning(f"Error revoking token: {str(e)}")
             
             return Response({
                 'status': 'success',
@@ -791,14 +845,16 @@ class LogoutView(APIView):
             # Clear user session
             request.session.flush()
             
-            # Blacklist the JWT token if you're using JWT
+            # Revoke the access token used for this request and the refresh token
+            user_id = getattr(request.user, 'USER_ID', None)
             try:
+                if request.auth is not None:
+                    revoke_token(request.auth, user_id=user_id)
                 refresh_token = request.data.get('refresh_token')
                 if refresh_token:
-                    token = RefreshToken(refresh_token)
-                    token.blacklist()
+                    revoke_token(RefreshToken(refresh_token), user_id=user_id)
             except Exception as e:
-                logger.warning(f"Error blacklisting token: {str(e)}")
+                logger.warning(f"Error revoking token: {str(e)}")
             
             return Response({
                 'status': 'success',
@@ -810,10 +866,51 @@ class LogoutView(APIView):
                 'status': 'error',
                 'message': 'Error during logout'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class LoginHistoryView(APIView):
+    """
+    Login history from LOGIN_EVENTS, newest first. Users see their own
+    events; superusers may pass ?user_id=. ?since= and ?until= (ISO
+    datetimes) narrow the range, which decides the partitions scanned.
+    """
+    permission_classes = [IsAuthenticated]
+    MAX_LIMIT = 500
+
+    def get(self, request):
+        user_id = request.user.USER_ID
+        if request.query_params.get('user_id'):
+            if not request.user.IS_SUPERUSER and request.query_params['user_id'] != user_id:
+                return Response({
+                    'status': 'error',
+                    'message': 'You can only view your own login history'
+                }, status=status.HTTP_403_FORBIDDEN)
+            user_id = request.query_params['user_id']
+
+        since = parse_datetime(request.query_params.get('since', ''))
+        until = parse_datetime(request.query_params.get('until', ''))
+        try:
+            limit = min(int(request.query_params.get('limit', 100)), self.MAX_LIMIT)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return Response({
+                'status': 'error',
+                'message': 'limit must be a positive integer'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        events = LOGIN_EVENT.objects.for_user(user_id, since=since, until=until).values(
+            'EVENT_TIME', 'IP_ADDRESS', 'OUTCOME', 'LOCK_TIER', 'FAILED_ATTEMPTS'
+        )[:limit]
+        return Response({
+            'status': 'success',
+            'user_id': user_id,
+            'events': list(events)
+        })
             
 class YearListCreateView(BaseModelViewSet):
-    queryset = YEAR.objects.all().select_related("BRANCH")  # ✅ Optimize DB query
+    queryset = YEAR.objects.all()  # BRANCH_CODE/BRANCH_NAME come from accounts.hierarchy
     serializer_class = YearSerializer
+    conditional_related_models = (BRANCH,)  # BRANCH_CODE, BRANCH_NAME
     
     
     
@@ -854,7 +951,7 @@ class SemesterListCreateView(viewsets.ModelViewSet):
     """
     API endpoint for listing and creating Semester records.
     """
-    queryset = SEMESTER.objects.all().select_related("YEAR")    # Sorting by year and semester
+    queryset = SEMESTER.objects.all()  # YEAR_YEAR/BRANCH_NAME come from accounts.hierarchy
     serializer_class = SemesterSerializer
    
    
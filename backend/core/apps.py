@@ -7,3 +7,9 @@ class CoreConfig(AppConfig):
     def ready(self):
         from .schema import create_schemas
         create_schemas()
+
+        from .cache import connect_signals
+        connect_signals()
+
+        from . import typeahead
+        typeahead.connect_signals()
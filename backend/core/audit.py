@@ -0,0 +1,149 @@
+"""
+Field-level audit trail for AuditModel.
+
+AuditModel.save()/delete() call record_change() with the columns that changed
+(old and new values). Inside a request wrapped by AuditMiddleware the entries
+are queued in a per-request buffer and written with one multi-row INSERT into
+AUDIT_LOG when the response leaves the middleware. Outside a request
+(management commands, shell, workers) they go to a BufferedWriter that
+inserts every AUDIT_LOG_BATCH_SIZE rows or AUDIT_LOG_FLUSH_INTERVAL_MS.
+
+Entries are queued on transaction commit, so changes rolled back are not
+logged.
+"""
+import contextvars
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from core import monitoring
+from core.buffered_writer import BufferedWriter
+
+logger = logging.getLogger(__name__)
+
+# Bookkeeping columns that are not reported in the diff
+IGNORED_FIELDS = {'CREATED_AT', 'CREATED_BY', 'UPDATED_AT', 'UPDATED_BY', 'DELETED_AT', 'DELETED_BY'}
+
+_current = contextvars.ContextVar('audit_buffer', default=None)
+_writer = None
+
+
+class AuditBuffer:
+    def __init__(self, request=None):
+        self.request = request
+        self.entries = []
+        self.closed = False
+
+    def changed_by(self):
+        user = getattr(self.request, 'user', None)
+        if user is not None and getattr(user, 'is_authenticated', False):
+            return getattr(user, 'USER_ID', None) or str(user)
+        return None
+
+
+def get_audit_writer():
+    global _writer
+    from core.models import AUDIT_LOG
+
+    if _writer is None:
+        _writer = BufferedWriter(AUDIT_LOG, name='audit_log')
+    # Settings are read on use so tests can override them
+    _writer.batch_size = getattr(settings, 'AUDIT_LOG_BATCH_SIZE', 200)
+    _writer.flush_interval_ms = getattr(settings, 'AUDIT_LOG_FLUSH_INTERVAL_MS', 1000)
+    return _writer
+
+
+def begin(request=None):
+    """Start buffering audit entries for the current request/context."""
+    return _current.set(AuditBuffer(request))
+
+
+def end(token):
+    """Write the entries buffered since begin() in one INSERT."""
+    buffer = _current.get()
+    _current.reset(token)
+    if buffer is not None:
+        buffer.closed = True
+    if buffer is None or not buffer.entries:
+        return 0
+
+    from core.models import AUDIT_LOG
+
+    changed_by = buffer.changed_by()
+    # The request user is known only after DRF authentication, i.e. now
+    for entry in buffer.entries:
+        entry.CHANGED_BY = changed_by or entry.CHANGED_BY
+    try:
+        AUDIT_LOG.objects.bulk_create(buffer.entries)
+    except Exception as e:
+        logger.error(f"Writing {len(buffer.entries)} audit entries failed: {str(e)}")
+        monitoring.increment('audit_log.errors')
+        return 0
+    monitoring.increment('audit_log.written', len(buffer.entries))
+    return len(buffer.entries)
+
+
+@contextmanager
+def audit_context(request=None):
+    token = begin(request)
+    try:
+        yield
+    finally:
+        end(token)
+
+
+def _json_value(value):
+    if value is None or isinstance(value, (bool, int, float, str, list, dict)):
+        return value
+    try:
+        return DjangoJSONEncoder().default(value)  # Dates, decimals, UUIDs
+    except TypeError:
+        return str(value)
+
+
+def get_changes(instance, adding):
+    """{field: [old, new]} for the audited columns that differ."""
+    loaded = getattr(instance, '_loaded_values', None)
+    changes = {}
+    for field in instance._meta.concrete_fields:
+        if field.name in IGNORED_FIELDS or field.attname not in instance.__dict__:
+            continue
+        new = instance.__dict__[field.attname]
+        if adding or loaded is None:
+            old = None
+        elif field.attname in loaded:
+            old = loaded[field.attname]
+        else:
+            continue
+        if adding or loaded is None or old != new:
+            changes[field.name] = [_json_value(old), _json_value(new)]
+    return changes
+
+
+def record_change(instance, action, changes, using=None, record_id=None):
+    from core.models import AUDIT_LOG
+
+    if action == AUDIT_LOG.UPDATE and not changes:
+        return
+    entry = AUDIT_LOG(
+        TABLE_NAME=instance._meta.db_table,
+        RECORD_ID=str(instance.pk if record_id is None else record_id),
+        ACTION=action,
+        CHANGES=changes,
+        CHANGED_BY=getattr(instance, 'UPDATED_BY', None),
+        CHANGED_AT=timezone.now(),
+    )
+    buffer = _current.get()
+
+    def queue():
+        # A commit after the request finished goes to the background writer
+        if buffer is not None and not buffer.closed:
+            buffer.entries.append(entry)
+        else:
+            get_audit_writer().add(entry)
+
+    transaction.on_commit(queue, using=using)
@@ -0,0 +1,101 @@
+"""
+Buffered, batched inserts for append-only tables.
+
+BufferedWriter collects unsaved model instances and writes them with one
+bulk_create from a background thread, woken once `batch_size` rows are
+waiting and otherwise every `flush_interval_ms`. The request that adds a row
+never writes it, so the insert is not part of its transaction; the thread
+closes its connection after each flush instead of keeping one open.
+Rows that fail to insert are kept for the next flush; past `max_buffer` rows
+the oldest are dropped and counted in core.monitoring, so a database outage
+cannot exhaust memory. Rows still buffered when the process exits are
+flushed by an atexit hook.
+
+With `flush_interval_ms` 0 there is no thread and full batches are written
+inline by add(); tests use this (core.testing.inline_buffered_writes) so no
+connection outlives the test database.
+"""
+import atexit
+import logging
+import threading
+
+from django.db import connection
+
+from core import monitoring
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedWriter:
+    def __init__(self, model, batch_size=100, flush_interval_ms=1000, max_buffer=10000, name=None):
+        self.model = model
+        self.batch_size = batch_size
+        self.flush_interval_ms = flush_interval_ms
+        self.max_buffer = max_buffer
+        self.name = name or model._meta.db_table.lower()
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.buffer = []
+        self.thread = None
+        self.wakeup = threading.Event()
+        atexit.register(self.flush)
+
+    def add(self, instance):
+        with self.lock:
+            self.buffer.append(instance)
+            dropped = len(self.buffer) - self.max_buffer
+            if dropped > 0:
+                del self.buffer[:dropped]
+                monitoring.increment(f'buffered_writer.{self.name}.dropped', dropped)
+            full = len(self.buffer) >= self.batch_size
+        if not self.flush_interval_ms:
+            if full:
+                self.flush()
+            return
+        self._ensure_thread()
+        if full:
+            self.wakeup.set()
+
+    def flush(self):
+        """Write everything buffered; returns the number of rows written."""
+        with self.flush_lock:
+            with self.lock:
+                rows, self.buffer = self.buffer, []
+            if not rows:
+                return 0
+            try:
+                self.model.objects.bulk_create(rows, batch_size=self.batch_size)
+            except Exception as e:
+                logger.error(f"Flushing {len(rows)} rows to {self.name} failed: {str(e)}")
+                monitoring.increment(f'buffered_writer.{self.name}.errors')
+                with self.lock:
+                    self.buffer[:0] = rows
+                return 0
+            monitoring.increment(f'buffered_writer.{self.name}.written', len(rows))
+            return len(rows)
+
+    def pending(self):
+        with self.lock:
+            return len(self.buffer)
+
+    def _ensure_thread(self):
+        if not self.flush_interval_ms or (self.thread and self.thread.is_alive()):
+            return
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._run, name=f'{self.name}-writer', daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        try:
+            while self.flush_interval_ms:
+                self.wakeup.wait(self.flush_interval_ms / 1000)
+                self.wakeup.clear()
+                try:
+                    self.flush()
+                finally:
+                    # Idle between flushes; reconnect on the next one
+                    connection.close()
+        finally:
+            connection.close()
@@ -0,0 +1,375 @@
+"""
+Bulk CSV/XLSX imports through PostgreSQL COPY.
+
+An importer turns the rows of a file into rows of one model:
+
+1. read_rows() parses a CSV (or an XLSX, through openpyxl) into dicts keyed
+   by the header, which names model fields.
+2. Every row is cleaned -- field.to_python()/validate() per column, defaults
+   filled in -- in a process pool once there are BULK_IMPORT_PARALLEL_THRESHOLD
+   rows, since this part is CPU-bound. Problems are collected per row.
+3. If no row failed, the rows are written in chunks of BULK_IMPORT_CHUNK_SIZE.
+   before_chunk() does slow per-chunk work (password hashing) outside any
+   transaction -- skipped on a dry run, whose rows are never stored; then each chunk gets its own: prepare() fills derived columns
+   (generated IDs, audit stamps), COPY loads the chunk into a temporary
+   staging table, foreign keys and unique columns are checked with a few
+   set-based queries, one INSERT ... SELECT moves the rows to the model's
+   table and after_insert() adds dependent rows the same way.
+
+A chunk with errors is rolled back and the import stops there (a unique
+value taken by a concurrent write after the checks fails the chunk as a
+whole, reported on its first row); earlier chunks stay committed and
+ImportResult.created says how many rows they hold. A dry run rolls back every
+chunk, so it reports the errors of the whole file, database checks included,
+without writing anything.
+
+No model signals are sent and AuditModel.save() is not called (so no
+AUDIT_LOG entries); rows_imported is sent after each committed chunk so
+caches of the model can be dropped.
+"""
+import csv
+import io
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.db import IntegrityError, connection, models, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from core import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Sent with sender=<model> once a chunk of imported rows has committed
+rows_imported = Signal()
+
+ImportResult = namedtuple('ImportResult', ['created', 'errors', 'seconds', 'rows_per_sec'])
+
+# Bookkeeping columns never read from the file
+AUDIT_FIELDS = ('CREATED_AT', 'CREATED_BY', 'UPDATED_AT', 'UPDATED_BY', 'DELETED_AT', 'DELETED_BY', 'IS_DELETED')
+
+
+class ChunkFailed(Exception):
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} rows failed")
+        self.errors = errors
+
+
+def read_rows(file, name):
+    """Dicts keyed by the header row of a .csv or .xlsx `file` (path or binary file object)."""
+    if name.lower().endswith('.xlsx'):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValueError("XLSX imports need openpyxl; upload a CSV instead")
+        sheet = load_workbook(file, read_only=True, data_only=True).active
+        lines = sheet.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else '' for cell in next(lines, ())]
+        return [dict(zip(header, line)) for line in lines if any(cell not in (None, '') for cell in line)]
+
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, newline='', encoding='utf-8-sig') as f:
+            return list(csv.DictReader(f))
+    return list(csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig', newline='')))
+
+
+def _init_worker():
+    # Spawned workers (non-fork start methods) need Django configured
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def _clean_rows(importer, rows):
+    return [importer.clean_row(row) for row in rows]
+
+
+def _copy_value(field, value):
+    """`value` in COPY text format."""
+    if value is None:
+        return r'\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(field, models.JSONField):
+        value = json.dumps(value, cls=field.encoder)
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+class ModelImporter:
+    """
+    Imports rows of `model`. Subclasses set derived_fields for columns they
+    compute in prepare(), and may add validate_row() checks and
+    after_insert() writes.
+    """
+    model = None
+    derived_fields = AUDIT_FIELDS
+
+    def __init__(self, model=None, actor='system'):
+        if model is not None:
+            self.model = model
+        self.actor = actor
+
+    def get_fields(self):
+        return [
+            field for field in self.model._meta.concrete_fields
+            if not isinstance(field, models.AutoField)
+        ]
+
+    def default_value(self, field):
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            now = timezone.now()
+            return now.date() if field.get_internal_type() == 'DateField' else now
+        if field.has_default():
+            return field.get_default()
+        if field.null:
+            return None
+        if field.blank and field.empty_strings_allowed:
+            return ''
+        raise ValidationError(field.error_messages['blank'])
+
+    def clean_value(self, field, raw):
+        if isinstance(raw, str):
+            raw = raw.strip()
+        if raw in (None, ''):
+            return self.default_value(field)
+        if field.is_relation:
+            # Existence is checked against the table once the chunk is staged
+            return field.target_field.to_python(raw)
+        value = field.to_python(raw)
+        field.validate(value, None)
+        field.run_validators(value)
+        return value
+
+    def clean_row(self, row):
+        """(values by attname, errors by field name) for one file row."""
+        values, errors = {}, {}
+        for field in self.get_fields():
+            if field.name in self.derived_fields:
+                # Filled in by prepare()
+                values[field.attname] = field.get_default() if field.has_default() else None
+                continue
+            try:
+                values[field.attname] = self.clean_value(field, row.get(field.name, row.get(field.attname)))
+            except ValidationError as e:
+                errors[field.name] = e.messages
+        if not errors:
+            self.validate_row(values, errors)
+        return values, errors
+
+    def validate_row(self, values, errors):
+        """Cross-field checks; add messages to `errors`."""
+
+    def clean_rows(self, rows, workers=None):
+        threshold = getattr(settings, 'BULK_IMPORT_PARALLEL_THRESHOLD', 1000)
+        if workers is None:
+            workers = getattr(settings, 'BULK_IMPORT_WORKERS', None) or os.cpu_count() or 1
+        if workers <= 1 or len(rows) < threshold:
+            return _clean_rows(self, rows)
+
+        size = max(1, len(rows) // (workers * 4))
+        parts = [rows[start:start + size] for start in range(0, len(rows), size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            return [cleaned for part in executor.map(_clean_rows, [self] * len(parts), parts) for cleaned in part]
+
+    def before_chunk(self, rows):
+        """
+        Work on a chunk of (line, values) pairs before its transaction starts,
+        so locks taken in prepare() (ID_COUNTERS rows) are not held through it.
+        Not called on a dry run: after_insert() must do without its results.
+        """
+
+    def prepare(self, rows):
+        """
+        Fill derived columns of a chunk of (line, values) pairs before it is
+        staged; returns {line: errors} for rows that cannot be written.
+        """
+        now = timezone.now()
+        names = {field.attname for field in self.get_fields()}
+        stamps = {'CREATED_BY': self.actor, 'UPDATED_BY': self.actor, 'CREATED_AT': now, 'UPDATED_AT': now}
+        stamps = {name: value for name, value in stamps.items() if name in names}
+        for line, values in rows:
+            values.update(stamps)
+        return {}
+
+    def stage(self, cursor, rows):
+        """COPY a chunk into a temporary table shaped like the model's table; returns its name."""
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        fields = self.get_fields()
+        columns = ', '.join(f'"{field.column}"' for field in fields)
+        stage = f'import_stage_{self.model._meta.model_name}'
+        cursor.execute(
+            f'CREATE TEMP TABLE IF NOT EXISTS "{stage}" ON COMMIT DROP AS '
+            f'SELECT 0 AS "_ROW", {columns} FROM {table} WITH NO DATA'
+        )
+        cursor.execute(f'TRUNCATE "{stage}"')
+
+        buffer = io.StringIO()
+        for line, values in rows:
+            buffer.write('\t'.join([str(line)] + [_copy_value(field, values[field.attname]) for field in fields]))
+            buffer.write('\n')
+        buffer.seek(0)
+        cursor.copy_expert(f'COPY "{stage}" ("_ROW", {columns}) FROM STDIN', buffer)
+        return stage
+
+    def unique_column_sets(self):
+        fields = {field.name: field for field in self.get_fields()}
+        sets = [(field,) for field in fields.values() if field.unique]
+        opts = self.model._meta
+        for names in list(opts.unique_together) + [constraint.fields for constraint in opts.total_unique_constraints]:
+            if all(name in fields for name in names):
+                sets.append(tuple(fields[name] for name in names))
+        return sets
+
+    def check_stage(self, cursor, stage):
+        """Foreign keys that do not exist and values that break unique columns, as {line: errors}."""
+        errors = {}
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        for field in self.get_fields():
+            if not (field.many_to_one or field.one_to_one):
+                continue
+            target = connection.ops.quote_name(field.related_model._meta.db_table)
+            cursor.execute(
+                f'SELECT s."_ROW", s."{field.column}" FROM "{stage}" s '
+                f'WHERE s."{field.column}" IS NOT NULL AND NOT EXISTS '
+                f'(SELECT 1 FROM {target} t WHERE t."{field.target_field.column}" = s."{field.column}")'
+            )
+            for line, value in cursor.fetchall():
+                errors.setdefault(line, {}).setdefault(field.name, []).append(f"{value} does not exist.")
+
+        for fields in self.unique_column_sets():
+            columns = ', '.join(f'"{field.column}"' for field in fields)
+            label = ', '.join(field.name for field in fields)
+            not_null = ' AND '.join(f's."{field.column}" IS NOT NULL' for field in fields)
+            matches = ' AND '.join(f't."{field.column}" = s."{field.column}"' for field in fields)
+            cursor.execute(
+                f'SELECT s."_ROW" FROM "{stage}" s WHERE {not_null} '
+                f'AND EXISTS (SELECT 1 FROM {table} t WHERE {matches})'
+            )
+            for (line,) in cursor.fetchall():
+                errors.setdefault(line, {}).setdefault(fields[0].name, []).append(f"{label} already exists.")
+            cursor.execute(
+                f'SELECT "_ROW" FROM (SELECT s."_ROW", row_number() OVER (PARTITION BY {columns} ORDER BY s."_ROW") AS n '
+                f'FROM "{stage}" s WHERE {not_null}) d WHERE n > 1'
+            )
+            for (line,) in cursor.fetchall():
+                errors.setdefault(line, {}).setdefault(fields[0].name, []).append(f"{label} repeats an earlier row.")
+        return errors
+
+    def insert_from_stage(self, cursor, model, stage, expressions):
+        """
+        INSERT INTO `model` one row per staged row. `expressions` maps
+        attnames to SQL over the stage (alias s); other columns get their
+        default and the audit stamps.
+        """
+        importer = ModelImporter(model, actor=self.actor)
+        fields = importer.get_fields()
+        values = {}
+        for field in fields:
+            if field.attname not in expressions:
+                values[field.attname] = importer.clean_value(field, None)
+        importer.prepare([(None, values)])
+
+        columns = ', '.join(f'"{field.column}"' for field in fields)
+        selects, params = [], []
+        for field in fields:
+            if field.attname in expressions:
+                selects.append(expressions[field.attname])
+            else:
+                selects.append('%s')
+                params.append(field.get_db_prep_save(values[field.attname], connection))
+        cursor.execute(
+            f'INSERT INTO {connection.ops.quote_name(model._meta.db_table)} ({columns}) '
+            f'SELECT {", ".join(selects)} FROM "{stage}" s ORDER BY s."_ROW"',
+            params,
+        )
+
+    def after_insert(self, cursor, stage, rows):
+        """Write rows that depend on the imported ones; returns {line: errors}."""
+        return {}
+
+    def write_chunk(self, rows):
+        errors = self.prepare(rows)
+        if errors:
+            return errors
+        with connection.cursor() as cursor:
+            stage = self.stage(cursor, rows)
+            errors = self.check_stage(cursor, stage)
+            if errors:
+                return errors
+            fields = self.get_fields()
+            columns = ', '.join(f'"{field.column}"' for field in fields)
+            cursor.execute(
+                f'INSERT INTO {connection.ops.quote_name(self.model._meta.db_table)} ({columns}) '
+                f'SELECT {columns} FROM "{stage}" ORDER BY "_ROW"'
+            )
+            return self.after_insert(cursor, stage, rows)
+
+    def run(self, rows, dry_run=False, chunk_size=None, workers=None):
+        """Import `rows` (dicts from read_rows); returns an ImportResult."""
+        started = time.perf_counter()
+        errors = []
+        valid = []
+        # Line 1 is the header
+        for line, (values, row_errors) in enumerate(self.clean_rows(rows, workers=workers), start=2):
+            if row_errors:
+                errors.append({'row': line, 'errors': row_errors})
+            else:
+                valid.append((line, values))
+
+        created = 0
+        if not errors or dry_run:
+            chunk_size = chunk_size or getattr(settings, 'BULK_IMPORT_CHUNK_SIZE', 1000)
+            for start in range(0, len(valid), chunk_size):
+                chunk = valid[start:start + chunk_size]
+                if not dry_run:
+                    self.before_chunk(chunk)
+                try:
+                    with transaction.atomic():
+                        try:
+                            chunk_errors = self.write_chunk(chunk)
+                        except IntegrityError as e:
+                            # Written by someone else since check_stage(); the
+                            # database does not say which row of the chunk clashed
+                            raise ChunkFailed({chunk[0][0]: {NON_FIELD_ERRORS: [
+                                f"Rows {chunk[0][0]}-{chunk[-1][0]} were not written: one of them conflicts "
+                                f"with a row stored after they were checked ({str(e).strip()})"
+                            ]}})
+                        if chunk_errors or dry_run:
+                            raise ChunkFailed(chunk_errors)
+                except ChunkFailed as e:
+                    errors.extend({'row': line, 'errors': row_errors} for line, row_errors in sorted(e.errors.items()))
+                    if not dry_run:
+                        break
+                else:
+                    created += len(chunk)
+                    rows_imported.send(sender=self.model, count=len(chunk))
+
+        seconds = time.perf_counter() - started
+        rate = len(rows) / seconds if seconds else float(len(rows))
+        monitoring.increment(f'bulk_import.{self.model._meta.label}.rows', created)
+        logger.info(
+            f"Imported {created} of {len(rows)} {self.model._meta.label} rows in {seconds:.2f}s "
+            f"({rate:.1f} rows/sec, {len(errors)} rows with errors{', dry run' if dry_run else ''})"
+        )
+        return ImportResult(created, errors, seconds, rate)
+
+
+def get_importer(kind, actor='system'):
+    """The importer registered under `kind` in BULK_IMPORTERS, or None."""
+    from django.apps import apps
+    from django.utils.module_loading import import_string
+
+    target = getattr(settings, 'BULK_IMPORTERS', {}).get(kind)
+    if target is None:
+        return None
+    if target.count('.') == 1:
+        return ModelImporter(apps.get_model(target), actor=actor)
+    return import_string(target)(actor=actor)
@@ -0,0 +1,175 @@
+"""
+Read-through, in-process cache of rarely changing lookup rows.
+
+cached_get(BRANCH, select_related=('PROGRAM',), BRANCH_ID=5) returns a copy
+of the row, from the worker's memory when possible. Only models listed in
+MODEL_CACHE_MODELS may be cached; their post_save/post_delete signals (wired
+in CoreConfig.ready) bump a per-model generation counter:
+
+- locally, so this worker drops the entries as soon as the change commits;
+- in CACHE_GENERATIONS, so other workers drop theirs the next time they
+  compare generations. That check (one query for every model) runs at most
+  every MODEL_CACHE_SYNC_INTERVAL seconds, which bounds how stale a read can
+  be after a change on another worker.
+
+Entries are also dropped after MODEL_CACHE_MAX_AGE seconds. Rows read inside
+a transaction are not stored, as they may not be committed yet.
+
+Entries built with select_related depend on every model they contain.
+queryset.update() and raw SQL do not send signals; call
+invalidate_model_cache(model) after them (core.bulk_import sends
+rows_imported, which is handled like a save). Other in-process caches can follow
+the same counters through get_generation(model). Caches of anything else can
+use a named counter of their own: bump_generation(name) after a change, and
+get_shared_generation(name), the same number on every worker, in their keys.
+Hits, misses and invalidations are counted in core.monitoring under
+model_cache.<label>.
+"""
+import copy
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import post_delete, post_save
+
+from core import monitoring
+
+_lock = threading.Lock()
+_entries = {}
+_generations = {}  # {label: (shared generation last seen, local generation)}
+_synced_at = None
+
+
+def _label(model):
+    return model._meta.label
+
+
+def get_cached_models():
+    return {apps.get_model(label) for label in getattr(settings, 'MODEL_CACHE_MODELS', [])}
+
+
+def _sync_generations():
+    """Compare every local generation with CACHE_GENERATIONS when due."""
+    global _synced_at
+    from core.models import CACHE_GENERATION
+
+    now = time.monotonic()
+    if _synced_at is not None and now - _synced_at < getattr(settings, 'MODEL_CACHE_SYNC_INTERVAL', 1):
+        return
+    shared = dict(CACHE_GENERATION.objects.values_list('LABEL', 'GENERATION'))
+    with _lock:
+        for label in set(getattr(settings, 'MODEL_CACHE_MODELS', [])) | set(shared) | set(_generations):
+            seen, local = _generations.get(label, (None, 0))
+            if shared.get(label, 0) != seen:
+                # Changed on another worker (or first use): start a new local generation
+                _generations[label] = (shared.get(label, 0), local + 1)
+        _synced_at = now
+
+
+def _generation(label):
+    _sync_generations()
+    return _generations[label][1]
+
+
+def get_shared_generation(name):
+    """Generation of the counter `name` in CACHE_GENERATIONS, as last seen by this worker."""
+    _sync_generations()
+    return _generations.get(name, (0, 0))[0]
+
+
+def get_generation(model):
+    """Generation of `model`; it changes once a write to the model has committed."""
+    label = _label(model)
+    if label not in getattr(settings, 'MODEL_CACHE_MODELS', []):
+        raise ValueError(f"{label} is not in MODEL_CACHE_MODELS")
+    return _generation(label)
+
+
+def cached_get(model, select_related=(), **lookup):
+    """model.objects.get(**lookup) through the cache; raises model.DoesNotExist."""
+    label = _label(model)
+    related = [model._meta.get_field(name).related_model for name in select_related]
+    labels = [label] + [_label(related_model) for related_model in related]
+    cached_labels = getattr(settings, 'MODEL_CACHE_MODELS', [])
+    for dependency in labels:
+        if dependency not in cached_labels:
+            raise ValueError(f"{dependency} is not in MODEL_CACHE_MODELS")
+
+    key = (label, tuple(select_related), tuple(sorted(lookup.items())))
+    generations = tuple(_generation(dependency) for dependency in labels)
+    entry = _entries.get(key)
+    max_age = getattr(settings, 'MODEL_CACHE_MAX_AGE', 300)
+    if entry is not None and entry[0] == generations and time.monotonic() - entry[2] < max_age:
+        monitoring.increment(f'model_cache.{label}.hit')
+        return copy.deepcopy(entry[1])
+
+    monitoring.increment(f'model_cache.{label}.miss')
+    queryset = model.objects.all()
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    instance = queryset.get(**lookup)
+    if connections[queryset.db].in_atomic_block:
+        # May be uncommitted, and would outlive a rollback
+        return instance
+    with _lock:
+        if len(_entries) >= getattr(settings, 'MODEL_CACHE_MAX_ENTRIES', 10000):
+            _entries.clear()
+        _entries[key] = (generations, instance, time.monotonic())
+    return copy.deepcopy(instance)
+
+
+def cached_get_or_none(model, select_related=(), **lookup):
+    try:
+        return cached_get(model, select_related=select_related, **lookup)
+    except model.DoesNotExist:
+        return None
+
+
+def _bump(label, using=None):
+    with connections[using or DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO "CACHE_GENERATIONS" ("LABEL", "GENERATION") VALUES (%s, 1) '
+            'ON CONFLICT ("LABEL") DO UPDATE SET "GENERATION" = "CACHE_GENERATIONS"."GENERATION" + 1 '
+            'RETURNING "GENERATION"',
+            [label],
+        )
+        shared = cursor.fetchone()[0]
+    with _lock:
+        _, local = _generations.get(label, (None, 0))
+        _generations[label] = (shared, local + 1)
+
+
+def bump_generation(name, using=None):
+    """Advance the counter `name` on every worker once the current transaction commits."""
+    # Only after commit: earlier, a read could cache the uncommitted row, or
+    # the old one again
+    transaction.on_commit(lambda: _bump(name, using), using=using)
+
+
+def invalidate_model_cache(model, using=None):
+    label = _label(model)
+    monitoring.increment(f'model_cache.{label}.invalidations')
+    bump_generation(label, using)
+
+
+def _model_changed(sender, **kwargs):
+    invalidate_model_cache(sender, using=kwargs.get('using'))
+
+
+def connect_signals():
+    from core.bulk_import import rows_imported
+
+    for model in get_cached_models():
+        rows_imported.connect(_model_changed, sender=model, dispatch_uid=f'model_cache_{_label(model)}_import')
+        post_save.connect(_model_changed, sender=model, dispatch_uid=f'model_cache_{_label(model)}_save')
+        post_delete.connect(_model_changed, sender=model, dispatch_uid=f'model_cache_{_label(model)}_delete')
+
+
+def clear_model_cache():
+    global _synced_at
+    with _lock:
+        _entries.clear()
+        _generations.clear()
+        _synced_at = None
@@ -0,0 +1,77 @@
+"""
+Conditional GET for list endpoints.
+
+ConditionalListMixin computes an ETag for `list` requests from one aggregate
+query -- MAX(UPDATED_AT) and COUNT(*) over the view's queryset -- and answers
+a matching If-None-Match with 304 before the list is queried or serialized.
+200 responses carry the ETag.
+
+Soft deletes and edits through save() move UPDATED_AT; hard deletes and
+inserts change the count. Last-Modified is not sent and If-Modified-Since is
+not honoured: MAX(UPDATED_AT) alone misses hard deletes and rows inserted
+with older stamps, which only the count in the ETag catches.
+queryset.update() does not touch UPDATED_AT unless it is set explicitly.
+Lists that embed rows of other tables can name those models in
+`conditional_related_models` so their changes count too.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from core import monitoring
+
+
+class NotModified(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+
+
+class ConditionalListMixin:
+    conditional_related_models = ()
+
+    def get_list_etag(self):
+        """ETag of the current list request, or None."""
+        queryset = self.filter_queryset(self.get_queryset())
+        model = queryset.model
+        if not any(field.name == 'UPDATED_AT' for field in model._meta.concrete_fields):
+            return None
+
+        stamps = [queryset.aggregate(updated=Max('UPDATED_AT'), rows=Count('pk'))]
+        for related in self.conditional_related_models:
+            stamps.append(related.objects.aggregate(updated=Max('UPDATED_AT'), rows=Count('pk')))
+
+        user_id = getattr(self.request.user, 'USER_ID', None)
+        key = '|'.join([
+            type(self).__name__, str(user_id), self.request.get_full_path(),
+            *(f"{stamp['updated'].isoformat() if stamp['updated'] else ''}:{stamp['rows']}" for stamp in stamps),
+        ])
+        return f'"{hashlib.sha1(key.encode()).hexdigest()}"'
+
+    def is_not_modified(self, request, etag):
+        if_none_match = request.headers.get('If-None-Match')
+        return bool(if_none_match) and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match))
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._list_etag = None
+        if request.method in ('GET', 'HEAD') and getattr(self, 'action', None) == 'list':
+            self._list_etag = self.get_list_etag()
+            if self._list_etag and self.is_not_modified(request, self._list_etag):
+                monitoring.increment('conditional_get.not_modified')
+                raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        etag = getattr(self, '_list_etag', None)
+        if etag and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+        return response
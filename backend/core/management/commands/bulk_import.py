@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.bulk_import import get_importer, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Import a CSV/XLSX file of students, employees or master rows with COPY (see core.bulk_import)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', help=f"One of: {', '.join(getattr(settings, 'BULK_IMPORTERS', {}))}")
+        parser.add_argument('file')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and report errors without writing')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Rows per transaction')
+        parser.add_argument('--workers', type=int, default=None, help='Cleaning processes (default: CPU count)')
+        parser.add_argument('--no-accounts', action='store_true', help='Students/employees: do not create login accounts')
+        parser.add_argument('--actor', default='system', help='Stored in CREATED_BY/UPDATED_BY')
+
+    def handle(self, *args, **options):
+        importer = get_importer(options['kind'], actor=options['actor'])
+        if importer is None:
+            raise CommandError(f"Unknown import kind {options['kind']}")
+        if options['no_accounts']:
+            importer.create_accounts = False
+        try:
+            rows = read_rows(options['file'], options['file'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        result = importer.run(
+            rows, dry_run=options['dry_run'], chunk_size=options['chunk_size'], workers=options['workers'],
+        )
+        for error in result.errors:
+            messages = '; '.join(f"{field}: {' '.join(texts)}" for field, texts in error['errors'].items())
+            self.stderr.write(f"Row {error['row']}: {messages}")
+        self.stdout.write(
+            f"{'Checked' if options['dry_run'] else 'Imported'} {len(rows)} rows, created {result.created} "
+            f"in {result.seconds:.2f}s ({result.rows_per_sec:.1f} rows/sec), {len(result.errors)} rows with errors"
+        )
@@ -3,15 +3,25 @@ from django.utils import timezone
 from datetime import timedelta
 import logging
 
+from core import audit
+
 logger = logging.getLogger(__name__)
 
 class AuditMiddleware(MiddlewareMixin):
+    """
+    Buffers the AUDIT_LOG entries of the request and writes them with one
+    INSERT once the response is ready (see core.audit).
+    """
     def process_request(self, request):
         if hasattr(request, 'user'):
             request._audit_user = request.user
             request._audit_timestamp = timezone.now()
+        request._audit_token = audit.begin(request)
 
     def process_response(self, request, response):
+        if hasattr(request, '_audit_token'):
+            audit.end(request._audit_token)
+            delattr(request, '_audit_token')
         if hasattr(request, '_audit_user'):
             delattr(request, '_audit_user')
         if hasattr(request, '_audit_timestamp'):
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:38
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0001_create_schemas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AUDIT_LOG',
+            fields=[
+                ('AUDIT_ID', models.BigAutoField(db_column='AUDIT_ID', primary_key=True, serialize=False)),
+                ('TABLE_NAME', models.CharField(db_column='TABLE_NAME', max_length=100)),
+                ('RECORD_ID', models.CharField(db_column='RECORD_ID', max_length=100)),
+                ('ACTION', models.CharField(choices=[('CREATE', 'Create'), ('UPDATE', 'Update'), ('DELETE', 'Delete')], db_column='ACTION', max_length=10)),
+                ('CHANGES', models.JSONField(db_column='CHANGES', default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('CHANGED_BY', models.CharField(blank=True, db_column='CHANGED_BY', max_length=50, null=True)),
+                ('CHANGED_AT', models.DateTimeField(db_column='CHANGED_AT', default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Audit Log',
+                'verbose_name_plural': 'Audit Log',
+                'db_table': 'AUDIT_LOG',
+                'indexes': [models.Index(fields=['TABLE_NAME', 'RECORD_ID'], name='AUDIT_LOG_RECORD_IDX'), models.Index(fields=['CHANGED_AT'], name='AUDIT_LOG_CHANGED_AT_IDX')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_audit_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ID_COUNTER',
+            fields=[
+                ('COUNTER_ID', models.AutoField(db_column='COUNTER_ID', primary_key=True, serialize=False)),
+                ('KIND', models.CharField(db_column='KIND', max_length=30)),
+                ('PREFIX', models.CharField(db_column='PREFIX', max_length=50)),
+                ('LAST_VALUE', models.BigIntegerField(db_column='LAST_VALUE', default=0)),
+            ],
+            options={
+                'verbose_name': 'ID Counter',
+                'verbose_name_plural': 'ID Counters',
+                'db_table': 'ID_COUNTERS',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='id_counter',
+            constraint=models.UniqueConstraint(fields=('KIND', 'PREFIX'), name='ID_COUNTERS_KIND_PREFIX_UNIQ'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_id_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CACHE_GENERATION',
+            fields=[
+                ('LABEL', models.CharField(db_column='LABEL', max_length=100, primary_key=True, serialize=False)),
+                ('GENERATION', models.BigIntegerField(db_column='GENERATION', default=0)),
+            ],
+            options={
+                'verbose_name': 'Cache Generation',
+                'verbose_name_plural': 'Cache Generations',
+                'db_table': 'CACHE_GENERATIONS',
+            },
+        ),
+    ]
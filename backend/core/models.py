@@ -1,15 +1,99 @@
-from django.db import models
+import copy
+from django.db import connections, models
+from django.db.models.sql import UpdateQuery
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 
+from core import audit
+
 class SchemaModel(models.Model):
     class Meta:
         abstract = True
 
-class AuditModel(SchemaModel):
+def update_returning(queryset, returning, **values):
+    """
+    Run queryset.update(**values) as a single UPDATE ... RETURNING statement.
+    Values may be F()/Case() expressions; returns one dict per updated row
+    holding the `returning` field names. Fields inherited from a parent model
+    cannot be updated this way.
+    """
+    query = queryset.query.chain(UpdateQuery)
+    query.add_update_values(values)
+    if query.related_updates:
+        # Fields of a parent model need UPDATEs of their own, which
+        # execute_sql() would run and as_sql() leaves out
+        raise ValueError("update_returning() cannot update fields of parent models")
+    # as_sql() runs pre_sql_setup(): filters across joins become "pk IN (subquery)"
+    sql, params = query.get_compiler(queryset.db).as_sql()
+    if not sql:
+        return []
+    connection = connections[queryset.db]
+    columns = ', '.join(
+        connection.ops.quote_name(queryset.model._meta.get_field(name).column)
+        for name in returning
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"{sql} RETURNING {columns}", params)
+        return [dict(zip(returning, row)) for row in cursor.fetchall()]
+
+# Column values that can be changed in place (JSONField, ArrayField)
+MUTABLE_TYPES = (dict, list, set)
+
+
+class DirtyFieldsMixin:
+    """
+    Keeps a snapshot of the column values an instance was loaded with, so an
+    update can write only the columns that changed without re-reading the row.
+    Immutable values are kept by reference; only containers (JSON, arrays)
+    are copied.
+    """
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_loaded_values()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self._snapshot_loaded_values(fields)
+
+    def _snapshot_loaded_values(self, fields=None):
+        if fields is None or not hasattr(self, '_loaded_values'):
+            self._loaded_values = {}
+            fields = None
+        for field in self._meta.concrete_fields:
+            if fields is not None and field.name not in fields and field.attname not in fields:
+                continue
+            if field.attname in self.__dict__:
+                value = self.__dict__[field.attname]
+                if isinstance(value, MUTABLE_TYPES):
+                    # Copied so in-place edits of JSON values are still detected
+                    value = copy.deepcopy(value)
+                self._loaded_values[field.attname] = value
+
+    def get_dirty_fields(self):
+        """
+        Names of the concrete fields changed since the instance was loaded,
+        or None when there is no snapshot (e.g. the instance was built in memory).
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        dirty = []
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue  # Deferred fields that were never touched are clean
+            if field.attname not in loaded or loaded[field.attname] != self.__dict__[field.attname]:
+                dirty.append(field.name)
+        return dirty
+
+class AuditModel(DirtyFieldsMixin, SchemaModel):
     """
-    Abstract base class for audit fields that can be inherited by any model
+    Abstract base class for audit fields that can be inherited by any model.
+    Every save()/delete() also records its field-level changes in AUDIT_LOG
+    (see core.audit).
     """
     CREATED_BY = models.CharField(
         max_length=50,
@@ -47,7 +131,7 @@ class AuditModel(SchemaModel):
         db_column='IS_DELETED'
     )
 
-    def save(self, force_insert=False, force_update=False, *args, **kwargs):
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
         if not self.pk and not self.CREATED_BY:  # Only set if not already set
             self.CREATED_BY = 'system'
             self.CREATED_AT = timezone.now()
@@ -60,7 +144,17 @@ class AuditModel(SchemaModel):
             self.DELETED_BY = self.UPDATED_BY or 'system'
             self.DELETED_AT = timezone.now()
 
-        super().save(force_insert=force_insert, force_update=force_update, *args, **kwargs)
+        adding = self._state.adding
+        super().save(force_insert=force_insert, force_update=force_update, using=using, update_fields=update_fields)
+
+        changes = audit.get_changes(self, adding)
+        if update_fields is not None:
+            changes = {name: diff for name, diff in changes.items() if name in update_fields}
+        action = AUDIT_LOG.CREATE if adding else AUDIT_LOG.UPDATE
+        if changes.get('IS_DELETED', [None, False])[1] is True:
+            action = AUDIT_LOG.DELETE
+        audit.record_change(self, action, changes, using=using)
+        self._snapshot_loaded_values(update_fields)
 
     def delete(self, using=None, keep_parents=False):
         """Soft delete the instance"""
@@ -69,7 +163,83 @@ class AuditModel(SchemaModel):
 
     def hard_delete(self, using=None, keep_parents=False):
         """Actually delete the instance from the database"""
-        super().delete(using=using, keep_parents=keep_parents)
+        record_id = self.pk
+        result = super().delete(using=using, keep_parents=keep_parents)
+        audit.record_change(self, AUDIT_LOG.DELETE, {}, using=using, record_id=record_id)
+        return result
 
     class Meta:
         abstract = True
+
+class AUDIT_LOG(models.Model):
+    """
+    Field-level change history of AuditModel rows; CHANGES maps each changed
+    field to [old, new]. Written in batches by core.audit.
+    """
+    CREATE = 'CREATE'
+    UPDATE = 'UPDATE'
+    DELETE = 'DELETE'
+    ACTION_CHOICES = [
+        (CREATE, 'Create'),
+        (UPDATE, 'Update'),
+        (DELETE, 'Delete'),
+    ]
+
+    AUDIT_ID = models.BigAutoField(primary_key=True, db_column='AUDIT_ID')
+    TABLE_NAME = models.CharField(max_length=100, db_column='TABLE_NAME')
+    RECORD_ID = models.CharField(max_length=100, db_column='RECORD_ID')
+    ACTION = models.CharField(max_length=10, choices=ACTION_CHOICES, db_column='ACTION')
+    CHANGES = models.JSONField(default=dict, encoder=DjangoJSONEncoder, db_column='CHANGES')
+    CHANGED_BY = models.CharField(max_length=50, null=True, blank=True, db_column='CHANGED_BY')
+    CHANGED_AT = models.DateTimeField(default=timezone.now, db_column='CHANGED_AT')
+
+    class Meta:
+        db_table = 'AUDIT_LOG'
+        verbose_name = 'Audit Log'
+        verbose_name_plural = 'Audit Log'
+        indexes = [
+            models.Index(fields=['TABLE_NAME', 'RECORD_ID'], name='AUDIT_LOG_RECORD_IDX'),
+            models.Index(fields=['CHANGED_AT'], name='AUDIT_LOG_CHANGED_AT_IDX'),
+        ]
+
+    def __str__(self):
+        return f"{self.ACTION} {self.TABLE_NAME}:{self.RECORD_ID}"
+
+
+class ID_COUNTER(models.Model):
+    """
+    Last number handed out for each (KIND, PREFIX), e.g. ('employee',
+    'EMP2025T'). Incremented atomically by utils.id_generators.allocate_ids.
+    """
+    COUNTER_ID = models.AutoField(primary_key=True, db_column='COUNTER_ID')
+    KIND = models.CharField(max_length=30, db_column='KIND')
+    PREFIX = models.CharField(max_length=50, db_column='PREFIX')
+    LAST_VALUE = models.BigIntegerField(default=0, db_column='LAST_VALUE')
+
+    class Meta:
+        db_table = 'ID_COUNTERS'
+        verbose_name = 'ID Counter'
+        verbose_name_plural = 'ID Counters'
+        constraints = [
+            models.UniqueConstraint(fields=['KIND', 'PREFIX'], name='ID_COUNTERS_KIND_PREFIX_UNIQ'),
+        ]
+
+    def __str__(self):
+        return f"{self.KIND}:{self.PREFIX} = {self.LAST_VALUE}"
+
+
+class CACHE_GENERATION(models.Model):
+    """
+    Per-model generation counters of core.cache, shared by every worker
+    through the database. Bumped once a write to the model has committed.
+    """
+    LABEL = models.CharField(max_length=100, primary_key=True, db_column='LABEL')
+    GENERATION = models.BigIntegerField(default=0, db_column='GENERATION')
+
+    class Meta:
+        db_table = 'CACHE_GENERATIONS'
+        verbose_name = 'Cache Generation'
+        verbose_name_plural = 'Cache Generations'
+
+    def __str__(self):
+        return f"{self.LABEL} = {self.GENERATION}"
@@ -0,0 +1,26 @@
+"""
+In-process counters for monitoring, exposed at /api/monitoring/counters/.
+
+Counters are per worker process; a scraper should poll every worker or sum
+across them.
+"""
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+
+
+def increment(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+def get_counters(prefix=''):
+    with _lock:
+        return {name: count for name, count in sorted(_counters.items()) if name.startswith(prefix)}
+
+
+def reset_counters():
+    with _lock:
+        _counters.clear()
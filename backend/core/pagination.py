@@ -0,0 +1,46 @@
+"""
+Opt-in keyset pagination for list endpoints.
+
+Lists stay unpaginated unless the client sends `page_size` or a `cursor`, so
+existing callers keep working. Pages are fetched with
+`WHERE <ordering column> > <last value> ORDER BY ... LIMIT n` on a unique,
+indexed column (the view's `keyset_ordering`, default the primary key), so
+deep pages cost the same as the first. No COUNT(*) is issued unless the
+client passes `count=true`.
+"""
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'KEYSET_PAGE_SIZE', 100)
+        self.max_page_size = getattr(settings, 'KEYSET_MAX_PAGE_SIZE', 500)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'keyset_ordering', None) or queryset.model._meta.pk.name
+        return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.page_size_query_param not in params and self.cursor_query_param not in params:
+            return None
+        self.count = None
+        if params.get(self.count_query_param, '').lower() in ('1', 'true'):
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_page_info(self):
+        info = OrderedDict([('next', self.get_next_link()), ('previous', self.get_previous_link())])
+        if self.count is not None:
+            info['count'] = self.count
+        return info
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([*self.get_page_info().items(), ('results', data)]))
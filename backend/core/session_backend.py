@@ -0,0 +1,54 @@
+"""
+Cached, database-backed sessions that coalesce activity-only writes.
+
+With SESSION_SAVE_EVERY_REQUEST and SessionManagementMiddleware stamping
+`last_activity`, every request would otherwise UPDATE django_session. This
+store always refreshes the cache copy, but writes the database row only when
+session data other than `last_activity` changed, or when the last database
+write is older than SESSION_WRITE_GRANULARITY seconds. The database copy (and
+its expire_date) therefore lags the live session by at most that granularity.
+
+Enable with SESSION_ENGINE = 'core.session_backend'.
+"""
+import copy
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+from core import monitoring
+
+DB_SAVED_AT_KEY = '_db_saved_at'
+ACTIVITY_KEYS = {'last_activity', DB_SAVED_AT_KEY}
+
+
+def _without_activity(data):
+    return {key: value for key, value in data.items() if key not in ACTIVITY_KEYS}
+
+
+class SessionStore(CachedDBStore):
+    def load(self):
+        data = super().load()
+        self._loaded_data = copy.deepcopy(data)
+        return data
+
+    def can_coalesce(self):
+        loaded = getattr(self, '_loaded_data', None)
+        saved_at = self._session.get(DB_SAVED_AT_KEY)
+        if loaded is None or saved_at is None:
+            return False
+        granularity = getattr(settings, 'SESSION_WRITE_GRANULARITY', 60)
+        if time.time() - saved_at >= granularity:
+            return False
+        return _without_activity(self._session) == _without_activity(loaded)
+
+    def save(self, must_create=False):
+        if not must_create and self.session_key and self.can_coalesce():
+            self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+            monitoring.increment('session.writes.coalesced')
+            return
+
+        self._session[DB_SAVED_AT_KEY] = time.time()
+        super().save(must_create)
+        self._loaded_data = copy.deepcopy(self._session)
+        monitoring.increment('session.writes.db')
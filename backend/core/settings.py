@@ -55,6 +55,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
     'rest_framework_simplejwt',
@@ -65,12 +66,12 @@ AUTH_USER_MODEL = 'accounts.CustomUser'  # Make sure this matches your accounts
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # Must be first
-    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.AuditMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -189,17 +190,120 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
 
+# Email outbox: mails are queued in EMAIL_OUTBOX and delivered by
+# `python manage.py process_email_outbox`. With EMAIL_OUTBOX_EAGER the row is
+# sent in-process right after commit. Set EMAIL_OUTBOX_BACKEND to
+# 'django.core.mail.backends.filebased.EmailBackend' for an offline file sink.
+EMAIL_OUTBOX_EAGER = os.getenv('EMAIL_OUTBOX_EAGER', 'False') == 'True'
+EMAIL_OUTBOX_BACKEND = os.getenv('EMAIL_OUTBOX_BACKEND')  # Defaults to EMAIL_BACKEND
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', os.path.join(BASE_DIR, 'sent_emails'))
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60  # seconds, multiplied by the attempt number
+# Rows left SENDING this long (sender died) are failed rather than resent;
+# undelivered credential/OTP mails are dropped, body included, after a day
+EMAIL_OUTBOX_SENDING_TIMEOUT = 600
+EMAIL_OUTBOX_SENSITIVE_MAX_AGE = 86400
+
+# OTP storage (see accounts.otp_store). The database store keeps OTPs in the
+# UNLOGGED OTP_TOKENS table; CacheOTPStore uses the OTP_CACHE_ALIAS cache,
+# which must be shared (Redis/Memcached) when running several workers.
+OTP_STORE = os.getenv('OTP_STORE', 'accounts.otp_store.DatabaseOTPStore')
+OTP_CACHE_ALIAS = 'default'
+OTP_EXPIRY_MINUTES = 3
+OTP_MAX_ATTEMPTS = 3
+OTP_BLOCK_MINUTES = 15
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'college-erp'),
+    }
+}
+
+# Token-bucket rate limits for the auth endpoints (see core.throttling).
+# 'local' keeps buckets per process; 'cache' shares them via RATE_LIMIT_CACHE_ALIAS.
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'local')
+RATE_LIMIT_CACHE_ALIAS = 'default'
+RATE_LIMITS = {
+    'login': {'ip': '30/min', 'user': '10/min'},
+    'send_otp': {'ip': '10/min', 'user': '3/min'},
+    'password_reset': {'ip': '10/min', 'user': '3/min'},
+}
+
+# Password history: number of previous hashes a new password is checked
+# against, and threads used to verify them (1 = sequential)
+PASSWORD_HISTORY_LIMIT = 5
+PASSWORD_HISTORY_WORKERS = int(os.getenv('PASSWORD_HISTORY_WORKERS', min(PASSWORD_HISTORY_LIMIT, os.cpu_count() or 1)))
+
+# Bulk account provisioning (see accounts.provisioning): hashing processes
+# (None = CPU count) and the batch size from which the pool is used
+PROVISIONING_WORKERS = None
+PROVISIONING_PARALLEL_THRESHOLD = 16
+
+# CSV/XLSX imports (see core.bulk_import): importer class, or model label for
+# a plain ModelImporter, per kind accepted by `bulk_import` and
+# /api/imports/<kind>/; rows per COPY/transaction; cleaning processes
+# (None = CPU count) and the row count from which they are used
+BULK_IMPORTERS = {
+    'students': 'student.imports.StudentImporter',
+    'employees': 'establishments.imports.EmployeeImporter',
+    'countries': 'accounts.COUNTRY',
+    'states': 'accounts.STATE',
+    'cities': 'accounts.CITY',
+    'currencies': 'accounts.CURRENCY',
+    'languages': 'accounts.LANGUAGE',
+    'departments': 'accounts.DEPARTMENT',
+    'categories': 'accounts.CATEGORY',
+    'castes': 'accounts.CASTE_MASTER',
+    'quotas': 'accounts.QUOTA_MASTER',
+    'admission_quotas': 'accounts.ADMISSION_QUOTA_MASTER',
+    'universities': 'accounts.UNIVERSITY',
+    'institutes': 'accounts.INSTITUTE',
+    'programs': 'accounts.PROGRAM',
+    'branches': 'accounts.BRANCH',
+    'years': 'accounts.YEAR',
+    'semesters': 'accounts.SEMESTER',
+}
+BULK_IMPORT_CHUNK_SIZE = 1000
+BULK_IMPORT_WORKERS = None
+BULK_IMPORT_PARALLEL_THRESHOLD = 1000
+
+# /api/student/search/ (see student.search): pg_trgm indexes need at least
+# three characters; results per request are capped at the max limit
+STUDENT_SEARCH_MIN_LENGTH = 3
+STUDENT_SEARCH_MAX_LIMIT = 50
+
+# Per-worker typeahead indexes (see core.typeahead): model, ID field and name
+# fields per index; built at startup when preloaded, rebuilt in the background
+# after changes on other workers (seen within MODEL_CACHE_SYNC_INTERVAL) or
+# once older than TYPEAHEAD_MAX_AGE seconds (changes that send no signal)
+TYPEAHEAD_INDEXES = {
+    'students': ('student.STUDENT_MASTER', 'STUDENT_ID', ('NAME', 'SURNAME')),
+    'employees': ('establishments.EMPLOYEE_MASTER', 'EMPLOYEE_ID', ('EMP_NAME',)),
+}
+TYPEAHEAD_PRELOAD = True
+TYPEAHEAD_MAX_AGE = 300
+TYPEAHEAD_CHUNK_SIZE = 2000
+TYPEAHEAD_MAX_LIMIT = 20
+
 # JWT Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Builds request.user from token claims, see accounts.authentication
+        'accounts.authentication.StatelessJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',  # Change this temporarily
     ),
+    # Only paginates when the client asks for it, see core.pagination
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
 }
 
+# Keyset pagination: default page size and the cap on ?page_size=
+KEYSET_PAGE_SIZE = 100
+KEYSET_MAX_PAGE_SIZE = 500
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -209,6 +313,59 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# JWT revocation (see accounts.revocation): how often workers pull newly
+# revoked JTIs and rebuild their Bloom filters; each pull re-reads the last
+# REVOCATION_SYNC_OVERLAP IDs to catch rows whose transaction committed late
+REVOCATION_SYNC_INTERVAL = 5
+REVOCATION_SYNC_OVERLAP = 1000
+REVOCATION_REBUILD_INTERVAL = 3600
+REVOCATION_BLOOM_CAPACITY = 100000
+REVOCATION_EXACT_SET_SIZE = 10000
+
+# Seconds a worker keeps its designation/permission-version cache before
+# re-reading DESIGNATIONS; bounds how long a permission edit takes to reach
+# every worker
+DESIGNATION_CACHE_TTL = 30
+
+# In-process cache of lookup rows (see core.cache). Workers compare their
+# per-model generations with CACHE_GENERATIONS at most every
+# MODEL_CACHE_SYNC_INTERVAL seconds; entries live at most MODEL_CACHE_MAX_AGE
+MODEL_CACHE_MODELS = [
+    'accounts.UNIVERSITY',
+    'accounts.INSTITUTE',
+    'accounts.BRANCH',
+    'accounts.PROGRAM',
+    'accounts.YEAR',
+    'accounts.SEMESTER',
+    'accounts.DESIGNATION',
+    'accounts.CATEGORY',
+    'student.CHECK_LIST_DOCUMENTS',
+]
+MODEL_CACHE_SYNC_INTERVAL = 1
+MODEL_CACHE_MAX_AGE = 300
+MODEL_CACHE_MAX_ENTRIES = 10000
+
+# Upper bound (seconds) on the life of the cached /api/master/snapshot/
+# payload; it is normally dropped as soon as a master row changes
+MASTER_SNAPSHOT_TTL = 3600
+
+# Same for the cached /api/master/hierarchy/ tree
+MASTER_HIERARCHY_TTL = 3600
+
+# Login history (see accounts.login_events): LOGIN_EVENTS rows are buffered
+# and inserted every LOGIN_EVENT_BATCH_SIZE rows or LOGIN_EVENT_FLUSH_INTERVAL_MS
+# milliseconds (0 = no flusher thread, full batches written inline); history queries default to
+# the last LOGIN_EVENT_HISTORY_DAYS days
+LOGIN_EVENT_BATCH_SIZE = 100
+LOGIN_EVENT_FLUSH_INTERVAL_MS = 500
+LOGIN_EVENT_HISTORY_DAYS = 90
+
+# Audit trail (see core.audit): changes made outside a request are inserted
+# every AUDIT_LOG_BATCH_SIZE rows or AUDIT_LOG_FLUSH_INTERVAL_MS milliseconds;
+# request changes are written once at the end of the request
+AUDIT_LOG_BATCH_SIZE = 200
+AUDIT_LOG_FLUSH_INTERVAL_MS = 1000
+
 # Add CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # For development only
 CORS_ALLOW_CREDENTIALS = True
@@ -248,7 +405,11 @@ CSRF_COOKIE_SECURE = False  # Set to True in production
 FRONTEND_URL = 'http://localhost:3000'  # Add this if not already present
 
 # Session Settings
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Cached DB sessions; activity-only changes reach the DB at most once per
+# SESSION_WRITE_GRANULARITY seconds (see core.session_backend)
+SESSION_ENGINE = 'core.session_backend'
+SESSION_CACHE_ALIAS = 'default'
+SESSION_WRITE_GRANULARITY = 60
 SESSION_COOKIE_AGE = 1200  # 20 minutes in seconds (changed from 3600)
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_COOKIE_SECURE = True
@@ -0,0 +1,23 @@
+"""
+Test helpers shared by the apps' tests.py.
+"""
+from django.test import TransactionTestCase, override_settings
+
+# Login events and audit entries written inline instead of by a flusher thread
+# (see core.buffered_writer), whose connection would write outside the test's
+# transaction and could outlive the test database
+inline_buffered_writes = override_settings(LOGIN_EVENT_FLUSH_INTERVAL_MS=0, AUDIT_LOG_FLUSH_INTERVAL_MS=0)
+
+
+class CleanupTransactionTestCase(TransactionTestCase):
+    """
+    TransactionTestCase whose rows are deleted directly after each test: the
+    flush it normally runs cannot resolve the schema-qualified table names
+    ("ADMIN"."USERS", ...). `cleanup` lists (model, lookup) pairs, deleted in
+    order, so rows referencing others come first.
+    """
+    cleanup = ()
+
+    def _fixture_teardown(self):
+        for model, lookup in self.cleanup:
+            model.objects.filter(**lookup).delete()
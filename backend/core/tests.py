@@ -0,0 +1,199 @@
+import io
+import tempfile
+import time
+from datetime import date
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from accounts.models import BRANCH, COUNTRY, INSTITUTE, PROGRAM, UNIVERSITY, CustomUser
+from committee.models import EVENT_TYPE_MASTER
+from student.models import STUDENT_MASTER
+from . import typeahead
+from .bulk_import import ModelImporter, get_importer
+from .cache import clear_model_cache
+from .models import CACHE_GENERATION
+from .testing import inline_buffered_writes
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        for i in range(5):
+            EVENT_TYPE_MASTER.objects.create(MAIN_TYPE='Paging', SUB_TYPE=f'Sub {i}')
+
+    def test_lists_are_unpaginated_unless_asked(self):
+        response = APIClient().get('/api/master/event-types/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.data, list)
+
+    def test_pages_follow_next_cursors_without_count(self):
+        client = APIClient()
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get('/api/master/event-types/', {'page_size': 2})
+        self.assertFalse([q for q in ctx.captured_queries if 'COUNT(' in q['sql']])
+        self.assertNotIn('count', response.data)
+
+        seen = []
+        while True:
+            seen += [row['SUB_TYPE'] for row in response.data['results']]
+            if not response.data['next']:
+                break
+            response = client.get(response.data['next'])
+        self.assertEqual(seen, [f'Sub {i}' for i in range(5)])
+
+        response = client.get('/api/master/event-types/', {'page_size': 2, 'count': 'true'})
+        self.assertEqual(response.data['count'], 5)
+
+    @override_settings(KEYSET_MAX_PAGE_SIZE=3)
+    def test_page_size_is_capped(self):
+        response = APIClient().get('/api/master/event-types/', {'page_size': 1000})
+        self.assertEqual(len(response.data['results']), 3)
+
+
+class BulkImportTest(TestCase):
+    def test_master_rows_are_checked_then_copied(self):
+        COUNTRY.objects.create(NAME='Existing', CODE='ZZI', PHONE_CODE='+93')
+        rows = [
+            {'NAME': 'Importland', 'CODE': 'ZZJ', 'PHONE_CODE': '+92'},
+            {'NAME': 'Again', 'CODE': 'ZZI', 'PHONE_CODE': '+91'},
+            {'NAME': 'Twice', 'CODE': 'ZZJ', 'PHONE_CODE': '+90'},
+        ]
+        importer = get_importer('countries', actor='importer')
+        with self.settings(BULK_IMPORT_PARALLEL_THRESHOLD=1):
+            result = importer.run(rows, dry_run=True, workers=2)
+        self.assertEqual(result.created, 0)
+        self.assertEqual([error['row'] for error in result.errors], [3, 4])
+        self.assertEqual(result.errors[0]['errors'], {'CODE': ['CODE already exists.']})
+        self.assertFalse(COUNTRY.objects.filter(CODE='ZZJ').exists())
+
+        result = importer.run([{'NAME': '', 'CODE': 'ZZK'}])
+        self.assertEqual(set(result.errors[0]['errors']), {'NAME', 'PHONE_CODE'})
+
+        result = importer.run([rows[0], {'NAME': 'Newland', 'CODE': 'ZZK', 'PHONE_CODE': '+89'}])
+        self.assertEqual((result.created, result.errors), (2, []))
+        country = COUNTRY.objects.get(CODE='ZZK')
+        self.assertEqual((country.CREATED_BY, country.IS_ACTIVE, country.IS_DELETED), ('importer', True, False))
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as f:
+            f.write('NAME,CODE,PHONE_CODE\nCommandland,ZZL,+88\n')
+            f.flush()
+            out = io.StringIO()
+            call_command('bulk_import', 'countries', f.name, stdout=out)
+        self.assertIn('created 1', out.getvalue())
+        self.assertTrue(COUNTRY.objects.filter(CODE='ZZL', CREATED_BY='system').exists())
+
+    def test_rows_written_meanwhile_fail_the_chunk(self):
+        class UncheckedImporter(ModelImporter):
+            # As if the row below had been inserted after the checks
+            def check_stage(self, cursor, stage):
+                return {}
+
+        COUNTRY.objects.create(NAME='Existing', CODE='ZZI', PHONE_CODE='+93')
+        result = UncheckedImporter(COUNTRY).run([
+            {'NAME': 'Importland', 'CODE': 'ZZJ', 'PHONE_CODE': '+92'},
+            {'NAME': 'Again', 'CODE': 'ZZI', 'PHONE_CODE': '+91'},
+        ])
+        self.assertEqual(result.created, 0)
+        self.assertEqual(result.errors[0]['row'], 2)
+        self.assertIn('Rows 2-3 were not written', result.errors[0]['errors']['__all__'][0])
+        self.assertFalse(COUNTRY.objects.filter(CODE='ZZJ').exists())
+
+
+@inline_buffered_writes
+class TypeaheadTest(TestCase):
+    def setUp(self):
+        typeahead.clear_indexes()
+        clear_model_cache()
+        self.addCleanup(typeahead.clear_indexes)
+        self.addCleanup(clear_model_cache)
+
+    def wait_for_rebuild(self, name):
+        deadline = time.monotonic() + 5
+        while name in typeahead._rebuilding and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_prefix_index(self):
+        index = typeahead.PrefixIndex([('STU001', 'Anaïs Sharma'), ('STU002', 'Rahul Shah'), ('EMP001', 'Rahul Verma')])
+        self.assertEqual(index.search('sha'), [('STU002', 'Rahul Shah'), ('STU001', 'Anaïs Sharma')])
+        self.assertEqual(index.search('ANAIS'), [('STU001', 'Anaïs Sharma')])
+        self.assertEqual(index.search('rahul', limit=1), [('STU002', 'Rahul Shah')])
+        self.assertEqual(index.search('stu'), [('STU001', 'Anaïs Sharma'), ('STU002', 'Rahul Shah')])
+
+        index.update('STU002', 'Rahul Mehta')
+        self.assertEqual(index.search('shah'), [])
+        self.assertEqual(index.search('meh'), [('STU002', 'Rahul Mehta')])
+        index.update('STU001', None)
+        self.assertEqual(index.search('anais'), [])
+        self.assertEqual(len(index), 2)
+        self.assertGreater(index.footprint(), 0)
+
+    def test_index_follows_saves(self):
+        university = UNIVERSITY.objects.create(
+            NAME='Typeahead University', CODE='AU', ADDRESS='-', CONTACT_NUMBER='0', EMAIL='au@example.com', ESTD_YEAR=1990
+        )
+        institute = INSTITUTE.objects.create(
+            UNIVERSITY=university, NAME='Typeahead Institute', CODE='AI', ADDRESS='-', CONTACT_NUMBER='0',
+            EMAIL='ai@example.com', ESTD_YEAR=2000
+        )
+        program = PROGRAM.objects.create(INSTITUTE=institute, NAME='MCA', CODE='AMC', DURATION_YEARS=2, LEVEL='PG', TYPE='FT')
+        branch = BRANCH.objects.create(PROGRAM=program, NAME='Applications', CODE='AAP')
+
+        def admit(form_no, name, surname):
+            return STUDENT_MASTER.objects.create(
+                INSTITUTE='AI', ACADEMIC_YEAR='2025-26', BATCH='2027', ADMISSION_CATEGORY='1', FORM_NO=form_no,
+                NAME=name, SURNAME=surname, GENDER='female', DOB=date(2003, 1, 1), MOB_NO=f'900000020{form_no}',
+                EMAIL_ID=f'{name.lower()}@example.com', BRANCH_ID=branch,
+            )
+
+        first = admit(1, 'Ishita', 'Deshpande')
+        client = APIClient()
+        client.force_authenticate(CustomUser.objects.create_user('EMP018', 'emp018', 'emp018@example.com', password='Secret@123'))
+        response = client.get('/api/student/typeahead/', {'query': 'desh'})
+        self.assertEqual(response.json()['data'], [{'STUDENT_ID': first.STUDENT_ID, 'NAME': 'Ishita Deshpande'}])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second = admit(2, 'Ira', 'Deshmukh')
+        with self.assertNumQueries(0):
+            matches = typeahead.search('students', 'desh')
+        self.assertEqual(matches, [(second.STUDENT_ID, 'Ira Deshmukh'), (first.STUDENT_ID, 'Ishita Deshpande')])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.IS_DELETED = True
+            first.save()
+        self.assertEqual(typeahead.search('students', 'ishita'), [])
+        self.assertEqual(typeahead.get_stats()['students']['rows'], 1)
+
+    def test_updates_committed_during_a_rebuild_are_kept(self):
+        typeahead._indexes['students'] = typeahead.PrefixIndex([('STU901', 'Nisha Rao')])
+
+        def build_index(name):
+            # The rows were read before this change committed
+            index = typeahead.PrefixIndex([('STU901', 'Nisha Rao')])
+            typeahead._row_changed(name, STUDENT_MASTER(STUDENT_ID='STU902', NAME='Nisha', SURNAME='Kapoor'), 'default')
+            return index
+
+        typeahead.expire('students')
+        # The thread's connection would commit the bump outside the test's transaction
+        with mock.patch.object(typeahead, 'build_index', build_index), mock.patch.object(typeahead, 'bump_generation'):
+            typeahead.get_index('students')  # Rebuilds in a thread
+            self.wait_for_rebuild('students')
+        self.assertEqual(typeahead.search('students', 'nisha'), [('STU902', 'Nisha Kapoor'), ('STU901', 'Nisha Rao')])
+
+    @override_settings(MODEL_CACHE_SYNC_INTERVAL=0)
+    def test_changes_on_other_workers_trigger_a_rebuild(self):
+        typeahead._indexes['employees'] = typeahead.PrefixIndex([('EMP901', 'Old Name')])
+        # What another worker's save leaves behind in CACHE_GENERATIONS
+        CACHE_GENERATION.objects.create(LABEL=typeahead.generation_name('employees'), GENERATION=3)
+
+        def build_index(name):
+            return typeahead.PrefixIndex([('EMP901', 'New Name')], generation=3)
+
+        with mock.patch.object(typeahead, 'build_index', build_index):
+            self.assertEqual(typeahead.search('employees', 'old'), [('EMP901', 'Old Name')])  # Meanwhile
+            self.wait_for_rebuild('employees')
+        self.assertEqual(typeahead.search('employees', 'new'), [('EMP901', 'New Name')])
+        self.assertNotIn('employees', typeahead._rebuilding)
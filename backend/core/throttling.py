@@ -0,0 +1,175 @@
+"""
+Token-bucket rate limiting for the unauthenticated auth endpoints.
+
+Views opt in with `throttle_classes = [TokenBucketThrottle]` and a
+`throttle_scope`. settings.RATE_LIMITS maps each scope to per-key rates:
+
+    RATE_LIMITS = {
+        'login': {'ip': '30/min', 'user': '10/min'},
+    }
+
+'ip' is keyed by the client address -- REMOTE_ADDR, unless the
+REST_FRAMEWORK NUM_PROXIES setting says how many proxies append to
+X-Forwarded-For, as a client can send that header itself -- and 'user' by the
+submitted user_id. A rate of N/period allows bursts of N and refills N tokens
+per period. A request takes a token from each of its buckets or, when one of
+them is empty, from none, so requests refused for one user_id do not drain
+the bucket of their address.
+
+RATE_LIMIT_BACKEND selects where buckets live: 'local' keeps them in this
+process (no I/O at all), 'cache' keeps them in the RATE_LIMIT_CACHE_ALIAS
+cache so all workers share one limit. The cache backend reads and writes the
+buckets of a check without locking, so concurrent workers may overshoot
+slightly.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from core import monitoring
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'10/min' -> (10, 60)"""
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0].lower()]
+
+
+def take_token(state, capacity, period, now):
+    """
+    Refill a (tokens, timestamp) bucket state and try to take one token.
+    Returns (allowed, new_state, seconds until the next token).
+    """
+    tokens, last = state if state else (capacity, now)
+    tokens = min(capacity, tokens + (now - last) * capacity / period)
+    if tokens >= 1:
+        return True, (tokens - 1, now), 0
+    return False, (tokens, now), (1 - tokens) * period / capacity
+
+
+class LocalBucketStore:
+    """Buckets in a bounded in-process LRU dict."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()
+
+    def consume(self, buckets):
+        """
+        Take a token from every (key, capacity, period) bucket, or from none.
+        Returns (the key of an empty bucket or None, seconds until it refills).
+        """
+        now = time.monotonic()
+        with self.lock:
+            states = {}
+            for key, capacity, period in buckets:
+                allowed, states[key], wait = take_token(self.buckets.get(key), capacity, period, now)
+                if not allowed:
+                    return key, wait
+            for key, state in states.items():
+                self.buckets[key] = state
+                self.buckets.move_to_end(key)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return None, 0
+
+    def reset(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+class CacheBucketStore:
+    """Buckets shared through a Django cache."""
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    def consume(self, buckets):
+        cache = caches[self.alias]
+        current = cache.get_many([f'ratelimit:{key}' for key, capacity, period in buckets])
+        now = time.time()
+        states = []
+        for key, capacity, period in buckets:
+            allowed, state, wait = take_token(current.get(f'ratelimit:{key}'), capacity, period, now)
+            if not allowed:
+                return key, wait
+            states.append((key, state, period))
+        for key, state, period in states:
+            cache.set(f'ratelimit:{key}', state, period)
+        return None, 0
+
+    def reset(self):
+        pass
+
+
+_stores = {}
+
+
+def get_bucket_store():
+    backend = getattr(settings, 'RATE_LIMIT_BACKEND', 'local')
+    if backend not in _stores:
+        if backend == 'cache':
+            _stores[backend] = CacheBucketStore(getattr(settings, 'RATE_LIMIT_CACHE_ALIAS', 'default'))
+        else:
+            _stores[backend] = LocalBucketStore(getattr(settings, 'RATE_LIMIT_MAX_KEYS', 100000))
+    return _stores[backend]
+
+
+def reset_rate_limits():
+    for store in _stores.values():
+        store.reset()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    DRF throttle keyed by client IP and submitted user_id. Runs on request
+    data only, so rejected requests never reach the ORM or the mail server.
+    """
+
+    def get_ident(self, request):
+        if api_settings.NUM_PROXIES is None:
+            # Without known proxies, X-Forwarded-For is whatever the client sent
+            return request.META.get('REMOTE_ADDR')
+        return super().get_ident(request)
+
+    def get_keys(self, request, view):
+        keys = {'ip': self.get_ident(request)}
+        user_id = request.data.get('user_id') if hasattr(request.data, 'get') else None
+        if user_id:
+            keys['user'] = str(user_id).upper()
+        return keys
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        limits = getattr(settings, 'RATE_LIMITS', {}).get(scope)
+        self.wait_time = None
+        if not scope or not limits:
+            return True
+
+        kinds, buckets = {}, []
+        for kind, ident in self.get_keys(request, view).items():
+            rate = limits.get(kind)
+            if not rate:
+                continue
+            key = f'{scope}:{kind}:{ident}'
+            kinds[key] = kind
+            buckets.append((key, *parse_rate(rate)))
+        rejected, wait = get_bucket_store().consume(buckets)
+        if rejected is not None:
+            self.wait_time = wait
+            monitoring.increment(f'throttle.{scope}.rejected.{kinds[rejected]}')
+            return False
+
+        monitoring.increment(f'throttle.{scope}.allowed')
+        return True
+
+    def wait(self):
+        return self.wait_time
@@ -0,0 +1,282 @@
+"""
+Per-process prefix indexes for typeahead (/api/student/typeahead/,
+/api/establishment/employees/typeahead/).
+
+Each index of TYPEAHEAD_INDEXES keeps one sorted list of strings
+"<normalized key>\\0<id>" -- the ID itself, the full name and every later word
+of the name, normalized by normalize() -- so a prefix query is a bisect and a
+short forward scan, without touching the database. Labels are kept once per
+row.
+
+An index is built from one streaming query (iterator()) on first use, or at
+startup when TYPEAHEAD_PRELOAD is set (see core.wsgi). post_save/post_delete
+update it in place after commit. Every change, imports included, also bumps
+the counter "typeahead:<name>" in CACHE_GENERATIONS (see core.cache); an
+index that has not seen the latest generation -- changed on another worker,
+or imported -- is rebuilt in a background thread, the old one serving
+meanwhile. Changes that send no signal (queryset.update()) are picked up once
+the index is older than TYPEAHEAD_MAX_AGE seconds. Updates committed during a
+rebuild are applied to both, as the new index may have been read before them.
+Footprints are reported by get_stats() and /api/monitoring/counters/.
+"""
+import logging
+import sys
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+
+from core import monitoring
+from core.cache import bump_generation, get_shared_generation
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = '\0'
+
+
+def normalize(text):
+    """Casefolded, accents and punctuation dropped, single spaces."""
+    text = unicodedata.normalize('NFKD', str(text or '')).casefold()
+    text = ''.join(c if c.isalnum() else ' ' for c in text if not unicodedata.combining(c))
+    return ' '.join(text.split())
+
+
+def index_keys(pk, label):
+    keys = {normalize(pk)}
+    words = normalize(label).split(' ')
+    keys.update(' '.join(words[start:]) for start in range(len(words)))
+    return sorted(f'{key}{SEPARATOR}{pk}' for key in keys if key)
+
+
+class PrefixIndex:
+    __slots__ = ('entries', 'labels', 'built_at', 'generation', 'lock')
+
+    def __init__(self, rows=(), generation=0):
+        """`rows`: iterable of (id, label); `generation`: that of the counter when they were read."""
+        self.generation = generation
+        self.entries = []
+        self.labels = {}
+        for pk, label in rows:
+            self.labels[pk] = label
+            self.entries.extend(index_keys(pk, label))
+        self.entries.sort()
+        self.built_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.labels)
+
+    def search(self, prefix, limit=10):
+        """[(id, label)] of up to `limit` rows with a key starting with `prefix`, in key order."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        found = {}
+        with self.lock:
+            entries = self.entries
+            for position in range(bisect_left(entries, prefix), len(entries)):
+                entry = entries[position]
+                if not entry.startswith(prefix):
+                    break
+                pk = entry[entry.index(SEPARATOR) + 1:]
+                if pk not in found:
+                    found[pk] = self.labels[pk]
+                    if len(found) >= limit:
+                        break
+        return list(found.items())
+
+    def _remove(self, pk):
+        label = self.labels.pop(pk, None)
+        if label is None:
+            return
+        for entry in index_keys(pk, label):
+            position = bisect_left(self.entries, entry)
+            if position < len(self.entries) and self.entries[position] == entry:
+                del self.entries[position]
+
+    def update(self, pk, label):
+        """Add, replace or (label None) remove the row `pk`."""
+        with self.lock:
+            self._remove(pk)
+            if label is not None:
+                self.labels[pk] = label
+                for entry in index_keys(pk, label):
+                    insort(self.entries, entry)
+
+    def footprint(self):
+        """Approximate size in bytes of the entries, labels and their containers."""
+        with self.lock:
+            size = sys.getsizeof(self.entries) + sys.getsizeof(self.labels)
+            size += sum(sys.getsizeof(entry) for entry in self.entries)
+            size += sum(sys.getsizeof(pk) + sys.getsizeof(label) for pk, label in self.labels.items())
+        return size
+
+
+def get_index_config(name):
+    """(model, id field, name fields) of TYPEAHEAD_INDEXES[name]."""
+    label, id_field, name_fields = getattr(settings, 'TYPEAHEAD_INDEXES', {})[name]
+    return apps.get_model(label), id_field, tuple(name_fields)
+
+
+def row_label(values, name_fields):
+    return ' '.join(str(values[field]) for field in name_fields if values[field])
+
+
+def generation_name(name):
+    """The CACHE_GENERATIONS counter of the index `name`."""
+    return f'typeahead:{name}'
+
+
+def build_index(name):
+    model, id_field, name_fields = get_index_config(name)
+    started = time.perf_counter()
+    # Read first: a change committed while the rows stream in triggers another rebuild
+    generation = get_shared_generation(generation_name(name))
+    rows = (
+        model.objects.filter(IS_DELETED=False)
+        .values(id_field, *name_fields)
+        .iterator(chunk_size=getattr(settings, 'TYPEAHEAD_CHUNK_SIZE', 2000))
+    )
+    index = PrefixIndex(((str(values[id_field]), row_label(values, name_fields)) for values in rows), generation)
+    monitoring.increment(f'typeahead.{name}.builds')
+    logger.info(
+        f"Built typeahead index {name}: {len(index)} rows, {len(index.entries)} keys, "
+        f"{index.footprint() / 1024:.0f} KiB in {time.perf_counter() - started:.2f}s"
+    )
+    return index
+
+
+_indexes = {}
+_rebuilding = {}  # {name: [(id, label)] updated since the rebuild started}
+_lock = threading.Lock()
+
+
+def _rebuild(name):
+    try:
+        index = build_index(name)
+        with _lock:
+            for pk, label in _rebuilding[name]:
+                index.update(pk, label)
+            _indexes[name] = index
+    except Exception:
+        logger.exception(f"Rebuilding typeahead index {name} failed")
+    finally:
+        with _lock:
+            _rebuilding.pop(name, None)
+        # This thread's connection would otherwise stay open until the process exits
+        connection.close()
+
+
+def get_index(name):
+    """
+    The index `name`, built on first use and refreshed when its counter moved
+    on or once older than TYPEAHEAD_MAX_AGE.
+    """
+    index = _indexes.get(name)
+    if index is None:
+        with _lock:
+            index = _indexes.get(name)
+            if index is None:
+                index = _indexes[name] = build_index(name)
+        return index
+
+    if (
+        index.generation != get_shared_generation(generation_name(name))
+        or time.monotonic() - index.built_at > getattr(settings, 'TYPEAHEAD_MAX_AGE', 300)
+    ):
+        with _lock:
+            start = name not in _rebuilding
+            _rebuilding.setdefault(name, [])
+        if start:
+            threading.Thread(target=_rebuild, args=(name,), daemon=True).start()
+    return index
+
+
+def search(name, prefix, limit=10):
+    """[(id, label)] from the index `name`; `limit` is capped at TYPEAHEAD_MAX_LIMIT."""
+    limit = max(1, min(limit, getattr(settings, 'TYPEAHEAD_MAX_LIMIT', 20)))
+    return get_index(name).search(prefix, limit)
+
+
+def preload():
+    """Build every index now (at startup), logging failures instead of raising."""
+    for name in getattr(settings, 'TYPEAHEAD_INDEXES', {}):
+        try:
+            get_index(name)
+        except Exception:
+            logger.exception(f"Preloading typeahead index {name} failed")
+
+
+def expire(name):
+    """Have the next get_index() rebuild `name` (in the background)."""
+    index = _indexes.get(name)
+    if index is not None:
+        index.built_at = time.monotonic() - getattr(settings, 'TYPEAHEAD_MAX_AGE', 300) - 1
+
+
+def clear_indexes():
+    with _lock:
+        _indexes.clear()
+
+
+def get_stats():
+    """{name: {'rows', 'keys', 'bytes', 'age'}} of the indexes built in this process."""
+    now = time.monotonic()
+    return {
+        name: {
+            'rows': len(index),
+            'keys': len(index.entries),
+            'bytes': index.footprint(),
+            'age': round(now - index.built_at, 1),
+        }
+        for name, index in sorted(_indexes.items())
+    }
+
+
+def _row_changed(name, instance, using, deleted=False):
+    _, id_field, name_fields = get_index_config(name)
+    pk = str(getattr(instance, id_field))
+    label = None
+    if not deleted and not instance.IS_DELETED:
+        label = row_label({field: getattr(instance, field) for field in name_fields}, name_fields)
+
+    def after_commit():
+        with _lock:
+            index = _indexes.get(name)
+            if name in _rebuilding:
+                _rebuilding[name].append((pk, label))
+        if index is not None:
+            index.update(pk, label)
+            # Runs after the bump below: an index that was current has seen
+            # this change, so the new generation needs no rebuild here
+            generation = get_shared_generation(generation_name(name))
+            if index.generation == generation - 1:
+                index.generation = generation
+
+    bump_generation(generation_name(name), using)
+    transaction.on_commit(after_commit, using=using)
+
+
+def connect_signals():
+    from core.bulk_import import rows_imported
+
+    for name in getattr(settings, 'TYPEAHEAD_INDEXES', {}):
+        model, _, _ = get_index_config(name)
+
+        def saved(sender, instance, using, name=name, **kwargs):
+            _row_changed(name, instance, using)
+
+        def deleted(sender, instance, using, name=name, **kwargs):
+            _row_changed(name, instance, using, deleted=True)
+
+        def imported(sender, name=name, **kwargs):
+            bump_generation(generation_name(name))
+
+        post_save.connect(saved, sender=model, weak=False, dispatch_uid=f'typeahead_{name}_save')
+        post_delete.connect(deleted, sender=model, weak=False, dispatch_uid=f'typeahead_{name}_delete')
+        rows_imported.connect(imported, sender=model, weak=False, dispatch_uid=f'typeahead_{name}_import')
@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from core.views import BulkImportView, MonitoringCountersView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -27,6 +28,8 @@ urlpatterns = [
     path('api/', include('exam.urls')),
     path('student/', include('student.urls')),  # ✅ Add this line
     path('api/', include('committee.urls')),  # ✅ Add this line
+    path('api/monitoring/counters/', MonitoringCountersView.as_view(), name='monitoring-counters'),
+    path('api/imports/<str:kind>/', BulkImportView.as_view(), name='bulk-import'),
 
 
 ]
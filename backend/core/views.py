@@ -0,0 +1,69 @@
+from rest_framework import status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import monitoring, typeahead
+from core.bulk_import import get_importer, read_rows
+from core.viewsets import get_audit_actor
+
+
+class IsSuperUser(BasePermission):
+    def has_permission(self, request, view):
+        return bool(getattr(request.user, 'IS_SUPERUSER', False))
+
+
+class MonitoringCountersView(APIView):
+    """
+    In-process counters of this worker (rate limiter, caches, ...), and the
+    size of its typeahead indexes.
+    """
+    permission_classes = [IsSuperUser]
+
+    def get(self, request):
+        return Response({
+            'status': 'success',
+            'counters': monitoring.get_counters(request.query_params.get('prefix', '')),
+            'typeahead': typeahead.get_stats(),
+        })
+
+
+class BulkImportView(APIView):
+    """
+    Import an uploaded CSV/XLSX (`file`) of the given kind (see
+    core.bulk_import and BULK_IMPORTERS). ?dry_run=true only reports the
+    per-row errors; ?accounts=false skips login accounts for students and
+    employees.
+    """
+    permission_classes = [IsSuperUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, kind):
+        importer = get_importer(kind, actor=get_audit_actor(request.user))
+        if importer is None:
+            return Response({
+                'status': 'error',
+                'message': f'Unknown import kind {kind}'
+            }, status=status.HTTP_404_NOT_FOUND)
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({
+                'status': 'error',
+                'message': 'file is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if request.query_params.get('accounts', '').lower() in ('0', 'false'):
+            importer.create_accounts = False
+        try:
+            rows = read_rows(upload, upload.name)
+        except ValueError as e:
+            return Response({'status': 'error', 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true')
+        result = importer.run(rows, dry_run=dry_run)
+        return Response({
+            'status': 'error' if result.errors else 'success',
+            'message': f'{len(rows)} rows read, {result.created} created, {len(result.errors)} rows with errors',
+            'created': result.created,
+            'errors': result.errors,
+        }, status=status.HTTP_400_BAD_REQUEST if result.errors else status.HTTP_200_OK)
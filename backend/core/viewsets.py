@@ -0,0 +1,46 @@
+"""
+Shared behaviour for model viewsets.
+
+AuditStampMixin passes the acting user into serializer.save(), so CREATED_BY /
+UPDATED_BY are set on the instance before its single INSERT or UPDATE
+instead of being patched in with a second save(). CREATED_AT / UPDATED_AT are
+still filled in by the model (auto_now_add / auto_now and AuditModel.save).
+Paths that bypass save(), such as bulk_create and bulk_update, use
+stamp_audit_fields() on the instances first.
+"""
+from django.utils import timezone
+
+
+def get_audit_actor(user):
+    """The value stored in CREATED_BY/UPDATED_BY/DELETED_BY for `user`."""
+    return str(getattr(user, 'USERNAME', None) or 'system')
+
+
+def stamp_audit_fields(instances, actor, creating=True):
+    """Set the audit columns on unsaved/bulk-updated instances; returns them."""
+    now = timezone.now()
+    for instance in instances:
+        if creating:
+            instance.CREATED_BY = actor
+            instance.CREATED_AT = now
+        instance.UPDATED_BY = actor
+        instance.UPDATED_AT = now
+    return instances
+
+
+class AuditStampMixin:
+    def get_audit_actor(self):
+        return get_audit_actor(self.request.user)
+
+    def perform_create(self, serializer):
+        actor = self.get_audit_actor()
+        serializer.save(CREATED_BY=actor, UPDATED_BY=actor)
+
+    def perform_update(self, serializer):
+        serializer.save(UPDATED_BY=self.get_audit_actor())
+
+    def perform_destroy(self, instance):
+        # AuditModel.delete() soft-deletes and records UPDATED_BY as DELETED_BY
+        if hasattr(instance, 'UPDATED_BY'):
+            instance.UPDATED_BY = self.get_audit_actor()
+        instance.delete()
@@ -9,8 +9,17 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+if getattr(settings, 'TYPEAHEAD_PRELOAD', False):
+    from django.db import connections
+
+    from core import typeahead
+    typeahead.preload()
+    # Not inherited by forked workers
+    connections.close_all()
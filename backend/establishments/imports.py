@@ -0,0 +1,79 @@
+"""
+Bulk employee onboarding (see core.bulk_import).
+
+Each row is an EMPLOYEE_MASTER row without EMPLOYEE_ID or PROFILE_IMAGE.
+Per chunk, IDs are reserved in one block per designation letter and the
+login accounts are created with provision_accounts(), credentials mails
+queued, as EmployeeViewSet.create does for a single employee. Passwords are
+hashed before the chunk's transaction reserves the IDs.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+
+from accounts.models import DESIGNATION
+from accounts.provisioning import account_conflict_errors, credentials_email, hash_passwords, provision_accounts
+from core.bulk_import import ModelImporter
+from core.cache import cached_get_or_none
+from utils.id_generators import generate_employee_ids, generate_password
+from .models import EMPLOYEE_MASTER
+
+
+class EmployeeImporter(ModelImporter):
+    model = EMPLOYEE_MASTER
+    derived_fields = ModelImporter.derived_fields + ('EMPLOYEE_ID', 'PROFILE_IMAGE')
+    create_accounts = True
+
+    def before_chunk(self, rows):
+        if not self.create_accounts:
+            return
+        passwords = [generate_password(8) for _ in rows]
+        for (line, values), password, encoded in zip(rows, passwords, hash_passwords(passwords)):
+            values['password'], values['password_hash'] = password, encoded
+
+    def prepare(self, rows):
+        errors = super().prepare(rows)
+        by_letter = defaultdict(list)
+        for line, values in rows:
+            designation = cached_get_or_none(DESIGNATION, DESIGNATION_ID=values['DESIGNATION_id'])
+            if designation is None:
+                errors[line] = {'DESIGNATION': [f"{values['DESIGNATION_id']} does not exist."]}
+            else:
+                values['IS_ACTIVE'] = 'YES'
+                by_letter[designation.NAME[0].upper()].append(values)
+        if errors:
+            return errors
+        for letter, group in by_letter.items():
+            for values, employee_id in zip(group, generate_employee_ids(letter, len(group))):
+                values['EMPLOYEE_ID'] = employee_id
+        return errors
+
+    def after_insert(self, cursor, stage, rows):
+        if not self.create_accounts:
+            return {}
+        accounts = [
+            {
+                'USER_ID': values['EMPLOYEE_ID'],
+                'USERNAME': values['EMAIL'].split('@')[0],
+                'EMAIL': values['EMAIL'],
+                'password': values.get('password'),
+                'IS_ACTIVE': True,
+                'IS_STAFF': False,
+                'IS_SUPERUSER': False,
+                'DESIGNATION_id': values['DESIGNATION_id'],
+                'FIRST_NAME': values['EMP_NAME'],
+            }
+            for line, values in rows
+        ]
+        errors = account_conflict_errors(
+            accounts, [line for line, values in rows], {'USER_ID': 'EMPLOYEE_ID', 'USERNAME': 'EMAIL', 'EMAIL': 'EMAIL'}
+        )
+        if errors:
+            return errors
+        provision_accounts(
+            accounts, credentials_email=credentials_email('employee'), from_email=settings.EMAIL_HOST_USER,
+            # Not hashed on a dry run (see ModelImporter.before_chunk)
+            hashes=[values.get('password_hash', UNUSABLE_PASSWORD_PREFIX) for line, values in rows],
+        )
+        return {}
@@ -3,10 +3,12 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.authentication import TokenAuthentication
-from django.core.mail import send_mail
 from django.conf import settings
 from utils.id_generators import generate_employee_id, generate_password
-from accounts.models import CustomUser, DESIGNATION
+from accounts.provisioning import credentials_email, provision_accounts
+from accounts.models import DESIGNATION
+from core import typeahead
+from core.cache import cached_get
 from .models import TYPE_MASTER, STATUS_MASTER, SHIFT_MASTER, EMPLOYEE_MASTER, EMPLOYEE_QUALIFICATION  # Add this import
 from .serializers import TypeMasterSerializer, StatusMasterSerializer, ShiftMasterSerializer, EmployeeMasterSerializer, EmployeeQualificationSerializer
 import logging
@@ -126,7 +128,7 @@ class EmployeeViewSet(viewsets.ModelViewSet):
             
             # 1. Generate IDs first
             designation_id = request.data.get('DESIGNATION')
-            designation_obj = DESIGNATION.objects.get(DESIGNATION_ID=designation_id)
+            designation_obj = cached_get(DESIGNATION, DESIGNATION_ID=designation_id)
             employee_id = generate_employee_id(designation_obj.NAME)
             password = generate_password(8)
             
@@ -161,45 +163,24 @@ class EmployeeViewSet(viewsets.ModelViewSet):
             # 4. Create user with proper password hashing
             try:
                 username = request.data.get('EMAIL').split('@')[0]
-                user = CustomUser.objects.create(
-                    USER_ID=employee_id,
-                    USERNAME=username,
-                    EMAIL=request.data.get('EMAIL'),
-                    IS_ACTIVE=True,
-                    IS_STAFF=False,
-                    IS_SUPERUSER=False,
-                    DESIGNATION=designation_obj,
-                    FIRST_NAME=request.data.get('EMP_NAME')
-                )
-                user.set_password(password)
-                user.save()
-                
-                logger.info(f"User created with ID: {user.USER_ID}")
-
-                # 5. Send welcome email
-                email_subject = "Your College ERP Account Credentials"
-                email_message = f"""
-                Dear {request.data.get('EMP_NAME')},
-
-                Your College ERP account has been created. Here are your login credentials:
-
-                Employee ID: {employee_id}
-                Username: {username}
-                Password: {password}
-
-                Please change your password after first login.
+                # One INSERT with the hashed password, credentials mail queued
+                user = provision_accounts(
+                    [{
+                        'USER_ID': employee_id,
+                        'USERNAME': username,
+                        'EMAIL': request.data.get('EMAIL'),
+                        'password': password,
+                        'IS_ACTIVE': True,
+                        'IS_STAFF': False,
+                        'IS_SUPERUSER': False,
+                        'DESIGNATION': designation_obj,
+                        'FIRST_NAME': request.data.get('EMP_NAME'),
+                    }],
+                    credentials_email=credentials_email('employee'),
+                    from_email=settings.EMAIL_HOST_USER,
+                ).users[0]
 
-                Best regards,
-                College ERP Team
-                """
-
-                send_mail(
-                    email_subject,
-                    email_message,
-                    settings.EMAIL_HOST_USER,
-                    [user.EMAIL],
-                    fail_silently=False,
-                )
+                logger.info(f"User created with ID: {user.USER_ID}")
 
                 return Response({
                     'message': 'Employee and user account created successfully',
@@ -243,6 +224,19 @@ class EmployeeViewSet(viewsets.ModelViewSet):
 
         return Response(data)
 
+    @action(detail=False, methods=['get'])
+    def typeahead(self, request):
+        """Prefix match on EMPLOYEE_ID and EMP_NAME from this worker's index (core.typeahead)."""
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        matches = typeahead.search('employees', request.query_params.get('query', ''), limit)
+        return Response({
+            'status': 'success',
+            'data': [{'EMPLOYEE_ID': employee_id, 'EMP_NAME': name} for employee_id, name in matches]
+        })
+
     def retrieve(self, request, pk=None):
         try:
             employee = get_object_or_404(EMPLOYEE_MASTER, EMPLOYEE_ID=pk, IS_DELETED=False)
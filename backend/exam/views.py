@@ -3,10 +3,12 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.utils import timezone
 
+from core.viewsets import AuditStampMixin
+
 from .models import COLLEGE_EXAM_TYPE
 from .serializers import CollegeExamTypeSerializer
 
-class CollegeExamTypeViewSet(viewsets.ModelViewSet): 
+class CollegeExamTypeViewSet(AuditStampMixin, viewsets.ModelViewSet): 
     """
     API endpoint that allows users to view or edit college exam types.
     """
@@ -14,33 +16,16 @@ class CollegeExamTypeViewSet(viewsets.ModelViewSet):
     serializer_class = CollegeExamTypeSerializer
     permission_classes = [IsAuthenticated]
 
-    def perform_create(self, serializer):
-        user = self.request.user
-        username = getattr(user, "USERNAME", "UnknownUser")
-        print(f"=== Debug Create by {username} ===")
-
-        instance = serializer.save()
-        instance.CREATED_BY = str(username)
-        instance.UPDATED_BY = str(username)
-        instance.save()
-
-    def perform_update(self, serializer):
-        user = self.request.user
-        username = getattr(user, "USERNAME", "UnknownUser")
-        print(f"=== Debug Update by {username} ===")
-
-        instance = serializer.save()
-        instance.UPDATED_BY = str(username)
-        instance.save()
+    def get_audit_actor(self):
+        return str(getattr(self.request.user, "USERNAME", "UnknownUser"))
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
-        user = request.user
-        username = getattr(user, "USERNAME", "UnknownUser")
+        username = self.get_audit_actor()
         print(f"=== Soft Delete by {username} ===")
 
         instance.IS_DELETED = True
-        instance.DELETED_BY = str(username)
+        instance.DELETED_BY = username
         instance.DELETED_AT = timezone.now()
         instance.save()
 
@@ -0,0 +1,101 @@
+"""
+Bulk admission import (see core.bulk_import).
+
+Each row is a STUDENT_MASTER row without STUDENT_ID. Per chunk, IDs are
+reserved in one block per program/batch prefix, and the rows the admission
+API writes one by one -- STUDENT_DETAILS, STUDENT_ACADEMIC_RECORD and the
+login account with its credentials mail -- are added set-based. Unlike the
+admission API, which uses the student ID, the accounts get a generated
+password: it is hashed before the chunk's transaction reserves the IDs.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+
+from accounts.hierarchy import hierarchy_node
+from accounts.provisioning import account_conflict_errors, credentials_email, hash_passwords, provision_accounts
+from core.bulk_import import ModelImporter
+from utils.id_generators import generate_password, generate_student_master_ids
+from .models import STUDENT_ACADEMIC_RECORD, STUDENT_DETAILS, STUDENT_MASTER
+
+
+class StudentImporter(ModelImporter):
+    model = STUDENT_MASTER
+    derived_fields = ModelImporter.derived_fields + ('STUDENT_ID',)
+    create_accounts = True
+
+    def validate_row(self, values, errors):
+        # Copied into STUDENT_ACADEMIC_RECORD.CATEGORY / FEE_CATEGORY_ID
+        if not str(values['ADMISSION_CATEGORY']).isdigit():
+            errors['ADMISSION_CATEGORY'] = ['Must be a category number.']
+
+    def before_chunk(self, rows):
+        if not self.create_accounts:
+            return
+        passwords = [generate_password(8) for _ in rows]
+        for (line, values), password, encoded in zip(rows, passwords, hash_passwords(passwords)):
+            values['password'], values['password_hash'] = password, encoded
+
+    def prepare(self, rows):
+        errors = super().prepare(rows)
+        by_prefix = defaultdict(list)
+        for line, values in rows:
+            branch = hierarchy_node('branch', values['BRANCH_ID_id'])
+            if branch is None:
+                errors[line] = {'BRANCH_ID': [f"{values['BRANCH_ID_id']} does not exist."]}
+            else:
+                by_prefix[(branch.parent.name, values['BATCH'])].append(values)
+        if errors:
+            return errors
+        for (program_name, batch), group in by_prefix.items():
+            for values, student_id in zip(group, generate_student_master_ids(program_name, batch, len(group))):
+                values['STUDENT_ID'] = student_id
+        return errors
+
+    def get_accounts(self, rows):
+        return [
+            {
+                'USER_ID': values['STUDENT_ID'],
+                'USERNAME': values['EMAIL_ID'].split('@')[0],
+                'EMAIL': values['EMAIL_ID'],
+                'password': values.get('password'),
+                'IS_ACTIVE': True,
+                'IS_STAFF': False,
+                'IS_SUPERUSER': False,
+                'DESIGNATION': None,
+                'FIRST_NAME': values['NAME'],
+            }
+            for line, values in rows
+        ]
+
+    def after_insert(self, cursor, stage, rows):
+        self.insert_from_stage(cursor, STUDENT_DETAILS, stage, {'STUDENT_ID_id': 's."STUDENT_ID"'})
+        self.insert_from_stage(cursor, STUDENT_ACADEMIC_RECORD, stage, {
+            'STUDENT_ID': 's."STUDENT_ID"',
+            'INSTITUTE_ID': 's."INSTITUTE_CODE"',
+            'CATEGORY': 's."ADMISSION_CATEGORY"::integer',
+            'BATCH': 's."BATCH"',
+            'ACADEMIC_YEAR': 's."ACADEMIC_YEAR"',
+            'CLASS_YEAR': 's."YEAR_SEM_ID"',
+            'ADMISSION_DATE': 's."ADMISSION_DATE"',
+            'FORM_NO': 's."FORM_NO"',
+            'QUOTA_ID': 's."ADMN_QUOTA_ID"',
+            'STATUS': 's."STATUS"',
+            'FEE_CATEGORY_ID': 's."ADMISSION_CATEGORY"::integer',
+        })
+
+        if not self.create_accounts:
+            return {}
+        accounts = self.get_accounts(rows)
+        errors = account_conflict_errors(
+            accounts, [line for line, values in rows], {'USER_ID': 'STUDENT_ID', 'USERNAME': 'EMAIL_ID', 'EMAIL': 'EMAIL_ID'}
+        )
+        if errors:
+            return errors
+        provision_accounts(
+            accounts, credentials_email=credentials_email('student'), from_email=settings.EMAIL_HOST_USER,
+            # Not hashed on a dry run (see ModelImporter.before_chunk)
+            hashes=[values.get('password_hash', UNUSABLE_PASSWORD_PREFIX) for line, values in rows],
+        )
+        return {}
@@ -0,0 +1,44 @@
+import re
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from student.models import STUDENT_MASTER
+from student.search import search_students
+
+
+class Command(BaseCommand):
+    help = 'Measure /api/student/search/ query latency (median, p95) on the current STUDENT_MASTER rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', help='Search terms; by default names sampled from STUDENT_MASTER')
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=10)
+
+    def handle(self, *args, **options):
+        min_length = getattr(settings, 'STUDENT_SEARCH_MIN_LENGTH', 3)
+        queries = options['queries'] or [
+            name for name in STUDENT_MASTER.objects.filter(IS_DELETED=False)
+            .order_by('?').values_list('NAME', flat=True)[:100]
+            if name and len(name) >= min_length
+        ]
+        if not queries:
+            raise CommandError("No student names to sample; pass search terms as arguments")
+
+        queryset = STUDENT_MASTER.objects.filter(IS_DELETED=False)
+        timings = []
+        for i in range(max(2, options['iterations'])):
+            start = time.perf_counter()
+            list(search_students(queryset, queries[i % len(queries)], limit=options['limit']))
+            timings.append((time.perf_counter() - start) * 1000)
+
+        percentiles = statistics.quantiles(timings, n=100)
+        self.stdout.write(
+            f"{len(timings)} searches over {queryset.count()} students: "
+            f"median {statistics.median(timings):.1f} ms, p95 {percentiles[94]:.1f} ms, max {max(timings):.1f} ms"
+        )
+        plan = search_students(queryset, queries[0], limit=options['limit']).explain()
+        indexes = sorted(set(re.findall(r'"?(STUDENT_MASTER_\w+_TRGM)"?', plan)))
+        self.stdout.write(f"Trigram indexes in the plan: {', '.join(indexes) or 'none (sequential scan)'}")
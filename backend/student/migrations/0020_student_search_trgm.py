@@ -0,0 +1,31 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Expression indexes on UPPER(<column>) so that both `icontains`
+# (UPPER(col::text) LIKE UPPER(...)) and the UPPER(col) % UPPER(...) match of
+# student.search can use them. Built CONCURRENTLY, so STUDENT_MASTER stays
+# writable while they are created; they are not declared on the model.
+SEARCH_FIELDS = ('STUDENT_ID', 'NAME', 'SURNAME', 'MOB_NO', 'EMAIL_ID')
+
+
+def index_name(field):
+    return f'STUDENT_MASTER_{field}_TRGM'
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('student', '0019_student_roll_number_details'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+    ] + [
+        migrations.RunSQL(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{index_name(field)}" '
+            f'ON "STUDENT"."STUDENT_MASTER" USING gin (UPPER("{field}") gin_trgm_ops)',
+            reverse_sql=f'DROP INDEX CONCURRENTLY IF EXISTS "STUDENT"."{index_name(field)}"',
+        )
+        for field in SEARCH_FIELDS
+    ]
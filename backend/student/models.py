@@ -1,6 +1,7 @@
 import os
 from django.db import models
 from core.models import AuditModel
+from accounts.hierarchy import hierarchy_node
 from django.utils import timezone
 from accounts.models import BRANCH, PROGRAM, INSTITUTE, SEMESTER, YEAR
 from academic.models import ACADEMIC_YEAR, EXAMINATION, CURRICULUM
@@ -191,12 +192,12 @@ class STUDENT_MASTER(AuditModel):
 
     def save(self, *args, **kwargs):
         if not self.STUDENT_ID:
-            latest_entry = STUDENT_MASTER.objects.filter(
-                BATCH=self.BATCH, 
-                BRANCH_ID=self.BRANCH_ID
-            ).count() + 1
-            program_name = self.BRANCH_ID.PROGRAM.NAME
-            self.STUDENT_ID = f"{program_name}{self.BATCH[-2:]}{latest_entry:03d}"
+            from utils.id_generators import generate_student_master_ids
+
+            branch = hierarchy_node('branch', self.BRANCH_ID_id)
+            if branch is None:
+                raise BRANCH.DoesNotExist(f"BRANCH {self.BRANCH_ID_id} does not exist")
+            self.STUDENT_ID = generate_student_master_ids(branch.parent.name, self.BATCH, 1)[0]
         super().save(*args, **kwargs)
 
     class Meta:
@@ -0,0 +1,37 @@
+"""
+Ranked student search on pg_trgm.
+
+Each searched column has a GIN index on UPPER(<column>) gin_trgm_ops
+(migration 0020). One index serves both predicates used here: the substring
+match of `icontains` (UPPER(col) LIKE UPPER('%q%')) and the fuzzy
+UPPER(col) % UPPER('q') match, which tolerates typos in names. Matches are
+ranked by their best similarity() over the columns, so the top-k rows are the
+closest ones rather than the first ones found. pg_trgm needs at least three
+characters to use its index, hence STUDENT_SEARCH_MIN_LENGTH.
+"""
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import BooleanField, F, Func, Q, Value
+from django.db.models.functions import Greatest, Upper
+
+SEARCH_FIELDS = ('STUDENT_ID', 'NAME', 'SURNAME', 'MOB_NO', 'EMAIL_ID')
+
+
+class TrigramMatch(Func):
+    """`a % b`: trigram similarity above pg_trgm.similarity_threshold."""
+    template = '%(expressions)s'
+    arg_joiner = ' %% '
+    output_field = BooleanField()
+
+
+def search_students(queryset, query, batch=None, limit=10):
+    """The `limit` rows of `queryset` best matching `query`, best first."""
+    if batch is not None:
+        queryset = queryset.filter(BATCH=batch)
+
+    matches = Q()
+    for field in SEARCH_FIELDS:
+        matches |= Q(**{f'{field}__icontains': query})
+        matches |= TrigramMatch(Upper(F(field)), Upper(Value(query)))
+
+    rank = Greatest(*(TrigramSimilarity(field, query) for field in SEARCH_FIELDS))
+    return queryset.filter(matches).annotate(SEARCH_RANK=rank).order_by('-SEARCH_RANK', 'STUDENT_ID')[:limit]
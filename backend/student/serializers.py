@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import STUDENT_MASTER, CHECK_LIST_DOCUMENTS, STUDENT_DOCUMENTS,STUDENT_ROLL_NUMBER_DETAILS
 from django.utils import timezone
+from core.cache import cached_get
 
 # Define required fields at module level
 BASIC_REQUIRED_FIELDS = [
@@ -161,16 +162,27 @@ class CheckListDoumentsSerializer(serializers.ModelSerializer):
         model = CHECK_LIST_DOCUMENTS
         fields=['RECORD_ID','NAME', 'IS_MANDATORY']
 
+class CachedSlugRelatedField(serializers.SlugRelatedField):
+    """SlugRelatedField resolved through core.cache instead of a query per value"""
+    def to_internal_value(self, data):
+        model = self.get_queryset().model
+        try:
+            return cached_get(model, **{self.slug_field: data})
+        except model.DoesNotExist:
+            self.fail('does_not_exist', slug_name=self.slug_field, value=str(data))
+        except (TypeError, ValueError):
+            self.fail('invalid')
+
 class StudentDocumentsSerializer(serializers.ModelSerializer):
     STUDENT_ID = serializers.SlugRelatedField(
         queryset=STUDENT_MASTER.objects.all(),
         slug_field='STUDENT_ID'
     )
-    DOC_NAME = serializers.SlugRelatedField(
+    DOC_NAME = CachedSlugRelatedField(
         queryset=CHECK_LIST_DOCUMENTS.objects.all(),
         slug_field='NAME'
     )
-    DOCUMENT_ID = serializers.SlugRelatedField(
+    DOCUMENT_ID = CachedSlugRelatedField(
         queryset=CHECK_LIST_DOCUMENTS.objects.all(),
         slug_field='RECORD_ID'
     )
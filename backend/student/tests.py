@@ -1,3 +1,174 @@
+import io
+from datetime import date
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import BRANCH, EMAIL_OUTBOX, INSTITUTE, PROGRAM, UNIVERSITY, CustomUser
+from .models import STUDENT_ACADEMIC_RECORD, STUDENT_DETAILS, STUDENT_MASTER
+from .search import SEARCH_FIELDS, search_students
+
+
+class StudentListTest(TestCase):
+    def setUp(self):
+        university = UNIVERSITY.objects.create(
+            NAME='Paging University', CODE='PU', ADDRESS='-', CONTACT_NUMBER='0', EMAIL='pu@example.com', ESTD_YEAR=1990
+        )
+        institute = INSTITUTE.objects.create(
+            UNIVERSITY=university, NAME='Paging Institute', CODE='PI', ADDRESS='-', CONTACT_NUMBER='0',
+            EMAIL='pi@example.com', ESTD_YEAR=2000
+        )
+        program = PROGRAM.objects.create(INSTITUTE=institute, NAME='BSC', CODE='PBS', DURATION_YEARS=3, LEVEL='UG', TYPE='FT')
+        self.branch = BRANCH.objects.create(PROGRAM=program, NAME='Physics', CODE='PPH')
+        for form_no, name in enumerate(['Anu', 'Bela', 'Chetan'], start=1):
+            STUDENT_MASTER.objects.create(
+                INSTITUTE='PI', ACADEMIC_YEAR='2025-26', BATCH='2028', ADMISSION_CATEGORY='1', FORM_NO=form_no,
+                NAME=name, SURNAME='Joshi', GENDER='female', DOB=date(2004, 1, 1), MOB_NO=f'900000030{form_no}',
+                EMAIL_ID=f'{name.lower()}.joshi@example.com', BRANCH_ID=self.branch,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            'EMP020', 'emp020', 'emp020@example.com', password='Secret@123'
+        ))
+
+    def test_pages_keep_the_status_envelope(self):
+        response = self.client.get('/api/student/', {'branch_id': self.branch.pk, 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data), ['status', 'next', 'previous', 'data'])
+        self.assertEqual(response.data['status'], 'success')
+        names = [student['NAME'] for student in response.data['data']]
+
+        response = self.client.get(response.data['next'])
+        self.assertIsNone(response.data['next'])
+        names += [student['NAME'] for student in response.data['data']]
+        self.assertEqual(names, ['Anu', 'Bela', 'Chetan'])
+
+        response = self.client.get('/api/student/', {'branch_id': self.branch.pk})
+        self.assertEqual(list(response.data), ['status', 'data'])
+        self.assertEqual(len(response.data['data']), 3)
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get('/api/student/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class StudentSearchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            'EMP017', 'emp017', 'emp017@example.com', password='Secret@123'
+        ))
+
+    def test_short_queries_are_rejected(self):
+        response = self.client.get('/api/student/search/', {'query': 'ab'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_uses_the_indexed_expressions(self):
+        # What migration 0020 indexes: UPPER(<column>) for both predicates
+        sql = str(search_students(STUDENT_MASTER.objects.all(), 'meera', batch='2027', limit=5).query)
+        for field in SEARCH_FIELDS:
+            column = f'UPPER("STUDENT"."STUDENT_MASTER"."{field}")'
+            self.assertIn(f'{column} % UPPER(meera)', sql)
+            self.assertIn(f'UPPER("STUDENT"."STUDENT_MASTER"."{field}"::text) LIKE UPPER(%meera%)', sql)
+        self.assertIn('GREATEST(SIMILARITY(', sql)
+        self.assertTrue(sql.endswith('DESC, "STUDENT"."STUDENT_MASTER"."STUDENT_ID" ASC LIMIT 5'))
+
+    def test_matches_are_ranked(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            if cursor.fetchone() is None:
+                self.skipTest('pg_trgm is not installed (created by student migration 0020)')
+        university = UNIVERSITY.objects.create(
+            NAME='Search University', CODE='SU', ADDRESS='-', CONTACT_NUMBER='0', EMAIL='su@example.com', ESTD_YEAR=1990
+        )
+        institute = INSTITUTE.objects.create(
+            UNIVERSITY=university, NAME='Search Institute', CODE='SI', ADDRESS='-', CONTACT_NUMBER='0',
+            EMAIL='si@example.com', ESTD_YEAR=2000
+        )
+        program = PROGRAM.objects.create(INSTITUTE=institute, NAME='MTECH', CODE='SMT', DURATION_YEARS=2, LEVEL='PG', TYPE='FT')
+        branch = BRANCH.objects.create(PROGRAM=program, NAME='Structures', CODE='SST')
+        for form_no, (name, surname) in enumerate([('Meera', 'Kulkarni'), ('Meena', 'Kale'), ('Rohit', 'Meerut')], start=1):
+            STUDENT_MASTER.objects.create(
+                INSTITUTE='SI', ACADEMIC_YEAR='2025-26', BATCH='2027', ADMISSION_CATEGORY='1', FORM_NO=form_no,
+                NAME=name, SURNAME=surname, GENDER='female', DOB=date(2003, 1, 1), MOB_NO=f'900000010{form_no}',
+                EMAIL_ID=f'{name.lower()}@example.com', BRANCH_ID=branch,
+            )
+
+        response = self.client.get('/api/student/search/', {'query': 'meera', 'branch_id': branch.pk})
+        names = [student['NAME'] for student in response.json()['data']]
+        self.assertEqual(names[0], 'Meera')
+        self.assertIn('Rohit', names)  # Substring of the surname
+        response = self.client.get('/api/student/search/', {'query': 'Meerra', 'batch': '2027', 'limit': 1})
+        self.assertEqual([student['NAME'] for student in response.json()['data']], ['Meera'])
+
+        out = io.StringIO()
+        call_command('benchmark_student_search', 'meera', 'kale', iterations=5, stdout=out)
+        self.assertIn('p95', out.getvalue())
+
+
+class StudentImportTest(TestCase):
+    def test_students_are_imported_with_dependent_rows(self):
+        university = UNIVERSITY.objects.create(
+            NAME='Import University', CODE='IU', ADDRESS='-', CONTACT_NUMBER='0', EMAIL='iu@example.com', ESTD_YEAR=1990
+        )
+        institute = INSTITUTE.objects.create(
+            UNIVERSITY=university, NAME='Import Institute', CODE='II', ADDRESS='-', CONTACT_NUMBER='0',
+            EMAIL='ii@example.com', ESTD_YEAR=2000
+        )
+        program = PROGRAM.objects.create(INSTITUTE=institute, NAME='BTECH', CODE='IBT', DURATION_YEARS=4, LEVEL='UG', TYPE='FT')
+        branch = BRANCH.objects.create(PROGRAM=program, NAME='Civil Engineering', CODE='ICE')
+        client = APIClient()
+        client.force_authenticate(CustomUser.objects.create_user(
+            'ADM002', 'adm002', 'adm002@example.com', password='Secret@123', IS_SUPERUSER=True
+        ))
+
+        header = 'INSTITUTE,ACADEMIC_YEAR,BATCH,ADMISSION_CATEGORY,FORM_NO,NAME,SURNAME,GENDER,DOB,MOB_NO,EMAIL_ID,BRANCH_ID'
+        lines = [
+            f'II,2025-26,2029,1,101,Asha,Rao,female,2007-01-02,9000000001,asha.import@example.com,{branch.pk}',
+            f'II,2025-26,2029,2,102,Ravi,Shah,male,2007-03-04,9000000002,ravi.import@example.com,{branch.pk}',
+        ]
+        bad = SimpleUploadedFile('students.csv', '\n'.join([header, lines[0], lines[1].replace('male', 'robot')]).encode())
+        response = client.post('/api/imports/students/', {'file': bad})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][0]['row'], 3)
+        self.assertIn('GENDER', response.data['errors'][0]['errors'])
+
+        # A dry run checks the accounts without hashing passwords
+        upload = SimpleUploadedFile('students.csv', '\n'.join([header] + lines).encode())
+        with mock.patch('student.imports.hash_passwords') as hash_passwords:
+            response = client.post('/api/imports/students/?dry_run=true', {'file': upload})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['created'], 0)
+        hash_passwords.assert_not_called()
+        self.assertFalse(CustomUser.objects.filter(EMAIL='asha.import@example.com').exists())
+
+        upload = SimpleUploadedFile('students.csv', '\n'.join([header] + lines).encode())
+        response = client.post('/api/imports/students/', {'file': upload})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['created'], 2)
+
+        students = list(STUDENT_MASTER.objects.filter(BRANCH_ID=branch).order_by('FORM_NO'))
+        self.assertEqual([student.STUDENT_ID for student in students], ['BTECH29001', 'BTECH29002'])
+        self.assertEqual(students[0].CREATED_BY, 'adm002')
+        self.assertEqual(STUDENT_DETAILS.objects.filter(STUDENT_ID__in=students).count(), 2)
+        record = STUDENT_ACADEMIC_RECORD.objects.get(STUDENT_ID='BTECH29002')
+        self.assertEqual((record.CATEGORY, record.FEE_CATEGORY_ID, record.INSTITUTE_ID), (2, 2, 'II'))
+        user = CustomUser.objects.get(pk='BTECH29001')
+        self.assertEqual(user.USERNAME, 'asha.import')
+        email = EMAIL_OUTBOX.objects.get(RECIPIENTS__contains=['asha.import@example.com'])
+        self.assertIn('Student ID: BTECH29001', email.BODY)
+        password = next(line.split(': ', 1)[1] for line in email.BODY.splitlines() if 'Password:' in line)
+        self.assertTrue(user.check_password(password))
+        self.assertEqual(EMAIL_OUTBOX.objects.filter(RECIPIENTS__contains=['ravi.import@example.com']).count(), 1)
 
-# Create your tests here.
+        # Account conflicts are reported on the column they come from
+        taken = SimpleUploadedFile('students.csv', '\n'.join([header, lines[0].replace('101', '103')]).encode())
+        response = client.post('/api/imports/students/', {'file': taken})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'], [{'row': 2, 'errors': {'EMAIL_ID': [
+            'asha.import is already taken.', 'asha.import@example.com is already taken.'
+        ]}}])
@@ -4,7 +4,6 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.authentication import TokenAuthentication
-from django.core.mail import send_mail
 from .models import STUDENT_MASTER, BRANCH, STUDENT_DETAILS, STUDENT_ACADEMIC_RECORD
 from .serializers import StudentMasterSerializer
 from .models import STUDENT_MASTER, BRANCH ,STUDENT_ROLL_NUMBER_DETAILS
@@ -14,15 +13,19 @@ from django.conf import settings
 import logging
 from django.http import Http404
 from django.utils import timezone
-from django.db.models import Q
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException
 from django.shortcuts import get_object_or_404
 from utils.id_generators import generate_student_id
 from django.contrib.auth import get_user_model
 from utils.id_generators import generate_password
+from accounts.provisioning import credentials_email, provision_accounts
 from accounts.models import DESIGNATION
-from accounts.models import CustomUser, YEAR
+from accounts.models import YEAR
 from accounts.views import BaseModelViewSet
+from core import typeahead
+from core.cache import cached_get
+from .search import search_students
 
 
 logger = logging.getLogger(__name__)
@@ -31,6 +34,7 @@ class StudentMasterViewSet(viewsets.ModelViewSet):
     queryset = STUDENT_MASTER.objects.filter(IS_DELETED=False)
     serializer_class = StudentMasterSerializer
     lookup_field = 'STUDENT_ID'  # Very important
+    keyset_ordering = 'STUDENT_ID'
     
     def get_or_default(value, default=None, data_type=int):
         """Returns integer value if valid, otherwise returns default"""
@@ -81,7 +85,7 @@ class StudentMasterViewSet(viewsets.ModelViewSet):
             # Validate branch
             branch_id = request.data.get('BRANCH_ID')
             try:
-                branch = BRANCH.objects.select_related('PROGRAM').get(BRANCH_ID=branch_id)
+                branch = cached_get(BRANCH, select_related=('PROGRAM',), BRANCH_ID=branch_id)
             except BRANCH.DoesNotExist:
                 return Response({
                     'status': 'error',
@@ -99,7 +103,7 @@ class StudentMasterViewSet(viewsets.ModelViewSet):
             # Validate that YEAR_ID is provided and exists
             year_id = data.get('YEAR_ID')
             try:
-                year_instance = YEAR.objects.get(pk=year_id)
+                year_instance = cached_get(YEAR, pk=year_id)
                 data['YEAR_SEM_ID'] = year_id  # Store selected year_id
             except YEAR.DoesNotExist:
                 return Response({'status': 'error', 'message': 'Invalid YEAR_ID'}, status=status.HTTP_400_BAD_REQUEST)
@@ -133,46 +137,24 @@ class StudentMasterViewSet(viewsets.ModelViewSet):
                 username = request.data.get('EMAIL_ID').split('@')[0]
                 password = student.STUDENT_ID  # Use student_id as password
                 
-                user = CustomUser.objects.create(
-                    USER_ID=student.STUDENT_ID,
-                    USERNAME=username,
-                    EMAIL=request.data.get('EMAIL_ID'),
-                    IS_ACTIVE=True,
-                    IS_STAFF=False,
-                    IS_SUPERUSER=False,
-                    DESIGNATION=None,  # Students typically don't have a designation
-                    FIRST_NAME=request.data.get('NAME')
-                )
-                user.set_password(password)
-                user.save()
-                
-                print(f"User created with ID: {user.USER_ID}")
-                
-
-                # Send welcome email (optional)
-                email_subject = "Your Student Account Credentials"
-                email_message = f"""
-                Dear {request.data.get('NAME')},
+                # One INSERT with the hashed password, credentials mail queued
+                user = provision_accounts(
+                    [{
+                        'USER_ID': student.STUDENT_ID,
+                        'USERNAME': username,
+                        'EMAIL': request.data.get('EMAIL_ID'),
+                        'password': password,
+                        'IS_ACTIVE': True,
+                        'IS_STAFF': False,
+                        'IS_SUPERUSER': False,
+                        'DESIGNATION': None,  # Students typically don't have a designation
+                        'FIRST_NAME': request.data.get('NAME'),
+                    }],
+                    credentials_email=credentials_email('student'),
+                    from_email=settings.EMAIL_HOST_USER,
+                ).users[0]
 
-                Your student account has been created. Here are your login credentials:
-
-                Student ID: {student.STUDENT_ID}
-                Username: {username}
-                Password: {password}
-
-                Please change your password after first login.
-
-                Best regards,
-                College ERP Team
-                """
-
-                send_mail(
-                    email_subject,
-                    email_message,
-                    settings.EMAIL_HOST_USER,
-                    [user.EMAIL],
-                    fail_silently=False,
-                )
+                print(f"User created with ID: {user.USER_ID}")
 
             except Exception as user_error:
                 # Rollback student creation if user creation fails
@@ -197,11 +179,22 @@ class StudentMasterViewSet(viewsets.ModelViewSet):
     def list(self, request, *args, **kwargs):
         try:
             students = self.get_queryset()
+            page = self.paginate_queryset(students)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return Response({
+                    'status': 'success',
+                    **self.paginator.get_page_info(),
+                    'data': serializer.data
+                })
             serializer = self.get_serializer(students, many=True)
             return Response({
                 'status': 'success',
                 'data': serializer.data
             })
+        except APIException:
+            # e.g. NotFound for an invalid cursor; DRF renders it with its status
+            raise
         except Exception as e:
             logger.error(f"Error listing students: {str(e)}", exc_info=True)
             return Response({
@@ -212,20 +205,30 @@ class StudentMasterViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def search(self, request):
         try:
-            query = request.query_params.get('query', '')
+            query = request.query_params.get('query', '').strip()
             if not query:
                 return Response({
                     'status': 'error',
                     'message': 'Search query is required'
                 }, status=status.HTTP_400_BAD_REQUEST)
+            min_length = getattr(settings, 'STUDENT_SEARCH_MIN_LENGTH', 3)
+            if len(query) < min_length:
+                return Response({
+                    'status': 'error',
+                    'message': f'Search query must be at least {min_length} characters'
+                }, status=status.HTTP_400_BAD_REQUEST)
 
-            students = self.queryset.filter(
-                Q(STUDENT_ID__icontains=query) |
-                Q(NAME__icontains=query) |
-                Q(SURNAME__icontains=query) |
-                Q(MOB_NO__icontains=query) |
-                Q(EMAIL_ID__icontains=query)
-            )[:10]
+            try:
+                limit = int(request.query_params.get('limit', 10))
+            except ValueError:
+                limit = 10
+            # get_queryset() applies ?branch_id= and ?academic_year=
+            students = search_students(
+                self.get_queryset(),
+                query,
+                batch=request.query_params.get('batch') or None,
+                limit=max(1, min(limit, getattr(settings, 'STUDENT_SEARCH_MAX_LIMIT', 50))),
+            )
 
             serializer = self.get_serializer(students, many=True)
             return Response({
@@ -240,6 +243,19 @@ class StudentMasterViewSet(viewsets.ModelViewSet):
                 'message': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=False, methods=['get'])
+    def typeahead(self, request):
+        """Prefix match on STUDENT_ID and name from this worker's index (core.typeahead)."""
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        matches = typeahead.search('students', request.query_params.get('query', ''), limit)
+        return Response({
+            'status': 'success',
+            'data': [{'STUDENT_ID': student_id, 'NAME': name} for student_id, name in matches]
+        })
+
 class StudentRollNumberDetailsViewSet(viewsets.ModelViewSet):
     queryset = STUDENT_ROLL_NUMBER_DETAILS.objects.all()
     serializer_class = StudentRollNumberDetailsSerializer
@@ -0,0 +1,178 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import EMAIL_OUTBOX
+
+logger = logging.getLogger(__name__)
+
+
+def get_outbox_connection():
+    """
+    Mail connection used for outbox delivery. EMAIL_OUTBOX_BACKEND overrides
+    EMAIL_BACKEND, e.g. the filebased backend as an offline file sink.
+    """
+    return get_connection(backend=getattr(settings, 'EMAIL_OUTBOX_BACKEND', None))
+
+
+def queue_email(subject, message, recipient_list, from_email=None, sensitive=False):
+    """
+    Store a mail in EMAIL_OUTBOX instead of sending it inside the request.
+    In eager mode the row is delivered in-process once the transaction commits.
+    `sensitive` (credentials, OTPs) blanks the body once it is delivered.
+    """
+    email = EMAIL_OUTBOX.objects.create(
+        SUBJECT=subject,
+        BODY=message,
+        FROM_EMAIL=from_email,
+        RECIPIENTS=list(recipient_list),
+        SENSITIVE=sensitive,
+    )
+    if getattr(settings, 'EMAIL_OUTBOX_EAGER', False):
+        transaction.on_commit(lambda: send_pending(ids=[email.EMAIL_ID]))
+    return email
+
+
+def queue_emails(messages, from_email=None, sensitive=False):
+    """
+    Queue many mails with one INSERT. `messages` is an iterable of
+    (subject, message, recipient_list) tuples.
+    """
+    emails = EMAIL_OUTBOX.objects.bulk_create([
+        EMAIL_OUTBOX(
+            SUBJECT=subject,
+            BODY=message,
+            FROM_EMAIL=from_email,
+            RECIPIENTS=list(recipient_list),
+            SENSITIVE=sensitive,
+        )
+        for subject, message, recipient_list in messages
+    ])
+    if emails and getattr(settings, 'EMAIL_OUTBOX_EAGER', False):
+        ids = [email.EMAIL_ID for email in emails]
+        transaction.on_commit(lambda: send_pending(batch_size=len(ids), ids=ids))
+    return emails
+
+
+def expire_outbox(now=None):
+    """
+    Close rows that can no longer be delivered safely:
+
+    - SENDING rows claimed more than EMAIL_OUTBOX_SENDING_TIMEOUT seconds ago
+      (the sender died mid-delivery) are marked FAILED, not retried, as SMTP
+      may already have accepted them;
+    - sensitive PENDING rows older than EMAIL_OUTBOX_SENSITIVE_MAX_AGE seconds
+      are marked FAILED with their body blanked.
+
+    Returns the number of rows closed.
+    """
+    now = now or timezone.now()
+    interrupted = EMAIL_OUTBOX.objects.filter(
+        STATUS=EMAIL_OUTBOX.STATUS_SENDING,
+        CLAIMED_AT__lt=now - timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_SENDING_TIMEOUT', 600)),
+    )
+    expired = EMAIL_OUTBOX.objects.filter(
+        STATUS=EMAIL_OUTBOX.STATUS_PENDING,
+        SENSITIVE=True,
+        CREATED_AT__lt=now - timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_SENSITIVE_MAX_AGE', 86400)),
+    )
+    closed = interrupted.filter(SENSITIVE=True).update(
+        STATUS=EMAIL_OUTBOX.STATUS_FAILED, BODY='', LAST_ERROR='Interrupted during delivery',
+    )
+    closed += interrupted.update(STATUS=EMAIL_OUTBOX.STATUS_FAILED, LAST_ERROR='Interrupted during delivery')
+    closed += expired.update(STATUS=EMAIL_OUTBOX.STATUS_FAILED, BODY='', LAST_ERROR='Expired before delivery')
+    return closed
+
+
+def claim_pending(batch_size=50, ids=None):
+    """
+    Mark up to `batch_size` due rows SENDING and commit, so no row lock is
+    held while talking to the mail server. Rows are picked with SKIP LOCKED
+    so several workers can run side by side.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = EMAIL_OUTBOX.objects.select_for_update(skip_locked=True).filter(
+            STATUS=EMAIL_OUTBOX.STATUS_PENDING,
+            NEXT_ATTEMPT_AT__lte=now,
+        )
+        if ids is not None:
+            queryset = queryset.filter(EMAIL_ID__in=ids)
+        emails = list(queryset.order_by('EMAIL_ID')[:batch_size])
+        EMAIL_OUTBOX.objects.filter(EMAIL_ID__in=[email.EMAIL_ID for email in emails]).update(
+            STATUS=EMAIL_OUTBOX.STATUS_SENDING, CLAIMED_AT=now, ATTEMPTS=F('ATTEMPTS') + 1,
+        )
+    for email in emails:
+        email.ATTEMPTS += 1
+    return emails
+
+
+def _record_result(email, error=None):
+    """Store the outcome of one delivery in its own short UPDATE."""
+    changes = {}
+    if error is None:
+        changes.update(STATUS=EMAIL_OUTBOX.STATUS_SENT, SENT_AT=timezone.now(), LAST_ERROR=None)
+    elif email.ATTEMPTS >= getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5):
+        changes.update(STATUS=EMAIL_OUTBOX.STATUS_FAILED, LAST_ERROR=error)
+    else:
+        retry_delay = getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 60)
+        changes.update(
+            STATUS=EMAIL_OUTBOX.STATUS_PENDING,
+            LAST_ERROR=error,
+            NEXT_ATTEMPT_AT=timezone.now() + timedelta(seconds=retry_delay * email.ATTEMPTS),
+        )
+    if email.SENSITIVE and changes['STATUS'] != EMAIL_OUTBOX.STATUS_PENDING:
+        changes['BODY'] = ''
+    EMAIL_OUTBOX.objects.filter(EMAIL_ID=email.EMAIL_ID).update(**changes)
+
+
+def send_pending(batch_size=50, ids=None, connection=None):
+    """
+    Deliver one batch of due outbox rows over a single mail connection.
+    Rows are claimed (SENDING) in a committed transaction before sending and
+    each result is written right after its send, so a sender that dies
+    mid-batch leaves SENDING rows for expire_outbox() instead of mails that
+    go out twice. Returns the number of rows processed.
+    """
+    if ids is None:
+        expire_outbox()
+    emails = claim_pending(batch_size=batch_size, ids=ids)
+    if not emails:
+        return 0
+
+    owns_connection = connection is None
+    if owns_connection:
+        connection = get_outbox_connection()
+    try:
+        connection.open()
+        for email in emails:
+            message = EmailMessage(
+                subject=email.SUBJECT,
+                body=email.BODY,
+                from_email=email.FROM_EMAIL or settings.DEFAULT_FROM_EMAIL,
+                to=email.RECIPIENTS,
+                connection=connection,
+            )
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                logger.warning(f"Outbox email {email.EMAIL_ID} failed: {str(e)}")
+                _record_result(email, error=str(e))
+                # Replace a possibly broken connection once; on a closed one,
+                # send_messages() would open and close its own for every message
+                connection.close()
+                try:
+                    connection.open()
+                except Exception as e:
+                    logger.warning(f"Reopening the outbox mail connection failed: {str(e)}")
+            else:
+                _record_result(email)
+    finally:
+        if owns_connection:
+            connection.close()
+    return len(emails)
@@ -1,4 +1,4 @@
-from django.core.mail import send_mail
+from utils.email_outbox import queue_email
 from django.conf import settings
 
 def send_credentials_email(email, employee_id, username, password):
@@ -20,14 +20,14 @@ def send_credentials_email(email, employee_id, username, password):
     """
     
     try:
-        send_mail(
+        queue_email(
             subject=subject,
             message=message,
-            from_email=settings.EMAIL_HOST_USER,
             recipient_list=[email],
-            fail_silently=False,
+            from_email=settings.EMAIL_HOST_USER,
+            sensitive=True,
         )
         return True
     except Exception as e:
-        print(f"Error sending email: {str(e)}")
+        print(f"Error queueing email: {str(e)}")
         return False
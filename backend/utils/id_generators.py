@@ -1,63 +1,72 @@
+import logging
 import random
 import string
 from datetime import datetime
 from accounts.models import CustomUser
-from django.db import transaction
-from student.models import STUDENT_MASTER
+from django.db import connection, transaction
+from core.models import ID_COUNTER
 
-def generate_employee_id(designation_name, year=None):
+logger = logging.getLogger(__name__)
+
+
+def max_id_suffix(ids, prefix):
+    """Largest number following `prefix` in `ids`, 0 if there is none."""
+    numbers = [int(id[len(prefix):]) for id in ids if id[len(prefix):].isdigit()]
+    return max(numbers, default=0)
+
+
+def allocate_ids(kind, prefix, count=1, seed=None):
+    """
+    Reserve `count` consecutive numbers for (kind, prefix) and return them as
+    a range. The ID_COUNTERS row is incremented with a single
+    UPDATE ... RETURNING, so concurrent callers never get the same number;
+    the row stays locked until the caller's transaction ends.
+
+    `seed` is called once, when the prefix has no counter yet, and returns the
+    last number already in use (e.g. parsed from existing IDs).
+    """
+    if count < 1:
+        raise ValueError("count must be at least 1")
+    table = ID_COUNTER._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE "{table}" SET "LAST_VALUE" = "LAST_VALUE" + %s '
+            f'WHERE "KIND" = %s AND "PREFIX" = %s RETURNING "LAST_VALUE"',
+            [count, kind, prefix],
+        )
+        row = cursor.fetchone()
+        if row is None:
+            start = seed() if seed else 0
+            # Another caller may create the counter first; then add to theirs
+            cursor.execute(
+                f'INSERT INTO "{table}" ("KIND", "PREFIX", "LAST_VALUE") VALUES (%s, %s, %s) '
+                f'ON CONFLICT ("KIND", "PREFIX") DO UPDATE SET "LAST_VALUE" = "{table}"."LAST_VALUE" + %s '
+                f'RETURNING "LAST_VALUE"',
+                [kind, prefix, start + count, count],
+            )
+            row = cursor.fetchone()
+    last = row[0]
+    return range(last - count + 1, last + 1)
+
+
+def generate_employee_ids(designation_name, count, year=None):
     if year is None:
         year = datetime.now().year
-    
-    # Get first letter of designation in uppercase
-    designation_code = designation_name[0].upper()
-    
-    # Base format: EMP{YEAR}{DESIGNATION_CODE}
-    base_id = f"EMP{year}{designation_code}"
-    
-    # Debug log
-    print(f"Generating ID with base: {base_id}")
-    
-    try:
-        # Get ALL existing IDs with this pattern, including inactive/deleted users
-        existing_ids = CustomUser.objects.filter(
-            USER_ID__startswith=base_id
-        ).values_list('USER_ID', flat=True)
-        
-        # Debug log
-        print(f"Found existing IDs: {existing_ids}")
-        
-        if not existing_ids:
-            new_id = f"{base_id}001"
-            print(f"First ID in sequence: {new_id}")
-            return new_id
-        
-        # Extract sequence numbers and find max
-        sequences = []
-        for id in existing_ids:
-            try:
-                seq_num = int(id[-3:])  # Get last 3 digits
-                sequences.append(seq_num)
-            except ValueError:
-                continue
-        
-        if sequences:
-            next_sequence = max(sequences) + 1
-        else:
-            next_sequence = 1
-            
-        # Debug log
-        print(f"Next sequence number: {next_sequence}")
-        
-        # Format with leading zeros
-        new_id = f"{base_id}{next_sequence:03d}"
-        print(f"Generated new ID: {new_id}")
-        return new_id
-        
-    except Exception as e:
-        print(f"Error generating ID: {str(e)}")
-        # Fallback to timestamp-based ID if something goes wrong
-        return f"{base_id}{datetime.now().strftime('%H%M%S')}"
+
+    # Base format: EMP{YEAR}{DESIGNATION_CODE}, code being the first letter of the designation
+    base_id = f"EMP{year}{designation_name[0].upper()}"
+
+    def seed():
+        # Existing IDs, including inactive/deleted users
+        return max_id_suffix(CustomUser.objects.filter(USER_ID__startswith=base_id).values_list('USER_ID', flat=True), base_id)
+
+    return [f"{base_id}{number:03d}" for number in allocate_ids('employee', base_id, count, seed)]
+
+
+def generate_employee_id(designation_name, year=None):
+    new_id = generate_employee_ids(designation_name, 1, year=year)[0]
+    logger.debug(f"Generated new ID: {new_id}")
+    return new_id
 
 def generate_password(length=10):
     # Define character sets
@@ -85,32 +94,39 @@ def generate_password(length=10):
     return ''.join(password)
 
 
-def generate_student_id(program_code: str, batch: str) -> str:
+def generate_student_ids(program_code: str, batch: str, count: int) -> list:
     """
-    Generates student ID in format: AAA2025S001
+    Reserves `count` student IDs in format: AAA2025S001
     program_code: Program code (takes first 3 chars)
     batch: Batch year (4 digits)
     S: Static for Student
     001: Sequential number
     """
     from student.models import STUDENT_MASTER
-    
+
     # Take first 3 chars of program code and convert to uppercase
-    prefix = program_code[:3].upper()
-    
-    # Get last student ID for this program and batch
-    last_student = STUDENT_MASTER.objects.filter(
-        STUDENT_ID__startswith=f"{prefix}{batch}S"
-    ).order_by('-STUDENT_ID').first()
-    
-    if last_student:
-        # Extract sequence number and increment
-        last_seq = int(last_student.STUDENT_ID[-3:])
-        new_seq = str(last_seq + 1).zfill(3)
-    else:
-        # Start with 001
-        new_seq = '001'
-    
-    # Combine all parts
-    student_id = f"{prefix}{batch}S{new_seq}"
-    return student_id
\ No newline at end of file
+    prefix = f"{program_code[:3].upper()}{batch}S"
+
+    def seed():
+        return max_id_suffix(STUDENT_MASTER.objects.filter(STUDENT_ID__startswith=prefix).values_list('STUDENT_ID', flat=True), prefix)
+
+    return [f"{prefix}{number:03d}" for number in allocate_ids('student', prefix, count, seed)]
+
+
+def generate_student_id(program_code: str, batch: str) -> str:
+    return generate_student_ids(program_code, batch, 1)[0]
+
+
+def generate_student_master_ids(program_name: str, batch: str, count: int) -> list:
+    """
+    Reserves `count` STUDENT_MASTER IDs: program name, last two digits of the
+    batch, then a 3-digit sequence (e.g. BTECH25001).
+    """
+    from student.models import STUDENT_MASTER
+
+    prefix = f"{program_name}{batch[-2:]}"
+
+    def seed():
+        return max_id_suffix(STUDENT_MASTER.objects.filter(STUDENT_ID__startswith=prefix).values_list('STUDENT_ID', flat=True), prefix)
+
+    return [f"{prefix}{number:03d}" for number in allocate_ids('student_master', prefix, count, seed)]